@@ -0,0 +1,309 @@
+import os
+
+# ===============================
+#  HELPER BACA ENV
+# ===============================
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None:
+        return default
+    return val.strip().lower() in ("1", "true", "yes", "on")
+
+
+# ===============================
+#  SCAN HTTP CLIENT (POOLED)
+# ===============================
+
+# batas koneksi total untuk semua host
+SCAN_MAX_CONNECTIONS = env_int("SCAN_MAX_CONNECTIONS", 200)
+# koneksi idle yang disimpan untuk keep-alive
+SCAN_MAX_KEEPALIVE = env_int("SCAN_MAX_KEEPALIVE", 50)
+# detik sebelum koneksi idle ditutup
+SCAN_KEEPALIVE_EXPIRY = env_float("SCAN_KEEPALIVE_EXPIRY", 30.0)
+# batas request bersamaan ke satu host (0 = tanpa batas)
+SCAN_MAX_PER_HOST = env_int("SCAN_MAX_PER_HOST", 16)
+# HTTP/2 butuh paket "h2", kalau tidak ada otomatis pakai HTTP/1.1
+SCAN_HTTP2 = env_bool("SCAN_HTTP2", False)
+
+SCAN_CONNECT_TIMEOUT = env_float("SCAN_CONNECT_TIMEOUT", 5.0)
+SCAN_READ_TIMEOUT = env_float("SCAN_READ_TIMEOUT", 15.0)
+SCAN_WRITE_TIMEOUT = env_float("SCAN_WRITE_TIMEOUT", 15.0)
+SCAN_POOL_TIMEOUT = env_float("SCAN_POOL_TIMEOUT", 30.0)
+
+# ===============================
+#  DNS RESOLVER
+# ===============================
+
+DNS_CACHE_TTL = env_float("DNS_CACHE_TTL", 300.0)
+# lookup gagal di-cache lebih singkat
+DNS_NEGATIVE_TTL = env_float("DNS_NEGATIVE_TTL", 30.0)
+DNS_CACHE_SIZE = env_int("DNS_CACHE_SIZE", 10000)
+# jumlah thread untuk lookup blocking
+DNS_WORKERS = env_int("DNS_WORKERS", 32)
+
+# ===============================
+#  WRITE-BEHIND SCAN HISTORY
+# ===============================
+
+# flush kalau batch sudah sebanyak ini ...
+SCAN_WRITE_BATCH = env_int("SCAN_WRITE_BATCH", 500)
+# ... atau kalau sudah lewat jendela waktu ini (detik)
+SCAN_WRITE_INTERVAL = env_float("SCAN_WRITE_INTERVAL", 0.05)
+# kapasitas antrian; kalau penuh, submit() menunggu (backpressure)
+SCAN_WRITE_QUEUE = env_int("SCAN_WRITE_QUEUE", 5000)
+
+# ===============================
+#  BULK SCAN JOB
+# ===============================
+
+# tempat menyimpan list URL tiap job (dipakai untuk resume)
+SCAN_JOB_DIR = os.getenv("SCAN_JOB_DIR", "data/jobs")
+# checkpoint ke DB setiap N hasil atau setiap sekian detik
+SCAN_JOB_CHECKPOINT_EVERY = env_int("SCAN_JOB_CHECKPOINT_EVERY", 500)
+SCAN_JOB_CHECKPOINT_INTERVAL = env_float("SCAN_JOB_CHECKPOINT_INTERVAL", 2.0)
+# lanjutkan otomatis job yang terputus saat aplikasi start
+SCAN_JOB_AUTO_RESUME = env_bool("SCAN_JOB_AUTO_RESUME", False)
+# jumlah job selesai yang tetap disimpan di memori
+SCAN_JOB_KEEP_FINISHED = env_int("SCAN_JOB_KEEP_FINISHED", 100)
+# URL yang diproses bersamaan per job (probe + simpan + broadcast)
+SCAN_BULK_INFLIGHT = env_int("SCAN_BULK_INFLIGHT", 256)
+# ukuran batch baca input + prefetch DNS
+SCAN_BULK_BATCH = env_int("SCAN_BULK_BATCH", 1000)
+# batas body upload /scan/bulk (byte, sebelum gunzip); lewat -> 413, 0 = tanpa batas
+SCAN_BULK_MAX_UPLOAD_BYTES = env_int("SCAN_BULK_MAX_UPLOAD_BYTES", 256 * 1024 * 1024)
+
+# ===============================
+#  ADAPTIVE CONCURRENCY (BULK)
+# ===============================
+
+SCAN_CONCURRENCY_INITIAL = env_int("SCAN_CONCURRENCY_INITIAL", 8)
+SCAN_CONCURRENCY_MIN = env_int("SCAN_CONCURRENCY_MIN", 2)
+SCAN_CONCURRENCY_MAX = env_int("SCAN_CONCURRENCY_MAX", 128)
+# probe bersamaan maksimum ke satu host dalam satu job
+SCAN_CONCURRENCY_PER_HOST = env_int("SCAN_CONCURRENCY_PER_HOST", 8)
+# latency boleh naik sampai sekian kali rata-rata jangka panjang
+SCAN_CONCURRENCY_TOLERANCE = env_float("SCAN_CONCURRENCY_TOLERANCE", 1.5)
+# faktor pengali limit saat timeout
+SCAN_CONCURRENCY_BACKOFF = env_float("SCAN_CONCURRENCY_BACKOFF", 0.9)
+
+# ===============================
+#  BODY SCAN (BOUNDED)
+# ===============================
+
+# body dibaca per chunk sampai batas ini, sisanya tidak di-download
+SCAN_MAX_BODY_BYTES = env_int("SCAN_MAX_BODY_BYTES", 10 * 1024 * 1024)
+# hash body (blake2b) untuk deteksi perubahan konten
+SCAN_HASH_BODY = env_bool("SCAN_HASH_BODY", True)
+# coba HEAD dulu; kalau server memberi Content-Length, GET tidak perlu
+SCAN_HEAD_FIRST = env_bool("SCAN_HEAD_FIRST", False)
+
+# ===============================
+#  CONDITIONAL REQUEST (ETAG / LAST-MODIFIED)
+# ===============================
+
+# kirim If-None-Match / If-Modified-Since dari scan sebelumnya; 304 = konten tidak berubah
+SCAN_CONDITIONAL = env_bool("SCAN_CONDITIONAL", True)
+# validator per URL yang disimpan di memori (LRU), sisanya dibaca dari DB
+VALIDATOR_CACHE_SIZE = env_int("VALIDATOR_CACHE_SIZE", 100000)
+# validator baru ditulis ke DB per batch setiap sekian detik
+VALIDATOR_FLUSH_INTERVAL = env_float("VALIDATOR_FLUSH_INTERVAL", 2.0)
+
+# ===============================
+#  DEDUP SCAN (URL SAMA)
+# ===============================
+
+# "/a/" dan "/a" dianggap URL yang sama (default: beda, server boleh membedakan)
+URL_STRIP_TRAILING_SLASH = env_bool("URL_STRIP_TRAILING_SLASH", False)
+# hasil /scan/run dipakai ulang selama sekian detik (0 = hanya gabung scan yang sedang jalan)
+SCAN_RESULT_TTL = env_float("SCAN_RESULT_TTL", 5.0)
+SCAN_RESULT_CACHE_SIZE = env_int("SCAN_RESULT_CACHE_SIZE", 10000)
+# URL kembar dalam satu bulk job: hasil probe pertama dipakai ulang (LRU per job)
+SCAN_BULK_DEDUP_SIZE = env_int("SCAN_BULK_DEDUP_SIZE", 20000)
+
+# ===============================
+#  STATUS JARINGAN (/scan/network)
+# ===============================
+
+# auto | linux | windows
+NETWORK_BACKEND = os.getenv("NETWORK_BACKEND", "auto")
+# snapshot dipakai ulang selama sekian detik (refresh dashboard beruntun)
+NETWORK_CACHE_TTL = env_float("NETWORK_CACHE_TTL", 2.0)
+# batas waktu command (iw / netsh / ipconfig)
+NETWORK_CMD_TIMEOUT = env_float("NETWORK_CMD_TIMEOUT", 3.0)
+
+# ===============================
+#  WEBSOCKET FAN-OUT
+# ===============================
+
+# pesan maksimum yang boleh antri per client dashboard
+WS_QUEUE_SIZE = env_int("WS_QUEUE_SIZE", 1000)
+# client lambat: drop_oldest | drop_newest | disconnect
+WS_SLOW_POLICY = os.getenv("WS_SLOW_POLICY", "drop_oldest")
+# scan_result dalam jendela ini digabung jadi satu frame (0 = tidak digabung)
+WS_COALESCE_MS = env_int("WS_COALESCE_MS", 100)
+WS_COALESCE_MAX = env_int("WS_COALESCE_MAX", 500)
+
+# ===============================
+#  ANALYTICS ROLLUP
+# ===============================
+
+# error relatif percentile dari latency sketch (0.01 = 1%)
+ROLLUP_SKETCH_ACCURACY = env_float("ROLLUP_SKETCH_ACCURACY", 0.01)
+# rollup di-update bersama batch writer; False = hanya history mentah
+ROLLUP_ENABLED = env_bool("ROLLUP_ENABLED", True)
+
+# ===============================
+#  RETENTION / ARSIP SCAN HISTORY
+# ===============================
+
+# scan_history lebih tua dari ini dipindah ke arsip lalu DIHAPUS dari DB.
+# Default 0 = retention mati (tidak ada baris yang dihapus). Aktifkan
+# dengan sengaja, mis. RETENTION_DAYS=90; arsip tetap terbaca lewat
+# /scan/history?archive=1 selama ARCHIVE_DIR tidak dihapus.
+RETENTION_DAYS = env_int("RETENTION_DAYS", 0)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "data/archive")
+# baris per chunk (baca + tulis arsip + DELETE)
+RETENTION_CHUNK = env_int("RETENTION_CHUNK", 5000)
+# jeda antar putaran retention + compaction (detik)
+RETENTION_INTERVAL = env_int("RETENTION_INTERVAL", 3600)
+# file arsip lebih kecil dari ini digabung saat compaction
+ARCHIVE_COMPACT_BYTES = env_int("ARCHIVE_COMPACT_BYTES", 8 * 1024 * 1024)
+
+# ===============================
+#  PAYLOAD STORE (DNS / SNAPSHOT)
+# ===============================
+
+# hash payload yang sudah pasti ada di DB (lewati SELECT saat menulis)
+PAYLOAD_CACHE_SIZE = env_int("PAYLOAD_CACHE_SIZE", 50000)
+# pindahkan kolom dns lama ke scan_payload di background saat startup
+PAYLOAD_MIGRATE_ON_START = env_bool("PAYLOAD_MIGRATE_ON_START", True)
+PAYLOAD_MIGRATE_CHUNK = env_int("PAYLOAD_MIGRATE_CHUNK", 2000)
+
+# ===============================
+#  DATABASE & CONNECTION POOL
+# ===============================
+
+DATABASE_URL = os.getenv("DATABASE_URL", "mysql+mysqlconnector://root:@localhost/scan_db")
+# driver async (aiomysql / asyncmy); kosong = diturunkan dari DATABASE_URL
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+# detik menunggu koneksi kosong dari pool sebelum error
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 30)
+# koneksi lebih tua dari ini dibuka ulang (MySQL wait_timeout default 8 jam)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+
+# ===============================
+#  MONITOR (SCAN TERJADWAL)
+# ===============================
+
+# default mati: aktifkan (MONITOR_ENABLED=1) di SATU worker saja; butuh
+# driver async DB (aiomysql untuk MySQL), kalau tidak ada monitor dilewati
+MONITOR_ENABLED = env_bool("MONITOR_ENABLED", False)
+# check berjalan bersamaan (semua target)
+MONITOR_CONCURRENCY = env_int("MONITOR_CONCURRENCY", 200)
+# jadwal tiap tick digeser acak 0..jitter x interval
+MONITOR_JITTER = env_float("MONITOR_JITTER", 0.1)
+MONITOR_MIN_INTERVAL = env_int("MONITOR_MIN_INTERVAL", 10)
+# tick tersusul maksimum per target untuk policy catchup
+MONITOR_MAX_CATCHUP = env_int("MONITOR_MAX_CATCHUP", 3)
+# target dibaca ulang dari DB (perubahan dari worker lain)
+MONITOR_SYNC_INTERVAL = env_int("MONITOR_SYNC_INTERVAL", 30)
+
+# ===============================
+#  AGENT FLEET (POLLING / PUSH)
+# ===============================
+
+# default mati: aktifkan (AGENT_POLL_ENABLED=1) di SATU worker saja, kalau
+# tidak setiap worker mem-poll semua agent dan menulis baris ganda; butuh
+# driver async DB seperti monitor. Agent mode push tetap diterima tanpa ini.
+AGENT_POLL_ENABLED = env_bool("AGENT_POLL_ENABLED", False)
+# jeda antar putaran polling semua agent (detik)
+AGENT_POLL_INTERVAL = env_float("AGENT_POLL_INTERVAL", 30.0)
+# timeout per agent; agent lambat tidak menahan yang lain
+AGENT_TIMEOUT = env_float("AGENT_TIMEOUT", 5.0)
+# agent yang dipoll bersamaan (= batas koneksi pool)
+AGENT_POLL_CONCURRENCY = env_int("AGENT_POLL_CONCURRENCY", 100)
+# snapshot lebih tua dari ini dianggap stale
+AGENT_STALE_AFTER = env_float("AGENT_STALE_AFTER", 120.0)
+# endpoint snapshot di agent (app/services/agent.py)
+AGENT_SNAPSHOT_PATH = os.getenv("AGENT_SNAPSHOT_PATH", "/scan-wifi")
+# agent mode push: batas body upload (gzip & setelah didekompresi) dan sample per batch
+AGENT_INGEST_MAX_BYTES = env_int("AGENT_INGEST_MAX_BYTES", 2 * 1024 * 1024)
+AGENT_INGEST_MAX_RAW_BYTES = env_int("AGENT_INGEST_MAX_RAW_BYTES", 32 * 1024 * 1024)
+AGENT_INGEST_MAX_SAMPLES = env_int("AGENT_INGEST_MAX_SAMPLES", 1000)
+
+# ===============================
+#  PORT SCAN (/scan/ports)
+# ===============================
+# khusus admin: header x-admin-token = ADMIN_TOKEN (lihat TRACING di bawah)
+
+# socket connect bersamaan per scan (perhatikan ulimit -n)
+PORT_SCAN_CONCURRENCY = env_int("PORT_SCAN_CONCURRENCY", 500)
+PORT_SCAN_MAX_CONCURRENCY = env_int("PORT_SCAN_MAX_CONCURRENCY", 5000)
+# timeout connect (detik); tidak ada jawaban = filtered
+PORT_SCAN_TIMEOUT = env_float("PORT_SCAN_TIMEOUT", 1.0)
+# probe per detik ke satu host (0 = tanpa batas)
+PORT_SCAN_RATE_PER_HOST = env_float("PORT_SCAN_RATE_PER_HOST", 0.0)
+PORT_SCAN_BANNER_TIMEOUT = env_float("PORT_SCAN_BANNER_TIMEOUT", 1.0)
+# host x port maksimum per request (/24 x port 1-1000 = 254 ribu);
+# scan lebih besar dipecah jadi beberapa request
+PORT_SCAN_MAX_PROBES = env_int("PORT_SCAN_MAX_PROBES", 300_000)
+PORT_SCAN_MAX_RUNNING = env_int("PORT_SCAN_MAX_RUNNING", 4)
+# port open disimpan ke tabel open_port per batch
+PORT_SCAN_FLUSH_SIZE = env_int("PORT_SCAN_FLUSH_SIZE", 500)
+
+# ===============================
+#  METRICS LIVE (/scan/metrics)
+# ===============================
+
+# titik per series (ring buffer); 2048 titik ~ 28 KB per series
+METRICS_RING_SIZE = env_int("METRICS_RING_SIZE", 2048)
+# series per URL yang disimpan (LRU)
+METRICS_MAX_SERIES = env_int("METRICS_MAX_SERIES", 1000)
+METRICS_MAX_BUCKETS = env_int("METRICS_MAX_BUCKETS", 500)
+
+# ===============================
+#  PROMETHEUS (/metrics)
+# ===============================
+
+# multi-process (uvicorn --workers / gunicorn): direktori bersama untuk file
+# metrics per proses; kosong = hanya proses ini
+PROM_MULTIPROC_DIR = os.getenv("PROM_MULTIPROC_DIR", os.getenv("PROMETHEUS_MULTIPROC_DIR", ""))
+PROM_FLUSH_INTERVAL = env_float("PROM_FLUSH_INTERVAL", 5.0)
+
+# ===============================
+#  TRACING REQUEST (SPAN / SERVER-TIMING)
+# ===============================
+
+TRACE_ENABLED = env_bool("TRACE_ENABLED", True)
+# request >= TRACE_SLOW_MS masuk log lambat (dengan pohon span), diambil
+# sebagian TRACE_SLOW_SAMPLE (0..1)
+TRACE_SLOW_MS = env_float("TRACE_SLOW_MS", 1000.0)
+TRACE_SLOW_SAMPLE = env_float("TRACE_SLOW_SAMPLE", 1.0)
+TRACE_LOG_SIZE = env_int("TRACE_LOG_SIZE", 100)
+# batas span per request (task background yang lahir dari request tidak
+# ikut menumpuk span tanpa batas)
+TRACE_MAX_SPANS = env_int("TRACE_MAX_SPANS", 200)
+
+# fitur admin lewat header x-admin-token = ADMIN_TOKEN: ?profile=1 dan
+# semua /scan/ports; ADMIN_TOKEN kosong = keduanya mati
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+TRACE_PROFILE_INTERVAL_MS = env_float("TRACE_PROFILE_INTERVAL_MS", 2.0)
+TRACE_PROFILE_MAX_S = env_float("TRACE_PROFILE_MAX_S", 30.0)
@@ -1,42 +1,369 @@
+from datetime import datetime
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.models import ScanHistory
+from app.models.models import ScanHistory, ScanJob, ScanRollup, ScanPayload, MonitorTarget, UrlValidator, Agent, OpenPort
+from app.utils.tracing import traced
 
 
 # ===================================================
-# CREATE SCAN HISTORY
+# BULK CREATE SCAN HISTORY (dipakai ScanWriter)
 # ===================================================
-def create_scan_history(
-    db: Session,
-    url: str,
-    status_code: int = None,
-    latency_ms: int = None,
-    content_length: int = None,
-    dns: str = None,
-    error: str = None,
+def bulk_create_scan_history(db: Session, rows: list):
+    recs = [ScanHistory(**row) for row in rows]
+    db.add_all(recs)
+    # satu flush + satu commit untuk seluruh batch; id terisi setelah flush
+    db.flush()
+    db.commit()
+    return recs
+
+
+# ===================================================
+# RETENTION SCAN HISTORY
+# ===================================================
+def list_expired_scan_history(db: Session, cutoff, limit: int = 5000):
+    # terlama dulu, supaya arsip per tanggal terisi berurutan
+    return (
+        db.query(ScanHistory)
+        .filter(ScanHistory.created_at < cutoff)
+        .order_by(ScanHistory.created_at, ScanHistory.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def delete_scan_history_ids(db: Session, ids: list):
+    n = (
+        db.query(ScanHistory)
+        .filter(ScanHistory.id.in_(ids))
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return n
+
+
+
+# ===================================================
+# QUERY SCAN HISTORY (KEYSET + FILTER)
+# ===================================================
+@traced()
+async def query_scan_history(
+    db: AsyncSession,
+    columns: list,
+    limit: int = 100,
+    cursor: tuple = None,
     source: str = None,
+    status_min: int = None,
+    status_max: int = None,
+    url_prefix: str = None,
+    host: str = None,
+    has_error: bool = None,
+    since=None,
+    until=None,
 ):
-    rec = ScanHistory(
-        url=url,
-        status_code=status_code,
-        latency_ms=latency_ms,
-        content_length=content_length,
-        dns=dns,
-        error=error,
-        source=source
-    )
-    db.add(rec)
+    """
+    Urut terbaru dulu di (created_at, id). cursor = (created_at, id) baris
+    terakhir halaman sebelumnya; hanya kolom di `columns` yang diambil.
+    """
+    q = select(*columns)
+
+    if source:
+        q = q.where(ScanHistory.source == source)
+    if status_min is not None:
+        q = q.where(ScanHistory.status_code >= status_min)
+    if status_max is not None:
+        q = q.where(ScanHistory.status_code <= status_max)
+    if url_prefix:
+        q = q.where(ScanHistory.url.startswith(url_prefix, autoescape=True))
+    if host:
+        # "example.com" cocok persis, "example.*" sebagai prefix
+        if host.endswith("*"):
+            q = q.where(ScanHistory.host.startswith(host[:-1], autoescape=True))
+        else:
+            q = q.where(ScanHistory.host == host)
+    if has_error is True:
+        q = q.where(ScanHistory.error.isnot(None))
+    elif has_error is False:
+        q = q.where(ScanHistory.error.is_(None))
+    if since is not None:
+        q = q.where(ScanHistory.created_at >= since)
+    if until is not None:
+        q = q.where(ScanHistory.created_at < until)
+    if cursor is not None:
+        q = q.where(tuple_(ScanHistory.created_at, ScanHistory.id) < tuple_(*cursor))
+
+    q = q.order_by(ScanHistory.created_at.desc(), ScanHistory.id.desc()).limit(limit)
+    return (await db.execute(q)).all()
+
+
+# ===================================================
+# SCAN JOB (BULK)
+# ===================================================
+def create_scan_job(db: Session, **fields):
+    job = ScanJob(**fields)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def update_scan_job(db: Session, job_id: str, **fields):
+    db.query(ScanJob).filter(ScanJob.id == job_id).update(fields)
     db.commit()
-    db.refresh(rec)
-    return rec
+
+
+@traced()
+def get_scan_job(db: Session, job_id: str):
+    return db.query(ScanJob).filter(ScanJob.id == job_id).first()
+
+
+@traced()
+def list_scan_jobs(db: Session, limit: int = 50):
+    return (
+        db.query(ScanJob)
+        .order_by(ScanJob.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def mark_interrupted_jobs(db: Session):
+    # job yang masih "running" saat startup berarti proses sebelumnya mati
+    ids = [row.id for row in db.query(ScanJob.id).filter(ScanJob.status == "running")]
+    if ids:
+        db.query(ScanJob).filter(ScanJob.id.in_(ids)).update(
+            {"status": "interrupted"}, synchronize_session=False
+        )
+        db.commit()
+    return ids
+
+
+# ===================================================
+# SCAN ROLLUP (ANALYTICS)
+# ===================================================
+def get_scan_rollups(db: Session, keys: list, chunk: int = 200, for_update: bool = False):
+    # keys: [(url, resolution, bucket_start), ...]
+    # for_update: baris dikunci (SELECT ... FOR UPDATE) sampai commit
+    out = []
+    cols = tuple_(ScanRollup.url, ScanRollup.resolution, ScanRollup.bucket_start)
+    for i in range(0, len(keys), chunk):
+        q = db.query(ScanRollup).filter(cols.in_(keys[i:i + chunk]))
+        if for_update:
+            q = q.with_for_update()
+        out.extend(q.all())
+    return out
+
+
+@traced()
+async def list_scan_rollups(db: AsyncSession, url: str, resolution: str, since, until):
+    q = (
+        select(ScanRollup)
+        .where(
+            ScanRollup.url == url,
+            ScanRollup.resolution == resolution,
+            ScanRollup.bucket_start >= since,
+            ScanRollup.bucket_start < until,
+        )
+        .order_by(ScanRollup.bucket_start)
+    )
+    return (await db.execute(q)).scalars().all()
 
 
 # ===================================================
-# LIST SCAN HISTORY
+# SCAN PAYLOAD (DNS / SNAPSHOT, DEDUP PER HASH)
 # ===================================================
-def list_scan_history(db: Session, limit: int = 100):
+@traced()
+async def get_scan_payloads(db: AsyncSession, hashes: list, chunk: int = 500):
+    out = {}
+    for i in range(0, len(hashes), chunk):
+        q = select(ScanPayload.hash, ScanPayload.body).where(ScanPayload.hash.in_(hashes[i:i + chunk]))
+        out.update({h: body for h, body in (await db.execute(q)).all()})
+    return out
+
+
+def existing_scan_payload_hashes(db: Session, hashes: list, chunk: int = 500):
+    out = set()
+    for i in range(0, len(hashes), chunk):
+        rows = db.query(ScanPayload.hash).filter(ScanPayload.hash.in_(hashes[i:i + chunk])).all()
+        out.update(h for (h,) in rows)
+    return out
+
+
+def bulk_create_scan_payloads(db: Session, payloads: dict):
+    db.add_all([ScanPayload(hash=h, body=body, size=len(body)) for h, body in payloads.items()])
+    db.commit()
+
+
+def list_legacy_dns_rows(db: Session, after_id: int, limit: int = 2000):
+    # baris lama yang dns-nya masih disimpan langsung di scan_history
     return (
-        db.query(ScanHistory)
-        .order_by(ScanHistory.id.desc())
+        db.query(ScanHistory.id, ScanHistory.dns)
+        .filter(ScanHistory.id > after_id, ScanHistory.dns.isnot(None), ScanHistory.payload_hash.is_(None))
+        .order_by(ScanHistory.id)
         .limit(limit)
         .all()
     )
+
+
+def set_scan_history_payloads(db: Session, updates: list):
+    # updates: [{"id": .., "payload_hash": ..}]; kolom dns lama dikosongkan
+    db.bulk_update_mappings(ScanHistory, [{**u, "dns": None} for u in updates])
+    db.commit()
+
+
+# ===================================================
+# URL VALIDATOR (ETAG / LAST-MODIFIED / HASH BODY)
+# ===================================================
+@traced()
+async def get_url_validators(db: AsyncSession, keys: list, chunk: int = 500):
+    out = {}
+    for i in range(0, len(keys), chunk):
+        q = select(UrlValidator).where(UrlValidator.url_hash.in_(keys[i:i + chunk]))
+        out.update({v.url_hash: v for v in (await db.execute(q)).scalars()})
+    return out
+
+
+def save_url_validators(db: Session, items: list):
+    # items: [{"url_hash", "url", "etag", "last_modified", "content_hash"}]
+    existing = set()
+    keys = [it["url_hash"] for it in items]
+    for i in range(0, len(keys), 500):
+        rows = db.query(UrlValidator.url_hash).filter(UrlValidator.url_hash.in_(keys[i:i + 500])).all()
+        existing.update(k for (k,) in rows)
+    db.bulk_insert_mappings(UrlValidator, [it for it in items if it["url_hash"] not in existing])
+    db.bulk_update_mappings(UrlValidator, [it for it in items if it["url_hash"] in existing])
+    db.commit()
+
+
+# ===================================================
+# MONITOR TARGET (SCAN TERJADWAL)
+# ===================================================
+@traced()
+async def create_monitor_target(db: AsyncSession, **fields):
+    target = MonitorTarget(**fields)
+    db.add(target)
+    await db.commit()
+    await db.refresh(target)
+    return target
+
+
+@traced()
+async def get_monitor_target(db: AsyncSession, target_id: int):
+    return await db.get(MonitorTarget, target_id)
+
+
+@traced()
+async def update_monitor_target(db: AsyncSession, target: MonitorTarget, **fields):
+    for k, v in fields.items():
+        setattr(target, k, v)
+    await db.commit()
+    await db.refresh(target)
+    return target
+
+
+@traced()
+async def delete_monitor_target(db: AsyncSession, target: MonitorTarget):
+    await db.delete(target)
+    await db.commit()
+
+
+@traced()
+async def list_monitor_targets(db: AsyncSession, enabled_only: bool = False,
+                               limit: int = None, offset: int = 0):
+    q = select(MonitorTarget).order_by(MonitorTarget.id)
+    if enabled_only:
+        q = q.where(MonitorTarget.enabled.is_(True))
+    if limit is not None:
+        q = q.limit(limit).offset(offset)
+    return (await db.execute(q)).scalars().all()
+
+
+# ===================================================
+# AGENT (REGISTRY)
+# ===================================================
+@traced()
+async def create_agent(db: AsyncSession, **fields):
+    agent = Agent(**fields)
+    db.add(agent)
+    await db.commit()
+    await db.refresh(agent)
+    return agent
+
+
+@traced()
+async def get_agent(db: AsyncSession, agent_id: int):
+    return await db.get(Agent, agent_id)
+
+
+@traced()
+async def get_agent_by_name(db: AsyncSession, name: str):
+    q = select(Agent).where(Agent.name == name).order_by(Agent.id).limit(1)
+    return (await db.execute(q)).scalars().first()
+
+
+@traced()
+async def update_agent(db: AsyncSession, agent: Agent, **fields):
+    for k, v in fields.items():
+        setattr(agent, k, v)
+    await db.commit()
+    await db.refresh(agent)
+    return agent
+
+
+@traced()
+async def delete_agent(db: AsyncSession, agent: Agent):
+    await db.delete(agent)
+    await db.commit()
+
+
+@traced()
+async def list_agents(db: AsyncSession, enabled_only: bool = False,
+                      limit: int = None, offset: int = 0):
+    q = select(Agent).order_by(Agent.id)
+    if enabled_only:
+        q = q.where(Agent.enabled.is_(True))
+    if limit is not None:
+        q = q.limit(limit).offset(offset)
+    return (await db.execute(q)).scalars().all()
+
+
+# ===================================================
+# OPEN PORT (HASIL PORT SCAN)
+# ===================================================
+def save_open_ports(db: Session, items: list):
+    # items: [{"scan_id", "host", "port", "hostname", "banner", "latency_ms"}]
+    # upsert per (host, port): first_seen tetap, sisanya diperbarui
+    keys = list({(it["host"], it["port"]) for it in items})
+    existing = {}
+    for i in range(0, len(keys), 500):
+        rows = db.query(OpenPort.id, OpenPort.host, OpenPort.port).filter(
+            tuple_(OpenPort.host, OpenPort.port).in_(keys[i:i + 500])).all()
+        existing.update({(h, p): id_ for id_, h, p in rows})
+    now = datetime.now().replace(microsecond=0)
+    inserts, updates = {}, []
+    for it in items:
+        row = {k: it.get(k) for k in ("scan_id", "host", "port", "hostname", "banner", "latency_ms")}
+        row["last_seen"] = now
+        if row["banner"]:
+            row["banner"] = row["banner"][:255]
+        key = (row["host"], row["port"])
+        if key in existing:
+            updates.append({"id": existing[key], **row})
+        else:
+            inserts[key] = row
+    db.bulk_insert_mappings(OpenPort, list(inserts.values()))
+    db.bulk_update_mappings(OpenPort, updates)
+    db.commit()
+
+
+@traced()
+async def list_open_ports(db: AsyncSession, host: str = None, port: int = None,
+                          scan_id: str = None, limit: int = 100, offset: int = 0):
+    q = select(OpenPort).order_by(OpenPort.host, OpenPort.port)
+    if host:
+        q = q.where(OpenPort.host == host)
+    if port is not None:
+        q = q.where(OpenPort.port == port)
+    if scan_id:
+        q = q.where(OpenPort.scan_id == scan_id)
+    return (await db.execute(q.limit(limit).offset(offset))).scalars().all()
@@ -1,25 +1,91 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-# Ganti sesuai user, password, dan nama database MySQL kamu
-DATABASE_URL = "mysql+mysqlconnector://root:@localhost/scan_db"
+from app import config
+
+# Ganti lewat env DATABASE_URL (user, password, dan nama database MySQL kamu)
+DATABASE_URL = config.DATABASE_URL
+
+# driver sync -> driver async dengan dialect yang sama
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base, Session
 
-DATABASE_URL = "mysql+mysqlconnector://root:@localhost/scan_db"
+def pool_options(url: str):
+    opts = {
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        opts.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+        )
+    return opts
 
-engine = create_engine(DATABASE_URL)
+
+def async_url(url: str):
+    if config.ASYNC_DATABASE_URL:
+        return config.ASYNC_DATABASE_URL
+    u = make_url(url)
+    driver = ASYNC_DRIVERS.get(u.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"Tidak ada driver async untuk {u.drivername}, isi ASYNC_DATABASE_URL")
+    return u.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# ===============================
+#  SYNC (admin, pegawai, auth, writer thread)
+# ===============================
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# ✅ Tambahkan fungsi ini
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# ===============================
+#  ASYNC (route scan)
+# ===============================
+# dibuat saat pertama dipakai, supaya driver async (aiomysql) cukup
+# terpasang di server yang memang menjalankan route scan
+_async_engine = None
+_async_session = None
+
+
+def get_async_engine():
+    global _async_engine, _async_session
+    if _async_engine is None:
+        url = async_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, **pool_options(url))
+        _async_session = async_sessionmaker(_async_engine, expire_on_commit=False, autoflush=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    get_async_engine()
+    return _async_session()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _async_engine, _async_session
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = _async_session = None
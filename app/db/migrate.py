@@ -0,0 +1,59 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+log = logging.getLogger(__name__)
+
+# ===================================================
+# MIGRASI RINGAN (TAMBAH KOLOM / INDEX BARU)
+# ===================================================
+# create_all hanya membuat tabel yang belum ada. Kolom baru di model
+# (nullable) ditambahkan ke tabel lama lewat ALTER TABLE di sini, begitu
+# juga index baru di __table_args__.
+
+
+def add_missing_columns(engine, metadata):
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    added = []
+
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in existing:
+                    continue
+                if not col.nullable and col.server_default is None:
+                    log.warning("Kolom %s.%s wajib diisi, tambahkan manual", table.name, col.name)
+                    continue
+                ddl = CreateColumn(col).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                added.append(f"{table.name}.{col.name}")
+
+    if added:
+        log.info("Kolom baru ditambahkan: %s", ", ".join(added))
+    return added
+
+
+def add_missing_indexes(engine, metadata):
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    added = []
+
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                index.create(bind=conn)
+                added.append(index.name)
+
+    if added:
+        log.info("Index baru ditambahkan: %s", ", ".join(added))
+    return added
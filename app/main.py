@@ -1,17 +1,90 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 
 # Router
 from app.routes import admin, pegawai, auth
-from app.routes.scan import router as scan_router
+from app.routes.metrics import router as metrics_router
+from app.routes.scan import router as scan_router, resume_interrupted_jobs, make_monitor_check, make_agent_sink
 
 # Database
-from app.db.database import Base, engine
+from app.db.database import Base, engine, dispose_async_engine, get_async_engine
+from app.db.migrate import add_missing_columns, add_missing_indexes
+
+# Services
+from app.services.scan_client import scan_client
+from app.services.dns_resolver import resolver
+from app.services.scan_writer import scan_writer
+from app.services.scan_jobs import job_manager
+from app.services.ws_hub import manager as ws_manager
+from app.services.retention import retention
+from app.services.payload_store import payload_store
+from app.services.monitor import monitor
+from app.services.agent_fleet import agent_poller
+from app.services.port_scanner import port_scanner
+from app.services.validator_cache import validator_cache
+from app.services.prom import REGISTRY
+from app.services.request_trace import TracingMiddleware
+
+from app import config
+
+log = logging.getLogger(__name__)
 
 # ===============================
 #  CREATE TABLES (AUTO)
 # ===============================
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, Base.metadata)
+add_missing_indexes(engine, Base.metadata)
+
+# ===============================
+#  LIFESPAN (START / STOP SERVICE)
+# ===============================
+def async_db_available(service: str):
+    # driver async belum terpasang -> server tetap jalan tanpa service ini
+    try:
+        get_async_engine()
+    except (ImportError, RuntimeError) as e:
+        log.warning("%s tidak dijalankan: driver async DB tidak tersedia (%s)", service, e)
+        return False
+    return True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await REGISTRY.start()
+    await scan_client.start()
+    await resolver.start()
+    await scan_writer.start()
+    await validator_cache.start()
+    await job_manager.start()
+    await retention.start()
+    await payload_store.start()
+    if config.SCAN_JOB_AUTO_RESUME:
+        await resume_interrupted_jobs()
+    if config.MONITOR_ENABLED and async_db_available("Monitor"):
+        await monitor.start(make_monitor_check())
+    if config.AGENT_POLL_ENABLED and async_db_available("Polling agent"):
+        await agent_poller.start(make_agent_sink())
+    try:
+        yield
+    finally:
+        # job dihentikan dulu (checkpoint "interrupted"), baru writer di-flush
+        await monitor.stop()
+        await agent_poller.stop()
+        await port_scanner.stop()
+        await payload_store.stop()
+        await retention.stop()
+        await job_manager.stop()
+        await ws_manager.stop()
+        await scan_writer.stop()
+        await validator_cache.stop()
+        await resolver.stop()
+        await scan_client.stop()
+        await dispose_async_engine()
+        # terakhir: file metrics proses ini ikut berisi counter dari shutdown
+        await REGISTRY.stop()
 
 # ===============================
 #  INIT FASTAPI
@@ -19,9 +92,13 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(
     title="Sistem Login, CRUD Pegawai & Network/Web Scanner",
     description="Aplikasi manajemen pegawai + scanner jaringan & website real-time",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
+# span per request -> header Server-Timing, log request lambat, ?profile=1
+app.add_middleware(TracingMiddleware)
+
 # ===============================
 #  REGISTER ROUTERS
 # ===============================
@@ -52,6 +129,12 @@ app.include_router(
     scan_router
 )
 
+# Prometheus scrape (tanpa prefix: GET /metrics)
+app.include_router(
+    metrics_router,
+    tags=["Metrics"]
+)
+
 # ===============================
 #  ROOT REDIRECT
 # ===============================
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Text, DateTime
+from sqlalchemy import Column, String, Integer, BigInteger, Text, DateTime, Boolean, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
@@ -34,13 +34,159 @@ class Pegawai(Base):
 # ==========================================
 class ScanHistory(Base):
     __tablename__ = "scan_history"
+    # index untuk /scan/history (keyset pagination di (created_at, id) + filter)
+    __table_args__ = (
+        Index("ix_scan_history_created", "created_at", "id"),
+        Index("ix_scan_history_source_created", "source", "created_at", "id"),
+        Index("ix_scan_history_status_created", "status_code", "created_at", "id"),
+        Index("ix_scan_history_host_created", "host", "created_at", "id"),
+        Index("ix_scan_history_url", "url"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     url = Column(String(512), nullable=False)
+    host = Column(String(255), nullable=True)   # host dari url, untuk filter per domain
     status_code = Column(Integer, nullable=True)
     latency_ms = Column(Integer, nullable=True)
+    # waktu per fase (ms); connect/tls kosong kalau koneksi keep-alive dipakai ulang
+    dns_ms = Column(Integer, nullable=True)
+    connect_ms = Column(Integer, nullable=True)
+    tls_ms = Column(Integer, nullable=True)
+    ttfb_ms = Column(Integer, nullable=True)
+    download_ms = Column(Integer, nullable=True)
     content_length = Column(Integer, nullable=True)
-    dns = Column(Text, nullable=True)
+    truncated = Column(Boolean, nullable=True)          # body dipotong di SCAN_MAX_BODY_BYTES
+    content_hash = Column(String(32), nullable=True)    # blake2b-128 hex dari body yang dibaca
+    content_changed = Column(Boolean, nullable=True)    # konten beda dari scan sebelumnya (None = belum ada pembanding)
+    dns = Column(Text, nullable=True)                    # lama; baris baru pakai payload_hash
+    payload_hash = Column(String(32), nullable=True)    # -> scan_payload.hash (DNS / snapshot network)
     error = Column(Text, nullable=True)
     source = Column(String(50), nullable=True)  # web, agent, bulk
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+# ==========================================
+# MODEL SCAN PAYLOAD (CONTENT-ADDRESSED)
+# ==========================================
+class ScanPayload(Base):
+    __tablename__ = "scan_payload"
+
+    # blake2b-128 hex dari JSON yang sudah dinormalisasi; payload sama = satu baris
+    hash = Column(String(32), primary_key=True)
+    body = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# ==========================================
+# MODEL URL VALIDATOR (ETAG / LAST-MODIFIED)
+# ==========================================
+class UrlValidator(Base):
+    __tablename__ = "url_validator"
+
+    # blake2b-128 hex dari URL yang sudah dinormalisasi (URL bisa lebih panjang dari batas index)
+    url_hash = Column(String(32), primary_key=True)
+    url = Column(String(512), nullable=False)
+    etag = Column(String(255), nullable=True)
+    last_modified = Column(String(64), nullable=True)
+    content_hash = Column(String(32), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# ==========================================
+# MODEL AGENT (REGISTRY MESIN YANG MENJALANKAN AGENT)
+# ==========================================
+class Agent(Base):
+    __tablename__ = "agent"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, index=True)
+    mode = Column(String(10), nullable=False, default="pull", server_default="pull")  # pull / push
+    address = Column(String(255), nullable=True)    # base URL (mode pull), mis. http://10.0.0.12:8008
+    token = Column(String(255), nullable=True)      # x-agent-token (wajib untuk mode push)
+    labels = Column(Text, nullable=True)            # JSON list, mis. ["lantai-2", "wifi"]
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# ==========================================
+# MODEL OPEN PORT (HASIL /scan/ports)
+# ==========================================
+class OpenPort(Base):
+    __tablename__ = "open_port"
+    __table_args__ = (
+        Index("ux_open_port_host_port", "host", "port", unique=True),
+        Index("ix_open_port_port", "port"),
+    )
+
+    # hanya port open yang disimpan; scan ulang memperbarui baris yang sama
+    id = Column(Integer, primary_key=True, index=True)
+    host = Column(String(45), nullable=False)        # IPv4 / IPv6
+    port = Column(Integer, nullable=False)
+    hostname = Column(String(255), nullable=True)
+    banner = Column(String(255), nullable=True)
+    latency_ms = Column(Integer, nullable=True)
+    scan_id = Column(String(32), nullable=True)
+    first_seen = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# ==========================================
+# MODEL SCAN JOB (BULK SCAN)
+# ==========================================
+class ScanJob(Base):
+    __tablename__ = "scan_job"
+
+    id = Column(String(32), primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="running")  # running, done, cancelled, failed, interrupted
+    source = Column(String(50), nullable=True)
+    input_path = Column(String(512), nullable=False)
+    content_type = Column(String(100), nullable=True)
+    total = Column(Integer, nullable=True)
+    # checkpoint: semua index < cursor sudah selesai; done/failed dihitung sampai cursor
+    cursor = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# ==========================================
+# MODEL SCAN ROLLUP (ANALYTICS PER URL)
+# ==========================================
+class ScanRollup(Base):
+    __tablename__ = "scan_rollup"
+    __table_args__ = (
+        Index("ux_scan_rollup_key", "url", "resolution", "bucket_start", unique=True),
+        Index("ix_scan_rollup_bucket", "resolution", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(512), nullable=False)
+    resolution = Column(String(3), nullable=False)      # 1m, 1h, 1d
+    bucket_start = Column(DateTime, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)   # gagal konek / timeout
+    status_2xx = Column(Integer, nullable=False, default=0)
+    status_3xx = Column(Integer, nullable=False, default=0)
+    status_4xx = Column(Integer, nullable=False, default=0)
+    status_5xx = Column(Integer, nullable=False, default=0)
+    latency_sum = Column(BigInteger, nullable=False, default=0)
+    latency_min = Column(Integer, nullable=True)
+    latency_max = Column(Integer, nullable=True)
+    sketch = Column(Text, nullable=True)                # LatencySketch JSON
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+# ==========================================
+# MODEL MONITOR TARGET (SCAN TERJADWAL)
+# ==========================================
+class MonitorTarget(Base):
+    __tablename__ = "monitor_target"
+
+    id = Column(Integer, primary_key=True, index=True)
+    url = Column(String(512), nullable=False)
+    interval_s = Column(Integer, nullable=False, default=60)
+    # tick terlewat (server sibuk / restart): skip = lompat, catchup = susul
+    missed_policy = Column(String(10), nullable=False, default="skip")
+    enabled = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
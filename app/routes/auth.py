@@ -15,8 +15,9 @@ async def login_page(request: Request):
 
 
 # === POST: Proses login ===
+# def biasa (bukan async): query sync dijalankan FastAPI di threadpool
 @router.post("/login")
-async def login_action(
+def login_action(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+from app.services.prom import REGISTRY, Gauge, OPENMETRICS_TYPE, TEXT_TYPE
+from app.services.ws_hub import manager
+from app.services.scan_writer import scan_writer
+from app.services.scan_jobs import job_manager
+from app.services.agent_fleet import agent_poller
+from app.services.port_scanner import port_scanner
+from app.services.metrics_store import metrics_store
+
+router = APIRouter()
+
+# ======================================
+# GAUGE STATE SERVICE (DIHITUNG SAAT SCRAPE)
+# ======================================
+
+def _writer_queue():
+    queue = scan_writer._queue
+    return queue.qsize() if queue is not None else 0
+
+
+Gauge("scanner_ws_clients", "Client WebSocket tersambung", fn=lambda: manager.snapshot()["clients"])
+Gauge("scanner_ws_backlog_frames", "Total frame antri di semua client WebSocket",
+      fn=lambda: manager.snapshot()["backlog"])
+Gauge("scanner_ws_max_backlog_frames", "Antrian frame terpanjang satu client WebSocket",
+      fn=lambda: manager.snapshot()["max_backlog"])
+Gauge("scanner_writer_queue_depth", "Scan yang menunggu ditulis ke scan_history", fn=_writer_queue)
+Gauge("scanner_bulk_jobs_running", "Bulk job yang sedang berjalan",
+      fn=lambda: sum(1 for j in job_manager.jobs.values() if j.status == "running"))
+Gauge("scanner_port_scans_running", "Port scan yang sedang berjalan", fn=port_scanner.running)
+Gauge("scanner_agents", "Agent terdaftar per status", ("status",),
+      fn=lambda: agent_poller.snapshot()["status"])
+Gauge("scanner_live_series", "Series ring buffer /scan/metrics per kind", ("kind",),
+      fn=lambda: metrics_store.snapshot()["series"])
+
+
+# ======================================
+# GET /metrics (PROMETHEUS SCRAPE)
+# ======================================
+# Accept berisi application/openmetrics-text -> format OpenMetrics,
+# selain itu text format 0.0.4 (default Prometheus lama).
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    return Response(REGISTRY.render(openmetrics=openmetrics),
+                    media_type=OPENMETRICS_TYPE if openmetrics else TEXT_TYPE)
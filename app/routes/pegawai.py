@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
 from app.db.database import get_db
@@ -59,17 +60,23 @@ def edit_pegawai_form(id_pegawai: str, request: Request, db: Session = Depends(g
 async def edit_pegawai_submit(id_pegawai: str, request: Request, db: Session = Depends(get_db)):
     form = await request.form()
 
-    pegawai = db.query(Pegawai).filter(Pegawai.id_pegawai == id_pegawai).first()
-    if not pegawai:
-        raise HTTPException(status_code=404, detail="Pegawai tidak ditemukan")
+    # session sync -> jalankan di threadpool supaya event loop tidak ikut menunggu DB
+    def simpan():
+        pegawai = db.query(Pegawai).filter(Pegawai.id_pegawai == id_pegawai).first()
+        if not pegawai:
+            return False
 
-    pegawai.nama = form.get("nama")
-    pegawai.email = form.get("email")
-    pegawai.jabatan = form.get("jabatan")
-    pegawai.pangkat = form.get("pangkat")
+        pegawai.nama = form.get("nama")
+        pegawai.email = form.get("email")
+        pegawai.jabatan = form.get("jabatan")
+        pegawai.pangkat = form.get("pangkat")
 
-    db.commit()
-    db.refresh(pegawai)
+        db.commit()
+        db.refresh(pegawai)
+        return True
+
+    if not await run_in_threadpool(simpan):
+        raise HTTPException(status_code=404, detail="Pegawai tidak ditemukan")
 
     return RedirectResponse(
         url=f"/pegawai/dashboard/{id_pegawai}",
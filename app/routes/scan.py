@@ -1,17 +1,60 @@
-from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
-import asyncio, time, socket, json, subprocess, httpx
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, JSONResponse
+from pydantic import BaseModel, ValidationError
+import asyncio, time, json, logging, base64, hmac, os, zlib
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import List, Optional, Union
+from sqlalchemy.ext.asyncio import AsyncSession
 
-# DB
-from app.db.database import get_db
-from app.db.crud import create_scan_history, list_scan_history
+from app import config
 
-# Utils parser windows
-from app.utils.parse_utils import parse_netsh_interfaces, parse_ipconfig
+# DB
+from app.db.database import get_async_db
+from app.db.crud import (
+    query_scan_history,
+    create_monitor_target,
+    get_monitor_target,
+    update_monitor_target,
+    delete_monitor_target,
+    list_monitor_targets,
+    create_agent,
+    get_agent,
+    get_agent_by_name,
+    update_agent,
+    delete_agent,
+    list_agents,
+    list_open_ports,
+)
+from app.models.models import ScanHistory
+
+from app.utils.url_source import save_upload, write_url_list, UploadTooLarge
+from app.utils.url_utils import url_host, with_scheme
+from app.utils.tracing import span, record, current
+
+# Shared HTTP client (pooled)
+from app.services.scan_client import scan_client, read_bounded, PhaseTracer
+from app.services.scan_writer import scan_writer
+from app.services.scan_jobs import job_manager
+from app.services.concurrency import is_overload
+from app.services.ws_hub import manager
+from app.services.rollups import RESOLUTIONS, window_stats, series as rollup_series
+from app.services.retention import retention, dedupe_rows
+from app.services.payload_store import payload_store, dns_payload
+from app.services.monitor import monitor, POLICIES
+from app.services.validator_cache import validator_cache, conditional_headers
+from app.services.scan_dedup import ScanDedup, scan_dedup
+from app.services.net_collector import net_collector
+from app.services.agent_fleet import agent_poller, agent_labels, NeedFull
+from app.services.port_scanner import port_scanner
+from app.services.metrics_store import metrics_store, KINDS as METRIC_KINDS
+from app.services.request_trace import tracer as request_tracer, admin_allowed
+from app.services.prom import (
+    SCANS_INFLIGHT, SCAN_DURATION, SCAN_RESULTS, AGENT_INGEST_SAMPLES, AGENT_INGEST_BYTES,
+)
 
 router = APIRouter(prefix="/scan", tags=["Scan"])
+log = logging.getLogger(__name__)
 
 # ======================
 # INPUT MODELS
@@ -19,50 +62,72 @@ router = APIRouter(prefix="/scan", tags=["Scan"])
 
 class RunScanIn(BaseModel):
     url: str
+    fresh: bool = False     # True = jangan pakai hasil cache (scan yang sedang jalan tetap digabung)
 
 class BulkScanIn(BaseModel):
     urls: List[str]
 
-# ======================
-# WEBSOCKET MANAGER
-# ======================
-
-class ConnectionManager:
-    def __init__(self):
-        self.active = []
-
-    async def connect(self, ws: WebSocket):
-        await ws.accept()
-        self.active.append(ws)
-
-    def disconnect(self, ws: WebSocket):
-        if ws in self.active:
-            self.active.remove(ws)
-
-    async def broadcast(self, message: dict):
-        text = json.dumps(message, default=str)
-        for ws in list(self.active):
-            try:
-                await ws.send_text(text)
-            except:
-                self.disconnect(ws)
-
-manager = ConnectionManager()
+class AgentIn(BaseModel):
+    name: str
+    mode: str = "pull"              # pull = server mem-poll agent, push = agent upload sendiri
+    address: Optional[str] = None   # wajib untuk mode pull
+    token: Optional[str] = None     # wajib untuk mode push
+    labels: List[str] = []
+    enabled: bool = True
+
+class AgentPatch(BaseModel):
+    name: Optional[str] = None
+    mode: Optional[str] = None
+    address: Optional[str] = None
+    token: Optional[str] = None
+    labels: Optional[List[str]] = None
+    enabled: Optional[bool] = None
+
+class AgentPushIn(BaseModel):
+    agent: str
+    session: Optional[str] = None   # id proses agent; berubah = seq mulai dari awal
+    base_seq: Optional[int] = None  # None = sample pertama berisi snapshot penuh
+    samples: List[dict]
+
+class MonitorTargetIn(BaseModel):
+    url: str
+    interval_s: int = 60
+    missed_policy: str = "skip"
+    enabled: bool = True
+
+class MonitorTargetPatch(BaseModel):
+    url: Optional[str] = None
+    interval_s: Optional[int] = None
+    missed_policy: Optional[str] = None
+    enabled: Optional[bool] = None
+
+class PortScanIn(BaseModel):
+    targets: Union[str, List[str]]              # "10.0.0.0/24, router.lan" / ["10.0.0.1", ...]
+    ports: Union[str, List[int]] = "top"        # "22,80,8000-8100" / "top" / [22, 80]
+    concurrency: Optional[int] = None
+    timeout: Optional[float] = None             # connect timeout (detik)
+    rate_per_host: Optional[float] = None       # probe/detik per host, 0 = tanpa batas
+    banner: bool = False
 
 # ======================================
 # SUMMARY HELPERS
 # ======================================
 
 def summarize_network(wifi, ip_data):
+    gateway = ip_data.get("gateway") if isinstance(ip_data, dict) else None
+    has_gateway = gateway and str(gateway).strip() not in ("", "0.0.0.0", "None")
+
     # Jika wifi tidak ada atau tidak connected
     if not wifi or wifi.get("state") != "connected":
+        # mesin kabel (mis. server linux): cukup cek default route
+        if not wifi and has_gateway:
+            return "Terhubung lewat kabel"
         return "Tidak terhubung ke WiFi"
 
-    signal = wifi.get("signal_pct", 0)
-    gateway = ip_data.get("gateway") if isinstance(ip_data, dict) else None
+    signal = wifi.get("signal_pct") or 0
 
     # Jika gateway tidak ada -> tidak ada akses internet
-    if not gateway or str(gateway).strip() in ("", "0.0.0.0", "None"):
+    if not has_gateway:
         return "Tidak ada akses internet"
 
     # Berdasarkan signal
@@ -74,237 +139,757 @@ def summarize_network(wifi, ip_data):
         return "Jaringan buruk"
     return "Sinyal sangat buruk"
 
-def summarize_web(result):
-    # result: dict dengan keys status_code, elapsed_ms, error, dns
+# fase yang paling dominan menentukan penyebab "lambat"
+PHASE_LABELS = {
+    "dns_ms": "DNS lambat",
+    "connect_ms": "koneksi TCP lambat",
+    "tls_ms": "handshake TLS lambat",
+    "ttfb_ms": "server lama merespon",
+    "download_ms": "download lambat",
+}
+
+def slow_phase(timing, total):
+    if not timing or total <= 0:
+        return None
+    phases = {k: v for k, v in timing.items() if k in PHASE_LABELS and v}
+    if not phases:
+        return None
+    name, ms = max(phases.items(), key=lambda kv: kv[1])
+    # hanya disebut kalau fase itu memakan minimal separuh waktu
+    return PHASE_LABELS[name] if ms * 2 >= total else None
+
+# jenis hasil scan web -> (label metrics scanner_scan_results_total, ringkasan)
+WEB_RESULTS = {
+    "connect_timeout": ("timeout", "Website tidak dapat dijangkau (timeout koneksi)"),
+    "read_timeout": ("timeout", "Website tidak merespon (timeout menunggu respon)"),
+    "timeout": ("timeout", "Website tidak dapat dijangkau (timeout)"),
+    "dns": ("dns", "Domain tidak ditemukan"),
+    "connect_error": ("connect_error", "Website tidak dapat diakses"),
+    "no_response": ("no_response", "Tidak ada respon"),
+    "fast": ("fast", "Website cepat"),
+    "slow": ("slow", "Website lambat"),
+    "very_slow": ("very_slow", "Website sangat lambat"),
+    "redirect": ("redirect", "Redirect (3xx)"),
+    "client_error": ("client_error", "Client error (4xx)"),
+    "server_error": ("server_error", "Server error (5xx)"),
+    "unknown": ("unknown", "Status tidak diketahui"),
+}
+
+def web_latency(result):
+    return (result.get("elapsed_ms") or 0) + ((result.get("timing") or {}).get("dns_ms") or 0)
+
+def classify_web(result):
+    """Jenis hasil (kunci WEB_RESULTS); dipakai summarize_web dan counter metrics."""
+    # result: dict dengan keys status_code, elapsed_ms, error, error_type, dns, timing
     if result.get("error"):
         # coba deteksi jenis error sederhana
         err = result["error"].lower()
+        err_type = result.get("error_type")
+        if err_type == "ConnectTimeout":
+            return "connect_timeout"
+        if err_type == "ReadTimeout":
+            return "read_timeout"
         if "timed out" in err or "timeout" in err:
-            return "Website tidak dapat dijangkau (timeout)"
+            return "timeout"
         if "name or service not known" in err or "getaddrinfo" in err or "nodename nor servname" in err:
-            return "Domain tidak ditemukan"
-        return "Website tidak dapat diakses"
+            return "dns"
+        if err_type == "ConnectError" and result.get("dns") is None:
+            return "dns"
+        return "connect_error"
 
     code = result.get("status_code")
-    latency = result.get("elapsed_ms") or 0
-
     if code is None:
-        return "Tidak ada respon"
+        return "no_response"
 
-    if 200 <= code < 300:
-        if latency < 300:
-            return "Website cepat"
-        elif latency < 1000:
-            return "Website lambat"
-        else:
-            return "Website sangat lambat"
+    # 304 = konten tidak berubah sejak scan terakhir (conditional request)
+    if 200 <= code < 300 or code == 304:
+        latency = web_latency(result)
+        return "fast" if latency < 300 else "slow" if latency < 1000 else "very_slow"
     if 300 <= code < 400:
-        return "Redirect (3xx)"
+        return "redirect"
     if 400 <= code < 500:
-        return "Client error (4xx)"
+        return "client_error"
     if 500 <= code < 600:
-        return "Server error (5xx)"
-    return "Status tidak diketahui"
+        return "server_error"
+    return "unknown"
+
+def summarize_web(result, kind: str = None):
+    kind = kind or classify_web(result)
+    verdict = WEB_RESULTS[kind][1]
+    if kind in ("slow", "very_slow"):
+        cause = slow_phase(result.get("timing") or {}, web_latency(result))
+        return f"{verdict} ({cause})" if cause else verdict
+    return verdict
 
 # ======================================
 # FUNGSI HTTP SCAN
 # ======================================
 
-async def do_http_scan(url: str, timeout=15):
-    if not url.startswith(("http://", "https://")):
-        url = "http://" + url
+async def do_http_scan(url: str, **kwargs):
+    # scan in-flight + durasi untuk /metrics
+    SCANS_INFLIGHT.inc()
+    try:
+        with SCAN_DURATION.time(), span("scan", url=url):
+            return await _http_scan(url, **kwargs)
+    finally:
+        SCANS_INFLIGHT.dec()
+
+async def _http_scan(url: str, timeout=None,
+                       max_body: int = config.SCAN_MAX_BODY_BYTES,
+                       head_first: bool = config.SCAN_HEAD_FIRST,
+                       hash_body: bool = config.SCAN_HASH_BODY,
+                       conditional: bool = config.SCAN_CONDITIONAL):
+    # timeout=None -> pakai timeout connect/read dari scan_client
+    url = with_scheme(url)
 
     result = {
         "url": url,
         "status_code": None,
         "elapsed_ms": None,
         "content_length": None,
+        "truncated": False,
+        "content_hash": None,
+        "content_changed": None,
         "dns": None,
-        "error": None
+        "timing": {
+            "dns_ms": None,
+            "connect_ms": None,
+            "tls_ms": None,
+            "ttfb_ms": None,
+            "download_ms": None,
+        },
+        "error": None,
+        "error_type": None
     }
-
-    # HTTP part
+    timing = result["timing"]
+    host = url_host(url)
+
+    # DNS part (non-blocking, lewat cache resolver). Connect memakai hasil
+    # lookup yang sama (ResolvingBackend), jadi waktu DNS tidak masuk connect_ms
+    t = time.perf_counter()
+    with span("dns"):
+        result["dns"] = await scan_client.resolver.resolve(host)
+    timing["dns_ms"] = int((time.perf_counter() - t)*1000)
+
+    # validator scan sebelumnya -> conditional request (304 = tidak berubah)
+    with span("validator"):
+        prev = await validator_cache.get(url) if conditional else None
+    etag = last_modified = None
+
+    # HTTP part (body di-stream, tidak pernah disimpan utuh di memori)
+    tracer = PhaseTracer()
+    start = None
     try:
-        start = time.time()
-        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as c:
-            r = await c.get(url)
-        result["status_code"] = r.status_code
-        result["elapsed_ms"] = int((time.time() - start)*1000)
-        result["content_length"] = len(r.content)
+        client = scan_client.get()
+        kwargs = {"extensions": {"trace": tracer}}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if prev is not None:
+            kwargs["headers"] = conditional_headers(prev)
+        async with scan_client.host_slot(host):
+            # waktu diukur setelah dapat slot host, jadi antrian tidak ikut terhitung
+            start = time.perf_counter()
+            done = False
+
+            if head_first:
+                r = await client.head(url, **kwargs)
+                length = r.headers.get("content-length")
+                if r.status_code == 304:
+                    result["status_code"] = 304
+                    done = True
+                elif r.status_code < 400 and length and length.isdigit():
+                    result["status_code"] = r.status_code
+                    result["content_length"] = int(length)
+                    done = True
+                if done:
+                    etag, last_modified = r.headers.get("etag"), r.headers.get("last-modified")
+
+            if not done:
+                async with client.stream("GET", url, **kwargs) as r:
+                    result["status_code"] = r.status_code
+                    etag, last_modified = r.headers.get("etag"), r.headers.get("last-modified")
+                    t = time.perf_counter()
+                    (result["content_length"],
+                     result["truncated"],
+                     result["content_hash"]) = await read_bounded(r, max_body, hash_body)
+                    timing["download_ms"] = int((time.perf_counter() - t)*1000)
+
+            result["elapsed_ms"] = int((time.perf_counter() - start)*1000)
     except Exception as e:
-        result["error"] = str(e)
-
-    # DNS part
-    try:
-        host = url.split("//")[1].split("/")[0]
-        result["dns"] = socket.gethostbyname_ex(host)
-    except:
-        result["dns"] = None
+        result["error"] = str(e) or type(e).__name__
+        result["error_type"] = type(e).__name__
+
+    # connect / TLS None = koneksi keep-alive dipakai ulang
+    for field in ("connect_ms", "tls_ms", "ttfb_ms"):
+        value = getattr(tracer, field)
+        timing[field] = None if value is None else int(value)
+    if start is not None:
+        # span http dimulai setelah dapat slot host (antrian = span host_wait)
+        record(current(), "http", start, time.perf_counter(), status=result["status_code"],
+               **{k: v for k, v in timing.items() if v is not None and k != "dns_ms"})
+
+    if conditional and result["error"] is None:
+        if result["status_code"] == 304:
+            result["content_length"] = None   # tidak ada body
+        result["content_changed"], result["content_hash"] = validator_cache.observe(
+            url, prev, result["status_code"], etag, last_modified, result["content_hash"])
 
     return result
 
+async def save_web_result(result, source: str):
+    """Simpan hasil do_http_scan lewat writer + broadcast ke dashboard."""
+    kind = classify_web(result)
+    web_summary = summarize_web(result, kind)
+
+    with span("db.write"):
+        rec = await scan_writer.submit(
+            url=result["url"],
+            host=url_host(result["url"]),
+            status_code=result["status_code"],
+            latency_ms=result["elapsed_ms"],
+            content_length=result["content_length"],
+            truncated=result["truncated"],
+            content_hash=result["content_hash"],
+            content_changed=result["content_changed"],
+            payload=dns_payload(result["dns"]),
+            error=result["error"],
+            source=source,
+            **result["timing"]
+        )
+    metrics_store.record_scan(result["url"], source, result["elapsed_ms"], result["status_code"])
+    SCAN_RESULTS.labels(source, WEB_RESULTS[kind][0]).inc()
+
+    with span("broadcast"):
+        await manager.broadcast({
+            "type": "scan_result",
+            "data": {
+                "id": rec.id,
+                "url": rec.url,
+                "status_code": rec.status_code,
+                "latency_ms": rec.latency_ms,
+                "content_changed": rec.content_changed,
+                "timing": result["timing"],
+                "summary": web_summary,
+                "source": source,
+                "created_at": str(rec.created_at)
+            }
+        })
+    return rec, web_summary
+
 # ======================================
 # 1. RUN SCAN (SINGLE)
 # ======================================
 
 @router.post("/run")
-async def run_scan(payload: RunScanIn, db: Session = Depends(get_db)):
+async def run_scan(payload: RunScanIn):
     url = payload.url.strip()
     if not url:
         raise HTTPException(400, "URL kosong")
 
-    result = await do_http_scan(url)
-
-    # generate web summary berdasarkan hasil
-    web_summary = summarize_web(result)
-
-    rec = create_scan_history(
-        db,
-        url=result["url"],
-        status_code=result["status_code"],
-        latency_ms=result["elapsed_ms"],
-        content_length=result["content_length"],
-        dns=json.dumps(result["dns"]),
-        error=result["error"],
-        source="run"
-    )
+    async def scan_once():
+        result = await do_http_scan(url)
+        # simpan + broadcast, summary dibuat dari hasil
+        rec, web_summary = await save_web_result(result, "run")
+        return {"result": result, "summary": web_summary, "id": rec.id}
 
-    await manager.broadcast({
-        "type": "scan_result",
-        "data": {
-            "id": rec.id,
-            "url": rec.url,
-            "status_code": rec.status_code,
-            "latency_ms": rec.latency_ms,
-            "summary": web_summary,
-            "created_at": str(rec.created_at)
-        }
-    })
-
-    return {"ok": True, "result": result, "summary": web_summary, "id": rec.id}
+    # request bersamaan ke URL yang sama -> satu scan, satu baris history
+    with span("dedup") as sp:
+        out, cache = await scan_dedup.run(url, scan_once, use_cache=not payload.fresh)
+        sp.set(cache=cache)
+    return {"ok": True, **out, "cache": cache}
 
 # ======================================
 # ALIAS /scan/web → sama seperti /scan/run
 # ======================================
 
 @router.post("/web")
-async def scan_web_alias(payload: RunScanIn, db: Session = Depends(get_db)):
-    return await run_scan(payload, db)
+async def scan_web_alias(payload: RunScanIn):
+    return await run_scan(payload)
 
 # ======================================
 # 2. BULK SCAN
 # ======================================
 
-scan_stop_flag = False
+def bulk_stream_mode(request: Request, stream: Optional[str], uploaded: bool):
+    if stream in ("ndjson", "sse"):
+        return stream
+    accept = request.headers.get("accept", "")
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept or uploaded:
+        # upload besar selalu di-stream, tidak ditahan di memori
+        return "ndjson"
+    return None
+
+def make_bulk_worker():
+    # URL kembar dalam satu job cukup di-probe sekali (termasuk yang error).
+    # Probe dijalankan langsung di task worker (bukan task terpisah), jadi
+    # cancel job ikut membatalkan probe yang sedang berjalan; duplikat
+    # hanya menunggu future hasil probe pertama.
+    seen = OrderedDict()    # URL kanonik -> Future hasil probe pertama
+
+    async def probe(u, limiter):
+        # slot limiter (adaptive, per job) hanya untuk probe HTTP; simpan ke
+        # DB di luar slot supaya writer bisa mengumpulkan batch yang besar
+        async with limiter.acquire(url_host(u)) as slot:
+            res = await do_http_scan(u)
+            slot.latency_ms = res["elapsed_ms"]
+            slot.dropped = is_overload(res)
+        try:
+            rec, web_summary = await save_web_result(res, "bulk")
+        except Exception as e:
+            # satu simpan gagal (DB / writer) tidak menggagalkan seluruh job:
+            # URL ini dihitung failed, job jalan terus
+            log.exception("Gagal menyimpan hasil bulk %s", u)
+            res["id"] = res["summary"] = None
+            res["save_error"] = str(e) or type(e).__name__
+            if not res["error"]:
+                res["error"] = f"Gagal menyimpan hasil: {res['save_error']}"
+                res["error_type"] = type(e).__name__
+            return res
 
-@router.post("/bulk")
-async def bulk_scan(payload: BulkScanIn, db: Session = Depends(get_db)):
-    global scan_stop_flag
-    scan_stop_flag = False
+        # tambahkan summary ke hasil worker
+        res["id"] = rec.id
+        res["summary"] = web_summary
+        return res
+
+    async def worker(u, limiter):
+        key = ScanDedup.key(u)
+        first = seen.get(key)
+        if first is not None:
+            seen.move_to_end(key)
+            res = await asyncio.shield(first)
+            return {**res, "duplicate": True}
+
+        fut = seen[key] = asyncio.get_running_loop().create_future()
+        while len(seen) > config.SCAN_BULK_DEDUP_SIZE:
+            seen.popitem(last=False)
+        try:
+            res = await probe(u, limiter)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()     # ditandai sudah dibaca (boleh tanpa duplikat)
+            raise
+        fut.set_result(res)
+        return res
+
+    return worker
+
+async def ndjson_stream(job):
+    yield json.dumps({"type": "job", "id": job.id}) + "\n"
+    async for idx, res in job.events():
+        yield json.dumps({"index": idx, **res}, default=str) + "\n"
+    yield json.dumps({"type": "done", **job.progress()}) + "\n"
+
+async def sse_stream(job):
+    yield "event: job\ndata: " + json.dumps({"id": job.id}) + "\n\n"
+    async for idx, res in job.events():
+        yield "event: result\ndata: " + json.dumps({"index": idx, **res}, default=str) + "\n\n"
+    yield "event: done\ndata: " + json.dumps(job.progress()) + "\n\n"
+
+@router.post(
+    "/bulk",
+    openapi_extra={"requestBody": {"content": {
+        "application/json": {"schema": {
+            "type": "object",
+            "properties": {"urls": {"type": "array", "items": {"type": "string"}}},
+            "required": ["urls"],
+        }},
+        "text/plain": {"schema": {"type": "string"}},
+        "text/csv": {"schema": {"type": "string"}},
+        "application/gzip": {"schema": {"type": "string", "format": "binary"}},
+    }}},
+)
+async def bulk_scan(request: Request, stream: Optional[str] = None, background: bool = False):
+    """
+    Body JSON {"urls": [...]} seperti biasa, atau upload besar sebagai
+    text/plain (satu URL per baris), text/csv, atau gzip dari keduanya
+    (csv dalam gzip dikenali dari header dengan kolom "url"). Body dibatasi
+    SCAN_BULK_MAX_UPLOAD_BYTES (413).
+    Hasil di-stream sebagai NDJSON / SSE lewat ?stream=ndjson|sse atau
+    header Accept; upload non-JSON selalu di-stream (default NDJSON).
+    ?background=true langsung mengembalikan job_id, progress lewat /scan/jobs.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    uploaded = content_type not in ("", "application/json")
+
+    limit = config.SCAN_BULK_MAX_UPLOAD_BYTES
+    length = request.headers.get("content-length", "")
+    if uploaded and limit and length.isdigit() and int(length) > limit:
+        raise HTTPException(413, f"Upload lebih dari {limit} byte")
+
+    job_id, path = job_manager.new_input_path()
+    total = None
+    if uploaded:
+        try:
+            with open(path, "wb") as f:
+                await save_upload(request, f, limit)
+        except UploadTooLarge as e:
+            # tanpa Content-Length (chunked): batas dicek sambil ditulis
+            await asyncio.to_thread(os.remove, path)
+            raise HTTPException(413, str(e))
+    else:
+        try:
+            payload = BulkScanIn(**await request.json())
+        except (ValueError, TypeError, ValidationError) as e:
+            raise HTTPException(422, str(e))
+        urls = [u.strip() for u in payload.urls if u.strip()]
+        if not urls:
+            raise HTTPException(400, "Tidak ada URL")
+        total = len(urls)
+        content_type = "text/plain"
+        with open(path, "wb") as f:
+            await asyncio.to_thread(write_url_list, f, urls)
+
+    mode = None if background else bulk_stream_mode(request, stream, uploaded)
+    job = await job_manager.submit(
+        job_id, path, make_bulk_worker(),
+        content_type=content_type, total=total, attach=not background,
+    )
 
-    urls = [u.strip() for u in payload.urls if u.strip()]
-    if not urls:
-        raise HTTPException(400, "Tidak ada URL")
+    if background:
+        return {"ok": True, "job_id": job.id, "job": job.progress()}
+    if mode == "ndjson":
+        return StreamingResponse(ndjson_stream(job), media_type="application/x-ndjson",
+                                 headers={"X-Scan-Job": job.id})
+    if mode == "sse":
+        return StreamingResponse(sse_stream(job), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Scan-Job": job.id})
+
+    # mode lama: satu JSON setelah semua selesai, urutan sama dengan input
+    collected = {}
+    async for idx, res in job.events():
+        collected[idx] = res
+    results = [collected[i] for i in sorted(collected)]
+    return {"ok": True, "job_id": job.id, "status": job.status,
+            "count": len(results), "results": results}
 
-    semaphore = asyncio.Semaphore(8)
+# ======================================
+# 3. STOP / JOB BULK SCAN
+# ======================================
 
-    async def worker(u):
-        global scan_stop_flag
-        if scan_stop_flag:
-            return {"url": u, "stopped": True}
+@router.post("/stop")
+async def stop_scan(job_id: Optional[str] = None):
+    # hanya job milik pemanggil yang dihentikan, tidak lagi semua bulk scan
+    if not job_id:
+        raise HTTPException(400, "job_id wajib diisi")
+    return await cancel_job(job_id)
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    return {"ok": True, "jobs": await job_manager.list_progress(limit)}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    progress = await job_manager.get_progress(job_id)
+    if progress is None:
+        raise HTTPException(404, "Job tidak ditemukan")
+    return {"ok": True, "job": progress}
+
+@router.get("/jobs/{job_id}/concurrency")
+async def get_job_concurrency(job_id: str):
+    job = job_manager.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job tidak aktif")
+    return {"ok": True, "job_id": job_id, "concurrency": job.limiter.snapshot(with_history=True)}
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    if not await job_manager.cancel(job_id):
+        raise HTTPException(404, "Job tidak ditemukan atau sudah selesai")
+    return {"ok": True, "message": "Bulk scan dihentikan",
+            "job": await job_manager.get_progress(job_id)}
+
+@router.post("/jobs/{job_id}/resume")
+async def resume_job(job_id: str):
+    try:
+        job = await job_manager.resume(job_id, make_bulk_worker())
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(409, str(e))
+    return {"ok": True, "job": job.progress()}
+
+async def resume_interrupted_jobs():
+    # dipanggil dari lifespan kalau SCAN_JOB_AUTO_RESUME aktif
+    for job_id in job_manager.interrupted:
+        try:
+            await job_manager.resume(job_id, make_bulk_worker())
+        except (LookupError, ValueError) as e:
+            log.warning("Job %s tidak bisa di-resume: %s", job_id, e)
 
-        async with semaphore:
-            res = await do_http_scan(u)
-            web_summary = summarize_web(res)
-
-            rec = create_scan_history(
-                db,
-                url=res["url"],
-                status_code=res["status_code"],
-                latency_ms=res["elapsed_ms"],
-                content_length=res["content_length"],
-                dns=json.dumps(res["dns"]),
-                error=res["error"],
-                source="bulk"
-            )
+# ======================================
+# 4. HISTORY
+# ======================================
 
-            await manager.broadcast({
-                "type": "scan_result",
-                "data": {
-                    "id": rec.id,
-                    "url": rec.url,
-                    "status_code": rec.status_code,
-                    "latency_ms": rec.latency_ms,
-                    "summary": web_summary,
-                    "created_at": str(rec.created_at)
-                }
-            })
+# kolom yang diambil per field output; dns & error hanya kalau diminta
+HISTORY_FIELDS = {
+    "id": [ScanHistory.id],
+    "url": [ScanHistory.url],
+    "host": [ScanHistory.host],
+    "status_code": [ScanHistory.status_code],
+    "latency_ms": [ScanHistory.latency_ms],
+    "content_length": [ScanHistory.content_length],
+    "truncated": [ScanHistory.truncated],
+    "content_hash": [ScanHistory.content_hash],
+    "content_changed": [ScanHistory.content_changed],
+    "timing": [ScanHistory.dns_ms, ScanHistory.connect_ms, ScanHistory.tls_ms,
+               ScanHistory.ttfb_ms, ScanHistory.download_ms],
+    "dns": [ScanHistory.dns, ScanHistory.payload_hash],
+    "error": [ScanHistory.error],
+    "source": [ScanHistory.source],
+    "created_at": [ScanHistory.created_at],
+}
+HISTORY_DEFAULT_FIELDS = [f for f in HISTORY_FIELDS if f not in ("dns", "error")]
+HISTORY_MAX_LIMIT = 1000
+
+def encode_history_cursor(created_at, row_id):
+    raw = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "cursor tidak valid")
+
+def history_row(r, fields, payloads=None):
+    out = {}
+    for f in fields:
+        if f == "timing":
+            out["timing"] = {
+                "dns_ms": r.dns_ms,
+                "connect_ms": r.connect_ms,
+                "tls_ms": r.tls_ms,
+                "ttfb_ms": r.ttfb_ms,
+                "download_ms": r.download_ms,
+            }
+        elif f == "created_at":
+            out["created_at"] = str(r.created_at)
+        elif f == "dns":
+            # baris lama: kolom dns; baris baru: payload lewat hash
+            out["dns"] = r.dns if r.dns is not None else (payloads or {}).get(r.payload_hash)
+        else:
+            out[f] = getattr(r, f)
+    return out
+
+def history_matcher(source=None, status_min=None, status_max=None,
+                    url_prefix=None, host=None, has_error=None):
+    # filter yang sama dengan query_scan_history, untuk baris arsip
+    def match(r):
+        if source and r.source != source:
+            return False
+        if status_min is not None and (r.status_code is None or r.status_code < status_min):
+            return False
+        if status_max is not None and (r.status_code is None or r.status_code > status_max):
+            return False
+        if url_prefix and not r.url.startswith(url_prefix):
+            return False
+        if host:
+            if host.endswith("*"):
+                if not (r.host or "").startswith(host[:-1]):
+                    return False
+            elif r.host != host:
+                return False
+        if has_error is not None and (r.error is not None) != has_error:
+            return False
+        return True
+    return match
 
-            # tambahkan summary ke hasil worker
-            res["summary"] = web_summary
-            return res
+@router.get("/history")
+async def get_history(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    source: Optional[str] = None,
+    status_min: Optional[int] = None,
+    status_max: Optional[int] = None,
+    url_prefix: Optional[str] = None,
+    host: Optional[str] = None,
+    has_error: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    archive: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # fields: daftar dipisah koma, atau "all" (termasuk dns & error)
+    if fields == "all":
+        wanted = list(HISTORY_FIELDS)
+    elif fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in HISTORY_FIELDS]
+        if unknown:
+            raise HTTPException(400, f"field tidak dikenal: {', '.join(unknown)}")
+    else:
+        wanted = HISTORY_DEFAULT_FIELDS
+
+    # created_at + id selalu diambil untuk cursor halaman berikutnya
+    columns = {ScanHistory.id, ScanHistory.created_at}
+    for f in wanted:
+        columns.update(HISTORY_FIELDS[f])
+    columns = sorted(columns, key=lambda c: c.key)
+
+    limit = max(1, min(limit, HISTORY_MAX_LIMIT))
+    cursor = decode_history_cursor(cursor) if cursor else None
+    filters = dict(
+        source=source, status_min=status_min, status_max=status_max,
+        url_prefix=url_prefix, host=host.lower() if host else None,
+        has_error=has_error,
+    )
+    rows = await query_scan_history(
+        db, columns, limit + 1, cursor=cursor, since=since, until=until, **filters
+    )
+
+    if archive:
+        # gabung dengan baris yang sudah dipindah retention ke file arsip
+        archived = await asyncio.to_thread(
+            retention.read, limit + 1, cursor=cursor, since=since, until=until,
+            match=history_matcher(**filters),
+        )
+        rows = sorted(list(rows) + archived, key=lambda r: (r.created_at, r.id), reverse=True)
+        rows = dedupe_rows(rows)[:limit + 1]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_history_cursor(last.created_at, last.id)
 
-    results = await asyncio.gather(*[worker(u) for u in urls])
-    return {"ok": True, "count": len(results), "results": results}
+    payloads = None
+    if "dns" in wanted:
+        payloads = await payload_store.load(db, [r.payload_hash for r in rows if r.dns is None])
+
+    return {
+        "ok": True,
+        "rows": [history_row(r, wanted, payloads) for r in rows],
+        "next_cursor": next_cursor,
+    }
 
 # ======================================
-# 3. STOP BULK SCAN
+# 4a. RETENTION / ARSIP
 # ======================================
 
-@router.post("/stop")
-async def stop_scan():
-    global scan_stop_flag
-    scan_stop_flag = True
-    return {"ok": True, "message": "Bulk scan dihentikan"}
+@router.get("/retention")
+async def retention_status():
+    return {"ok": True, "retention": await asyncio.to_thread(retention.snapshot)}
+
+@router.post("/retention/run")
+async def retention_run():
+    # jalankan arsip + compaction sekarang (tanpa menunggu jadwal)
+    if retention.days <= 0:
+        raise HTTPException(400, "Retention tidak aktif (RETENTION_DAYS=0)")
+    return {"ok": True, **await retention.run_once()}
+
+@router.get("/validators")
+async def validator_status():
+    # cache ETag / Last-Modified untuk conditional request
+    return {"ok": True, "enabled": config.SCAN_CONDITIONAL, "validators": validator_cache.snapshot()}
+
+@router.get("/dedup")
+async def dedup_status():
+    # single-flight + cache hasil /scan/run
+    return {"ok": True, "ttl": scan_dedup.ttl, "dedup": scan_dedup.snapshot()}
 
 # ======================================
-# 4. HISTORY
+# 4b. STATS (ROLLUP LATENCY / UPTIME)
 # ======================================
 
-@router.get("/history")
-def get_history(limit: int = 100, db: Session = Depends(get_db)):
-    rows = list_scan_history(db, limit)
-    return {
+WINDOW_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+def parse_window(window: str) -> timedelta:
+    # "30m", "24h", "7d"
+    try:
+        n, unit = int(window[:-1]), WINDOW_UNITS[window[-1]]
+    except (ValueError, KeyError, IndexError):
+        raise HTTPException(400, "window harus seperti 30m, 24h, 7d")
+    if n <= 0:
+        raise HTTPException(400, "window harus lebih dari 0")
+    return timedelta(**{unit: n})
+
+@router.get("/stats")
+async def get_stats(
+    url: str,
+    window: str = "24h",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    series: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # dihitung dari scan_rollup (1d / 1h / 1m), bukan dari scan_history
+    until = until or datetime.now()
+    since = since or until - parse_window(window)
+    if since >= until:
+        raise HTTPException(400, "since harus sebelum until")
+    if series is not None and series not in RESOLUTIONS:
+        raise HTTPException(400, f"series harus salah satu dari {', '.join(RESOLUTIONS)}")
+
+    out = {
         "ok": True,
-        "rows": [
-            {
-                "id": r.id,
-                "url": r.url,
-                "status_code": r.status_code,
-                "latency_ms": r.latency_ms,
-                "content_length": r.content_length,
-                "dns": r.dns,
-                "error": r.error,
-                "source": r.source,
-                "created_at": str(r.created_at)
-            }
-            for r in rows
-        ]
+        "url": url,
+        "since": str(since),
+        "until": str(until),
+        **await window_stats(db, url, since, until),
     }
+    if series:
+        out["series"] = await rollup_series(db, url, series, since, until)
+    return out
+
+@router.get("/metrics")
+async def get_metrics(kind: Optional[str] = None, key: Optional[str] = None,
+                      window: str = "1h", buckets: int = 60):
+    """
+    Series live dari memori (tanpa DB). Tanpa key: daftar series + titik
+    terakhir. kind=url&key=<url>, kind=source&key=web|bulk|monitor|agent|all,
+    kind=signal&key=local|agent:<nama> -> min / max / avg / count / errors
+    per bucket untuk window terakhir.
+    """
+    if kind is None or key is None:
+        return {"ok": True, "series": metrics_store.keys(), "store": metrics_store.snapshot()}
+    if kind not in METRIC_KINDS:
+        raise HTTPException(400, f"kind harus salah satu dari {', '.join(METRIC_KINDS)}")
+    if not 1 <= buckets <= config.METRICS_MAX_BUCKETS:
+        raise HTTPException(400, f"buckets harus 1-{config.METRICS_MAX_BUCKETS}")
+    window_s = parse_window(window).total_seconds()
+    points = metrics_store.query(kind, key, window_s, buckets)
+    if points is None:
+        raise HTTPException(404, "Series tidak ditemukan")
+    return {"ok": True, "kind": kind, "key": key, "window_s": window_s,
+            "bucket_s": window_s / buckets, "points": points}
+
+@router.get("/traces")
+async def get_traces(limit: int = 50):
+    """Request lambat terakhir (>= TRACE_SLOW_MS) beserta pohon span."""
+    return {"ok": True, **request_tracer.snapshot(max(1, min(limit, config.TRACE_LOG_SIZE)))}
 
 # ======================================
 # 5. SCAN NETWORK
 # ======================================
 
 @router.get("/network")
-async def scan_network(db: Session = Depends(get_db)):
+async def scan_network():
     try:
-        wifi_raw = subprocess.check_output("netsh wlan show interfaces", shell=True, text=True)
-        wifi = parse_netsh_interfaces(wifi_raw)
-
-        ip_raw = subprocess.check_output("ipconfig /all", shell=True, text=True)
-        ip_data = parse_ipconfig(ip_raw)
+        snap, fresh = await net_collector.collect()
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
 
-        # generate network summary
-        network_summary = summarize_network(wifi, ip_data)
+    wifi, ip_data = snap["wifi"], snap["ip"]
+    # generate network summary
+    network_summary = summarize_network(wifi, ip_data)
 
-        rec = create_scan_history(
-            db,
+    # snapshot dari cache sudah tersimpan & di-broadcast oleh request pertama
+    if fresh:
+        metrics_store.record_signal("local", (wifi or {}).get("signal_pct"))
+        rec = await scan_writer.submit(
             url="network://local",
             status_code=None,
             latency_ms=None,
             content_length=None,
-            dns=json.dumps({"wifi": wifi, "ip": ip_data}),
+            payload={"wifi": wifi, "ip": ip_data, "interfaces": snap["interfaces"]},
             error=None,
             source="network"
         )
@@ -320,47 +905,391 @@ async def scan_network(db: Session = Depends(get_db)):
             }
         })
 
-        return {"ok": True, "wifi": wifi, "ip": ip_data, "summary": network_summary}
-
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
+    return {"ok": True, "wifi": wifi, "ip": ip_data, "interfaces": snap["interfaces"],
+            "platform": snap["platform"], "summary": network_summary, "cached": not fresh}
 
 # ======================================
 # 6. AGENT
 # ======================================
 
-@router.get("/agent")
-async def scan_agent(db: Session = Depends(get_db)):
-    try:
-        async with httpx.AsyncClient(timeout=5) as c:
-            r = await c.get("http://127.0.0.1:8008/")
-        data = r.json()
-
-        create_scan_history(
-            db,
-            url="agent://local",
-            status_code=200,
-            latency_ms=0,
-            content_length=0,
-            dns=json.dumps(data),
-            error=None,
+def agent_signal(snapshot):
+    # sinyal wifi utama dari snapshot agent (format /scan-wifi)
+    if not isinstance(snapshot, dict) or not isinstance(snapshot.get("interfaces"), dict):
+        return None
+    return snapshot["interfaces"].get("signal_pct")
+
+def make_agent_sink():
+    async def sink(state, snapshot, error, changed):
+        # setiap poll tercatat (riwayat kesehatan); snapshot sama disimpan sekali di payload store
+        rec = await scan_writer.submit(
+            url=f"agent://{state.name}",
+            host=url_host(state.address) if state.address else None,
+            status_code=200 if error is None else None,
+            latency_ms=state.latency_ms,
+            content_length=None,
+            payload=snapshot,
+            error=error,
             source="agent"
         )
+        metrics_store.record_scan(f"agent://{state.name}", "agent", state.latency_ms,
+                                  200 if error is None else None)
+        metrics_store.record_signal(f"agent:{state.name}", agent_signal(snapshot))
+        # dashboard hanya diberi tahu kalau snapshot / status berubah
+        if changed:
+            await manager.broadcast({
+                "type": "agent_result",
+                "data": {"id": rec.id, **state.to_dict(agent_poller.stale_after),
+                         "created_at": str(rec.created_at)}
+            })
+    return sink
+
+def validate_agent(fields: dict, current=None):
+    if "name" in fields:
+        fields["name"] = fields["name"].strip()
+        if not fields["name"]:
+            raise HTTPException(400, "Nama agent kosong")
+    if fields.get("mode", "pull") not in ("pull", "push"):
+        raise HTTPException(400, "Mode agent harus pull / push")
+    if fields.get("address") is not None:
+        fields["address"] = fields["address"].strip()
+        if not fields["address"] or url_host(fields["address"]) is None:
+            raise HTTPException(400, "Alamat agent tidak valid")
+        fields["address"] = with_scheme(fields["address"]).rstrip("/")
+    if "labels" in fields:
+        fields["labels"] = json.dumps([str(l).strip() for l in fields["labels"] if str(l).strip()])
+
+    # PATCH: field yang tidak dikirim diambil dari row lama
+    def value(k):
+        return fields[k] if k in fields else getattr(current, k, None)
+
+    mode = value("mode") or "pull"
+    if mode == "pull" and not value("address"):
+        raise HTTPException(400, "Alamat agent wajib untuk mode pull")
+    if mode == "push" and not value("token"):
+        raise HTTPException(400, "Token agent wajib untuk mode push")
+    return fields
+
+def agent_out(a):
+    # token tidak pernah dikembalikan
+    state = agent_poller.agents.get(a.id)
+    return {
+        "id": a.id,
+        "name": a.name,
+        "mode": a.mode,
+        "address": a.address,
+        "labels": agent_labels(a.labels),
+        "enabled": a.enabled,
+        "has_token": bool(a.token),
+        "status": state.status(agent_poller.stale_after) if state else None,
+    }
 
-        return {"ok": True, "agent": data}
+@router.get("/agent")
+async def scan_agent(label: Optional[str] = None, status: Optional[str] = None):
+    # snapshot terakhir dari poller (tidak menunggu agent)
+    return {"ok": True, "agents": agent_poller.list(label, status), "poller": agent_poller.snapshot()}
+
+@router.get("/agents")
+async def agents_list(limit: int = 100, offset: int = 0, db: AsyncSession = Depends(get_async_db)):
+    rows = await list_agents(db, limit=min(limit, 1000), offset=offset)
+    return {"ok": True, "agents": [agent_out(a) for a in rows]}
+
+@router.post("/agents")
+async def agents_add(payload: AgentIn, db: AsyncSession = Depends(get_async_db)):
+    a = await create_agent(db, **validate_agent(payload.model_dump()))
+    agent_poller.upsert(a)
+    return {"ok": True, "agent": agent_out(a)}
+
+@router.patch("/agents/{agent_id}")
+async def agents_update(agent_id: int, payload: AgentPatch, db: AsyncSession = Depends(get_async_db)):
+    a = await get_agent(db, agent_id)
+    if a is None:
+        raise HTTPException(404, "Agent tidak ditemukan")
+    fields = {k: v for k, v in payload.model_dump().items() if v is not None}
+    a = await update_agent(db, a, **validate_agent(fields, current=a))
+    agent_poller.upsert(a)
+    return {"ok": True, "agent": agent_out(a)}
+
+@router.delete("/agents/{agent_id}")
+async def agents_delete(agent_id: int, db: AsyncSession = Depends(get_async_db)):
+    a = await get_agent(db, agent_id)
+    if a is None:
+        raise HTTPException(404, "Agent tidak ditemukan")
+    await delete_agent(db, a)
+    agent_poller.remove(agent_id)
+    return {"ok": True}
+
+@router.post("/agents/{agent_id}/poll")
+async def agents_poll(agent_id: int):
+    # poll sekarang tanpa menunggu putaran berikutnya
+    state = agent_poller.agents.get(agent_id)
+    if state is None:
+        raise HTTPException(404, "Agent tidak ditemukan / nonaktif")
+    if state.mode != "pull":
+        raise HTTPException(400, "Agent mode push mengirim data sendiri")
+    if not agent_poller.running:
+        raise HTTPException(503, "Poller agent tidak berjalan di worker ini")
+    await agent_poller.poll(state)
+    return {"ok": True, "agent": state.to_dict(agent_poller.stale_after)}
+
+async def read_push_body(request: Request):
+    # body dibatasi sebelum & sesudah dekompresi (gzip bomb)
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > config.AGENT_INGEST_MAX_BYTES:
+            raise HTTPException(413, "Upload agent terlalu besar")
+    AGENT_INGEST_BYTES.inc(len(body))
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            raw = d.decompress(bytes(body), config.AGENT_INGEST_MAX_RAW_BYTES)
+        except zlib.error:
+            raise HTTPException(400, "Body gzip rusak")
+        if d.unconsumed_tail:
+            raise HTTPException(413, "Upload agent terlalu besar")
+        body = raw
+    try:
+        return AgentPushIn(**json.loads(body))
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(422, str(e))
+
+@router.post("/agents/ingest")
+async def agents_ingest(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Upload agent mode push: {"agent", "session", "base_seq", "samples": [...]}.
+    Sample = {"seq", "ts", "full": snapshot} atau {"seq", "ts", "set": {...}, "del": [...]}.
+    Semua sample masuk scan_history lewat writer (satu batch), lalu di-ack.
+    409 {"need_full": true} = basis delta tidak dikenal, kirim ulang penuh.
+    """
+    push = await read_push_body(request)
+    if len(push.samples) > config.AGENT_INGEST_MAX_SAMPLES:
+        raise HTTPException(413, "Sample per upload terlalu banyak")
+
+    row = await get_agent_by_name(db, push.agent)
+    token = request.headers.get("x-agent-token") or ""
+    if (row is None or row.mode != "push" or not row.token
+            or not hmac.compare_digest(token.encode(), row.token.encode())):
+        raise HTTPException(401, "Agent / token tidak valid")
+    state = agent_poller.upsert(row)
+    if state is None:
+        raise HTTPException(403, "Agent nonaktif")
+    if not push.samples:
+        return {"ok": True, "acked": push.base_seq or 0, "stored": 0}
 
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
+    try:
+        decoded, flat = state.decode_push(push.session, push.base_seq, push.samples)
+    except NeedFull:
+        return JSONResponse({"ok": False, "need_full": True}, status_code=409)
+    except (KeyError, TypeError, ValueError, OverflowError, OSError) as e:
+        # termasuk ts NaN / di luar jangkauan: ditolak sebelum ada yang disimpan
+        raise HTTPException(422, f"Sample tidak valid: {e}")
+
+    host = request.client.host if request.client else None
+    def fields(ts, snapshot):
+        error = snapshot.get("error") if isinstance(snapshot, dict) else None
+        return dict(
+            url=f"agent://{state.name}",
+            host=host,
+            status_code=None if error else 200,
+            latency_ms=None,
+            content_length=None,
+            payload=None if error else snapshot,
+            error=str(error) if error else None,
+            source="agent",
+            created_at=datetime.fromtimestamp(ts).replace(microsecond=0),
+        )
+
+    # submit bersamaan -> writer menyimpan semuanya dalam satu batch
+    recs = await asyncio.gather(*[scan_writer.submit(**fields(ts, snap)) for _, ts, snap in decoded])
+    acked = int(push.samples[-1]["seq"])
+    state.commit_push(push.session, acked, flat)
+    AGENT_INGEST_SAMPLES.inc(len(decoded))
+
+    if decoded:
+        last = fields(decoded[-1][1], decoded[-1][2])
+        # grafik live hanya dari sample terbaru (backfill cukup di scan_history),
+        # dicatat pada waktu terima server, bukan jam agent
+        metrics_store.record_scan(last["url"], "agent", None, last["status_code"])
+        metrics_store.record_signal(f"agent:{state.name}", agent_signal(last["payload"]))
+        if state.record(last["payload"], last["error"], None):
+            await manager.broadcast({
+                "type": "agent_result",
+                "data": {"id": recs[-1].id, **state.to_dict(agent_poller.stale_after),
+                         "created_at": str(recs[-1].created_at)}
+            })
+    return {"ok": True, "acked": acked, "stored": len(decoded)}
 
 # ======================================
 # 7. WEBSOCKET
 # ======================================
 
 @router.websocket("/ws")
-async def ws_stream(ws: WebSocket):
-    await manager.connect(ws)
+async def ws_stream(ws: WebSocket, batch: int = 1, compress: Optional[str] = None):
+    # batch=0     -> scan_result dikirim satu per satu (format lama)
+    # compress=deflate -> frame biner zlib
+    await manager.connect(ws, batch=bool(batch), compress=compress == "deflate")
     try:
         while True:
             await ws.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(ws)
+
+
+@router.get("/ws/stats")
+async def ws_stats():
+    return {"ok": True, "ws": manager.snapshot()}
+
+# ======================================
+# 8. MONITOR (SCAN TERJADWAL)
+# ======================================
+
+def make_monitor_check():
+    async def check(url):
+        res = await do_http_scan(url)
+        await save_web_result(res, "monitor")
+        return res
+    return check
+
+def validate_target(fields: dict):
+    if "url" in fields:
+        fields["url"] = fields["url"].strip()
+        if not fields["url"]:
+            raise HTTPException(400, "URL kosong")
+        fields["url"] = with_scheme(fields["url"])
+    if "interval_s" in fields and fields["interval_s"] < config.MONITOR_MIN_INTERVAL:
+        raise HTTPException(400, f"interval_s minimal {config.MONITOR_MIN_INTERVAL} detik")
+    if "missed_policy" in fields and fields["missed_policy"] not in POLICIES:
+        raise HTTPException(400, f"missed_policy harus salah satu dari {', '.join(POLICIES)}")
+    return fields
+
+def target_out(t):
+    return {
+        "id": t.id,
+        "url": t.url,
+        "interval_s": t.interval_s,
+        "missed_policy": t.missed_policy,
+        "enabled": t.enabled,
+        "state": monitor.target_state(t.id),
+    }
+
+@router.get("/monitor")
+async def monitor_status():
+    return {"ok": True, "monitor": monitor.snapshot()}
+
+@router.get("/monitor/targets")
+async def monitor_targets(limit: int = 100, offset: int = 0,
+                          db: AsyncSession = Depends(get_async_db)):
+    rows = await list_monitor_targets(db, limit=min(limit, 1000), offset=offset)
+    return {"ok": True, "targets": [target_out(t) for t in rows]}
+
+@router.post("/monitor/targets")
+async def monitor_add(payload: MonitorTargetIn, db: AsyncSession = Depends(get_async_db)):
+    t = await create_monitor_target(db, **validate_target(payload.model_dump()))
+    # langsung dijadwalkan, tanpa menunggu sync berikutnya
+    monitor.upsert(t)
+    return {"ok": True, "target": target_out(t)}
+
+@router.patch("/monitor/targets/{target_id}")
+async def monitor_update(target_id: int, payload: MonitorTargetPatch,
+                         db: AsyncSession = Depends(get_async_db)):
+    t = await get_monitor_target(db, target_id)
+    if t is None:
+        raise HTTPException(404, "Target tidak ditemukan")
+    fields = {k: v for k, v in payload.model_dump().items() if v is not None}
+    t = await update_monitor_target(db, t, **validate_target(fields))
+    monitor.upsert(t)
+    return {"ok": True, "target": target_out(t)}
+
+@router.delete("/monitor/targets/{target_id}")
+async def monitor_delete(target_id: int, db: AsyncSession = Depends(get_async_db)):
+    t = await get_monitor_target(db, target_id)
+    if t is None:
+        raise HTTPException(404, "Target tidak ditemukan")
+    await delete_monitor_target(db, t)
+    monitor.remove(target_id)
+    return {"ok": True}
+
+# ======================================
+# 9. PORT SCAN
+# ======================================
+
+def make_port_sink():
+    async def sink(scan, res):
+        await manager.broadcast({"type": "port_result", "data": {"scan_id": scan.id, **res}})
+    return sink
+
+def require_admin(x_admin_token: str = Header(default="")):
+    # port scan menembak jaringan lain -> khusus admin (ADMIN_TOKEN kosong = mati)
+    if not admin_allowed(x_admin_token):
+        raise HTTPException(403, "Port scan hanya untuk admin (x-admin-token)")
+
+@router.post("/ports", dependencies=[Depends(require_admin)])
+async def ports_scan(payload: PortScanIn, request: Request,
+                     stream: Optional[str] = None, background: bool = False):
+    """
+    TCP connect scan. Port open dikirim ke WebSocket (port_result) dan
+    disimpan di tabel open_port. ?background=true langsung mengembalikan
+    id scan (progress lewat /scan/ports/{id}); ?stream=ndjson|sse
+    men-stream port open; tanpa keduanya satu JSON setelah selesai.
+    """
+    spec = payload.targets if isinstance(payload.targets, str) else ", ".join(payload.targets)
+    try:
+        scan = port_scanner.create(
+            payload.targets, payload.ports, concurrency=payload.concurrency,
+            timeout=payload.timeout, rate_per_host=payload.rate_per_host,
+            banner=payload.banner, spec=spec,
+        )
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except RuntimeError as e:
+        raise HTTPException(429, str(e))
+
+    mode = None if background else bulk_stream_mode(request, stream, False)
+    port_scanner.launch(scan, make_port_sink(), attach=not background)
+
+    if background:
+        return {"ok": True, "scan_id": scan.id, "scan": scan.progress()}
+    if mode == "ndjson":
+        return StreamingResponse(ndjson_stream(scan), media_type="application/x-ndjson",
+                                 headers={"X-Scan-Job": scan.id})
+    if mode == "sse":
+        return StreamingResponse(sse_stream(scan), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Scan-Job": scan.id})
+    found = [res async for _, res in scan.events()]
+    return {"ok": True, "scan": scan.progress(), "open": found}
+
+@router.get("/ports", dependencies=[Depends(require_admin)])
+async def ports_list():
+    return {"ok": True, "scans": port_scanner.list()}
+
+@router.get("/ports/open", dependencies=[Depends(require_admin)])
+async def ports_open(host: Optional[str] = None, port: Optional[int] = None,
+                     scan_id: Optional[str] = None, limit: int = 100, offset: int = 0,
+                     db: AsyncSession = Depends(get_async_db)):
+    rows = await list_open_ports(db, host=host, port=port, scan_id=scan_id,
+                                 limit=min(limit, 1000), offset=offset)
+    return {"ok": True, "open": [{
+        "host": r.host,
+        "port": r.port,
+        "hostname": r.hostname,
+        "banner": r.banner,
+        "latency_ms": r.latency_ms,
+        "scan_id": r.scan_id,
+        "first_seen": str(r.first_seen),
+        "last_seen": str(r.last_seen),
+    } for r in rows]}
+
+@router.get("/ports/{scan_id}", dependencies=[Depends(require_admin)])
+async def ports_progress(scan_id: str):
+    scan = port_scanner.scans.get(scan_id)
+    if scan is None:
+        raise HTTPException(404, "Port scan tidak ditemukan")
+    return {"ok": True, "scan": scan.progress()}
+
+@router.post("/ports/{scan_id}/cancel", dependencies=[Depends(require_admin)])
+async def ports_cancel(scan_id: str):
+    if not await port_scanner.cancel(scan_id):
+        raise HTTPException(404, "Port scan tidak ditemukan / sudah selesai")
+    return {"ok": True, "scan": port_scanner.scans[scan_id].progress()}
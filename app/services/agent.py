@@ -1,14 +1,184 @@
 # agent/agent.py  (minimal Windows agent)
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
-import subprocess, os
+from contextlib import asynccontextmanager
+from collections import deque
+import asyncio, gzip, json, logging, os, socket, time, uuid
+import httpx
 from dotenv import load_dotenv
-from .parse_utils import parse_netsh_interfaces, parse_ipconfig
+from app.utils.parse_utils import parse_netsh_all, parse_netsh_interfaces, parse_ipconfig_adapters, parse_ipconfig
+from app.utils.delta import flatten, diff
+from app.services.net_collector import run_command
 
 load_dotenv(dotenv_path=".env")
 AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
 
-app = FastAPI()
+# ============================================
+# MODE PUSH
+# ============================================
+# Agent mengambil sample sendiri tiap AGENT_SAMPLE_INTERVAL detik dan
+# menyimpannya di ring buffer (AGENT_BUFFER_SIZE sample terakhir). Kalau
+# AGENT_PUSH_URL diisi, uploader mengirim sample yang belum di-ack ke
+# POST {AGENT_PUSH_URL}/scan/agents/ingest:
+# - satu koneksi keep-alive, body JSON gzip, maksimal AGENT_UPLOAD_BATCH sample
+# - sample pertama berisi snapshot penuh hanya kalau server belum punya
+#   basis; berikutnya hanya field yang berubah (app/utils/delta.py)
+# - server putus -> sample tetap di buffer, dikirim ulang (backfill) setelah
+#   tersambung lagi; 409 dari server = basis hilang, kirim ulang penuh
+AGENT_NAME = os.getenv("AGENT_NAME", socket.gethostname())
+AGENT_PUSH_URL = os.getenv("AGENT_PUSH_URL", "").rstrip("/")
+AGENT_SAMPLE_INTERVAL = float(os.getenv("AGENT_SAMPLE_INTERVAL", "10"))
+AGENT_BUFFER_SIZE = int(os.getenv("AGENT_BUFFER_SIZE", "8640"))       # 24 jam @ 10 detik
+AGENT_UPLOAD_INTERVAL = float(os.getenv("AGENT_UPLOAD_INTERVAL", "30"))
+AGENT_UPLOAD_BATCH = int(os.getenv("AGENT_UPLOAD_BATCH", "500"))
+
+log = logging.getLogger("agent")
+
+
+async def collect():
+    # netsh + ipconfig jalan bersamaan (tanpa shell, dengan timeout)
+    raw, raw_ip = await asyncio.gather(
+        run_command("netsh", "wlan", "show", "interfaces"),
+        run_command("ipconfig", "/all"),
+    )
+    return {
+        "os": "windows",
+        "interfaces": parse_netsh_interfaces(raw),   # wifi utama (format lama)
+        "ipinfo": parse_ipconfig(raw_ip),
+        "wifi": parse_netsh_all(raw),                # semua interface wifi
+        "adapters": parse_ipconfig_adapters(raw_ip), # semua adapter
+    }
+
+
+class Sampler:
+    def __init__(self, collect_fn=collect, interval: float = AGENT_SAMPLE_INTERVAL,
+                 size: int = AGENT_BUFFER_SIZE):
+        self.collect_fn = collect_fn
+        self.interval = interval
+        self.buffer = deque(maxlen=size)   # (seq, ts, data)
+        self.seq = 0
+        self.dropped = 0
+        self.latest = None
+
+    async def sample(self):
+        try:
+            data = await self.collect_fn()
+        except Exception as e:
+            data = {"error": str(e) or type(e).__name__}
+        self.seq += 1
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        item = (self.seq, time.time(), data)
+        self.buffer.append(item)
+        self.latest = item
+        return item
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            await self.sample()
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+class Uploader:
+    def __init__(self, sampler: Sampler, url: str = AGENT_PUSH_URL, name: str = AGENT_NAME,
+                 token: str = AGENT_TOKEN, interval: float = AGENT_UPLOAD_INTERVAL,
+                 batch: int = AGENT_UPLOAD_BATCH, client: httpx.AsyncClient = None):
+        self.sampler = sampler
+        self.url = url + "/scan/agents/ingest"
+        self.name = name
+        self.token = token
+        self.interval = interval
+        self.batch = batch
+        self.client = client
+        self.session = uuid.uuid4().hex   # seq mulai dari 1 lagi setiap proses agent baru
+        self.acked_seq = 0
+        self.acked_state = None    # snapshot rata di acked_seq (basis delta)
+        self.sent = 0
+        self.bytes_sent = 0
+
+    def build(self):
+        pending = [s for s in self.sampler.buffer if s[0] > self.acked_seq][:self.batch]
+        samples, prev = [], self.acked_state
+        for seq, ts, data in pending:
+            flat = flatten(data)
+            if prev is None:
+                samples.append({"seq": seq, "ts": ts, "full": data})
+            else:
+                samples.append({"seq": seq, "ts": ts, **diff(prev, flat)})
+            prev = flat
+        return samples, prev
+
+    async def upload_once(self):
+        """Kirim satu batch. Return jumlah sample yang di-ack (0 = tidak ada)."""
+        samples, last_state = self.build()
+        if not samples:
+            return 0
+        body = gzip.compress(json.dumps({
+            "agent": self.name,
+            "session": self.session,
+            "base_seq": self.acked_seq if self.acked_state is not None else None,
+            "samples": samples,
+        }, separators=(",", ":")).encode())
+        r = await self.client.post(self.url, content=body, headers={
+            "content-type": "application/json",
+            "content-encoding": "gzip",
+            "x-agent-token": self.token,
+        })
+        if r.status_code == 409 and self.acked_state is not None:
+            # server tidak punya basis (restart / worker lain): kirim penuh
+            self.acked_state = None
+            return await self.upload_once()
+        r.raise_for_status()
+        self.acked_seq = r.json()["acked"]
+        self.acked_state = last_state
+        self.sent += len(samples)
+        self.bytes_sent += len(body)
+        return len(samples)
+
+    async def run(self):
+        backoff = 1.0
+        while True:
+            try:
+                # backfill: kirim batch berturut-turut sampai buffer habis
+                while await self.upload_once() >= self.batch:
+                    pass
+                backoff = 1.0
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Upload ke server gagal (%s), coba lagi %.0f detik", e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 300.0)
+
+
+sampler = Sampler()
+uploader = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global uploader
+    tasks = []
+    client = None
+    if AGENT_SAMPLE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(sampler.run()))
+        if AGENT_PUSH_URL:
+            client = httpx.AsyncClient(timeout=30)
+            uploader = Uploader(sampler, client=client)
+            tasks.append(asyncio.create_task(uploader.run()))
+    try:
+        yield
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if client is not None:
+            await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 def check_token(req: Request):
     if not AGENT_TOKEN:
@@ -20,18 +190,21 @@ def check_token(req: Request):
 
 @app.get("/")
 async def root():
-    return {"status":"agent-running"}
+    return {
+        "status": "agent-running",
+        "samples": sampler.seq,
+        "buffered": len(sampler.buffer),
+        "push": None if uploader is None else {"acked_seq": uploader.acked_seq, "sent": uploader.sent,
+                                               "bytes_sent": uploader.bytes_sent},
+    }
 
 @app.get("/scan-wifi")
 async def scan_wifi(request: Request):
     check_token(request)
-    # run netsh to get interface info
+    # sample terakhir masih segar -> tidak perlu menjalankan command lagi
+    if sampler.latest is not None and time.time() - sampler.latest[1] < max(AGENT_SAMPLE_INTERVAL, 1) * 2:
+        return JSONResponse(sampler.latest[2])
     try:
-        raw = subprocess.check_output("netsh wlan show interfaces", shell=True, stderr=subprocess.STDOUT, text=True)
-        info = parse_netsh_interfaces(raw)
-        # ipconfig for IP & gateway
-        raw_ip = subprocess.check_output("ipconfig /all", shell=True, stderr=subprocess.STDOUT, text=True)
-        ipinfo = parse_ipconfig(raw_ip)
-        return JSONResponse({"os":"windows", "interfaces": info, "ipinfo": ipinfo})
+        return JSONResponse(await collect())
     except Exception as e:
         return JSONResponse({"error": str(e)})
@@ -0,0 +1,334 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+
+import httpx
+
+from app import config
+from app.db.database import AsyncSessionLocal
+from app.db.crud import list_agents
+from app.utils.url_utils import with_scheme
+from app.utils.delta import flatten, unflatten, apply_delta
+from app.services.prom import SEMAPHORE_WAIT, AGENT_POLLS, AGENT_POLL_DURATION
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# AGENT FLEET: REGISTRY + POLLER
+# ======================================
+# Agent (app/services/agent.py) berjalan di banyak mesin dan terdaftar di
+# tabel agent. Satu loop mem-poll semua agent setiap AGENT_POLL_INTERVAL:
+# - satu AsyncClient dengan pool koneksi (keep-alive antar putaran)
+# - maksimal AGENT_POLL_CONCURRENCY agent bersamaan, timeout per agent
+# - snapshot terakhir per agent disimpan di memori -> /scan/agent instan
+# - status: unknown (belum dipoll), ok, error (poll terakhir gagal),
+#   stale (snapshot terakhir lebih tua dari AGENT_STALE_AFTER), down
+#   (belum pernah berhasil)
+# Hasil setiap poll diteruskan ke handle (simpan ke scan_history + broadcast).
+#
+# Agent mode push tidak dipoll: agent mengirim batch sample sendiri ke
+# POST /scan/agents/ingest (sample penuh atau delta field yang berubah).
+# Basis delta per agent (seq + snapshot rata terakhir) disimpan di
+# AgentState; kalau basis tidak cocok (server restart, worker lain, sesi
+# agent baru) server menjawab 409 dan agent mengirim ulang snapshot penuh.
+
+
+def sample_ts(value):
+    """Timestamp sample agent (epoch detik) -> float; ValueError kalau tidak bisa jadi datetime."""
+    ts = float(value)
+    try:
+        datetime.fromtimestamp(ts)
+    except (OverflowError, OSError, ValueError):
+        raise ValueError(f"ts di luar jangkauan: {value!r}") from None
+    return ts
+
+
+class NeedFull(Exception):
+    """Basis delta agent push tidak dikenal; agent harus kirim snapshot penuh."""
+
+
+def agent_labels(raw):
+    if not raw:
+        return []
+    try:
+        labels = json.loads(raw)
+    except ValueError:
+        return [l.strip() for l in raw.split(",") if l.strip()]
+    return labels if isinstance(labels, list) else []
+
+
+class AgentState:
+    def __init__(self, row):
+        self.id = row.id
+        self.snapshot = None
+        self.snapshot_hash = None
+        self.last_ok = None          # datetime snapshot terakhir
+        self._last_ok_mono = None
+        self.last_poll = None
+        self.last_error = None
+        self.latency_ms = None
+        self.failures = 0            # gagal berturut-turut
+        self.polls = 0
+        # mode push: basis delta yang sudah tersimpan
+        self.push_session = None
+        self.push_seq = 0
+        self.push_flat = None
+        self.update(row)
+
+    def update(self, row):
+        self.name = row.name
+        self.mode = row.mode or "pull"
+        self.address = with_scheme(row.address).rstrip("/") if row.address else None
+        self.token = row.token
+        self.labels = agent_labels(row.labels)
+
+    def status(self, stale_after: float):
+        if self.last_poll is None:
+            return "unknown"
+        if self._last_ok_mono is None:
+            return "down"
+        if time.monotonic() - self._last_ok_mono > stale_after:
+            return "stale"
+        return "error" if self.failures else "ok"
+
+    def record(self, snapshot, error, latency_ms):
+        """Catat hasil poll. Return True kalau snapshot / status berubah."""
+        self.polls += 1
+        self.last_poll = datetime.now().replace(microsecond=0)
+        self.latency_ms = latency_ms
+        changed = (error is None) != (self.failures == 0) or self.polls == 1
+        if error is not None:
+            self.failures += 1
+            self.last_error = error
+            return changed
+        self.failures = 0
+        self.last_error = None
+        self.last_ok = self.last_poll
+        self._last_ok_mono = time.monotonic()
+        h = hashlib.blake2b(json.dumps(snapshot, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+        if h != self.snapshot_hash:
+            self.snapshot, self.snapshot_hash = snapshot, h
+            changed = True
+        return changed
+
+    def decode_push(self, session, base_seq, samples):
+        """
+        Rekonstruksi snapshot penuh dari satu batch push.
+        Return ([(seq, ts, snapshot)], flat_terakhir); sample yang sudah
+        tersimpan (kirim ulang setelah ack hilang) dilewati. Basis baru baru
+        dipakai lewat commit_push setelah batch tersimpan.
+        """
+        last_seq = self.push_seq if session == self.push_session else 0
+        if base_seq is None:
+            flat = None
+        elif base_seq != last_seq or self.push_flat is None:
+            raise NeedFull()
+        else:
+            flat = self.push_flat
+        out = []
+        for s in samples:
+            if "full" in s:
+                flat = flatten(s["full"])
+            elif flat is None:
+                raise NeedFull()
+            else:
+                flat = apply_delta(flat, s)
+            seq = int(s["seq"])
+            if seq > last_seq:
+                out.append((seq, sample_ts(s["ts"]), unflatten(flat)))
+        return out, flat
+
+    def commit_push(self, session, seq, flat):
+        if session == self.push_session and seq < self.push_seq:
+            return
+        self.push_session = session
+        self.push_seq = seq
+        self.push_flat = flat
+
+    def to_dict(self, stale_after: float):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "mode": self.mode,
+            "address": self.address,
+            "labels": self.labels,
+            "status": self.status(stale_after),
+            "last_ok": str(self.last_ok) if self.last_ok else None,
+            "last_poll": str(self.last_poll) if self.last_poll else None,
+            "last_error": self.last_error,
+            "latency_ms": self.latency_ms,
+            "failures": self.failures,
+            "snapshot": self.snapshot,
+        }
+
+
+class AgentPoller:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        interval: float = config.AGENT_POLL_INTERVAL,
+        timeout: float = config.AGENT_TIMEOUT,
+        concurrency: int = config.AGENT_POLL_CONCURRENCY,
+        stale_after: float = config.AGENT_STALE_AFTER,
+        path: str = config.AGENT_SNAPSHOT_PATH,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.stale_after = stale_after
+        self.path = path
+        self.agents = {}
+        self._client = None
+        self._sem = None
+        self._handle = None
+        self._task = None
+        self.rounds = 0
+        self.last_round_ms = None
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    async def start(self, handle=None):
+        # handle: coroutine function(state, snapshot, error) -> simpan / broadcast
+        if self._task is not None:
+            return
+        self._handle = handle
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency,
+                                max_keepalive_connections=self.concurrency),
+        )
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def running(self):
+        # client & semaphore hanya ada antara start() dan stop()
+        return self._client is not None
+
+    # -------------------------------
+    # Registry (berlaku tanpa restart)
+    # -------------------------------
+    def upsert(self, row):
+        if not row.enabled:
+            self.remove(row.id)
+            return None
+        state = self.agents.get(row.id)
+        if state is None:
+            state = self.agents[row.id] = AgentState(row)
+        else:
+            state.update(row)
+        return state
+
+    def remove(self, agent_id):
+        self.agents.pop(agent_id, None)
+
+    async def sync(self):
+        async with self.session_factory() as db:
+            rows = await list_agents(db, enabled_only=True)
+        seen = set()
+        for row in rows:
+            seen.add(row.id)
+            self.upsert(row)
+        for agent_id in list(self.agents):
+            if agent_id not in seen:
+                self.remove(agent_id)
+
+    # -------------------------------
+    # Polling
+    # -------------------------------
+    async def _loop(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.sync()
+                await self.poll_all()
+            except Exception:
+                log.exception("Polling agent gagal")
+            # fixed-rate; putaran yang lebih lama dari interval langsung disusul
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    async def poll_all(self):
+        started = time.perf_counter()
+        await asyncio.gather(*[self.poll(s) for s in list(self.agents.values()) if s.mode == "pull"])
+        self.rounds += 1
+        self.last_round_ms = int((time.perf_counter() - started) * 1000)
+
+    async def poll(self, state: AgentState):
+        if not self.running:
+            raise RuntimeError("AgentPoller belum dijalankan (start())")
+        waited = time.perf_counter()
+        async with self._sem:
+            SEMAPHORE_WAIT.labels("agent").observe(time.perf_counter() - waited)
+            snapshot, error = None, None
+            headers = {"x-agent-token": state.token} if state.token else {}
+            start = time.perf_counter()
+            try:
+                r = await self._client.get(state.address + self.path, headers=headers)
+                if r.status_code != 200:
+                    error = f"HTTP {r.status_code}"
+                else:
+                    snapshot = r.json()
+                    # agent menangkap error command sendiri -> {"error": ...}
+                    if isinstance(snapshot, dict) and snapshot.get("error"):
+                        error, snapshot = str(snapshot["error"]), None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            latency_ms = int((time.perf_counter() - start) * 1000)
+        AGENT_POLL_DURATION.observe(latency_ms / 1000)
+        AGENT_POLLS.labels("ok" if error is None else "error").inc()
+
+        changed = state.record(snapshot, error, latency_ms)
+        if self._handle is not None:
+            try:
+                await self._handle(state, snapshot, error, changed)
+            except Exception:
+                log.exception("Gagal menyimpan hasil agent %s", state.name)
+        return state
+
+    # -------------------------------
+    # Observability
+    # -------------------------------
+    def list(self, label: str = None, status: str = None):
+        out = []
+        for s in self.agents.values():
+            if label is not None and label not in s.labels:
+                continue
+            d = s.to_dict(self.stale_after)
+            if status is not None and d["status"] != status:
+                continue
+            out.append(d)
+        return out
+
+    def snapshot(self):
+        counts = {}
+        for s in self.agents.values():
+            st = s.status(self.stale_after)
+            counts[st] = counts.get(st, 0) + 1
+        return {
+            "enabled": self.running,
+            "agents": len(self.agents),
+            "status": counts,
+            "rounds": self.rounds,
+            "last_round_ms": self.last_round_ms,
+            "interval": self.interval,
+        }
+
+
+agent_poller = AgentPoller()
@@ -0,0 +1,63 @@
+import asyncio
+
+# ======================================
+# WORKER POOL TERBATAS UNTUK BULK SCAN
+# ======================================
+# Item diambil satu per satu dari async iterator oleh sejumlah worker
+# tetap, hasilnya dikirim lewat antrian terbatas. Tidak ada list coroutine
+# yang dibuat di depan, jadi memori tetap konstan berapa pun jumlah input.
+
+_DONE = object()
+
+
+async def run_bounded(source, handle, workers: int, buffer: int = None, start: int = 0):
+    """
+    Async generator: yield (index, hasil) sesuai urutan selesai.
+    source : async iterator item
+    handle : coroutine function(item) -> hasil
+    start  : index item pertama (untuk resume)
+    """
+    src = source.__aiter__()
+    lock = asyncio.Lock()
+    out = asyncio.Queue(maxsize=buffer or workers * 2)
+    counter = start
+
+    async def next_item():
+        nonlocal counter
+        async with lock:
+            try:
+                item = await src.__anext__()
+            except StopAsyncIteration:
+                return _DONE
+            idx = counter
+            counter += 1
+            return idx, item
+
+    async def worker():
+        while True:
+            nxt = await next_item()
+            if nxt is _DONE:
+                return
+            idx, item = nxt
+            await out.put((idx, await handle(item)))
+
+    async def closer():
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await out.put(_DONE)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+    closer_task = asyncio.create_task(closer())
+    try:
+        while True:
+            item = await out.get()
+            if item is _DONE:
+                break
+            yield item
+        # lempar ulang error dari worker (kalau ada)
+        await closer_task
+    finally:
+        for t in tasks:
+            t.cancel()
+        closer_task.cancel()
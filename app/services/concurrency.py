@@ -0,0 +1,221 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from app import config
+from app.services.prom import SEMAPHORE_WAIT
+
+# ======================================
+# ADAPTIVE CONCURRENCY LIMITER
+# ======================================
+# Pengganti Semaphore(8) di bulk scan. Batas probe bersamaan diatur dari
+# latency dan error yang teramati (mirip Gradient2 Netflix concurrency-limits):
+# - latency jangka pendek dibanding jangka panjang -> gradient
+#   (dihitung per jendela sampel) gradient ~1 -> limit naik ~sqrt(limit)
+#   latency naik melewati toleransi -> limit turun proporsional
+# - timeout (tanda overload) -> limit dipotong multiplicative (AIMD)
+# Ditambah batas per host, jadi satu domain lambat tidak memakan semua slot.
+
+OVERLOAD_ERRORS = ("ConnectTimeout", "ReadTimeout", "WriteTimeout", "PoolTimeout", "TimeoutException")
+
+
+def is_overload(result: dict) -> bool:
+    # hanya timeout yang dianggap overload; DNS gagal / 5xx itu masalah target
+    return result.get("error_type") in OVERLOAD_ERRORS
+
+
+class Slot:
+    def __init__(self, host):
+        self.host = host
+        self.started = time.perf_counter()
+        self.latency_ms = None
+        self.dropped = False
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int = config.SCAN_CONCURRENCY_INITIAL,
+        min_limit: int = config.SCAN_CONCURRENCY_MIN,
+        max_limit: int = config.SCAN_CONCURRENCY_MAX,
+        per_host: int = config.SCAN_CONCURRENCY_PER_HOST,
+        tolerance: float = config.SCAN_CONCURRENCY_TOLERANCE,
+        backoff: float = config.SCAN_CONCURRENCY_BACKOFF,
+        smoothing: float = 0.2,
+        history_size: int = 300,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.per_host = per_host
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+
+        self.inflight = 0
+        self._host_inflight = {}
+        self._waiters = deque()     # (host, future), FIFO
+
+        self._short_rtt = None
+        self._long_rtt = None
+        self._win_count = self._win_drops = self._win_rtt_n = self._win_max_inflight = 0
+        self._win_rtt_sum = 0.0
+        self.samples = 0
+        self.drops = 0
+        self.history = deque(maxlen=history_size)
+        self._record_limit()
+
+    # -------------------------------
+    # Acquire / release
+    # -------------------------------
+    @asynccontextmanager
+    async def acquire(self, host: str = None):
+        """
+        async with limiter.acquire(host) as slot:
+            res = await do_http_scan(url)
+            slot.latency_ms = res["elapsed_ms"]
+            slot.dropped = is_overload(res)
+        """
+        waited = time.perf_counter()
+        if not self._can_run(host):
+            fut = asyncio.get_running_loop().create_future()
+            self._waiters.append((host, fut))
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # slot sudah diberikan tapi pemanggil batal -> kembalikan,
+                    # lalu teruskan ke waiter berikutnya
+                    self._release(host)
+                    self._dispatch()
+                else:
+                    self._remove_waiter(fut)
+                raise
+        else:
+            self._take(host)
+        SEMAPHORE_WAIT.labels("bulk").observe(time.perf_counter() - waited)
+
+        slot = Slot(host)
+        try:
+            yield slot
+        except BaseException:
+            # dibatalkan / error di luar scan -> bukan sampel latency
+            self._release(host)
+            self._dispatch()
+            raise
+
+        self._release(host)
+        if slot.latency_ms is None and not slot.dropped:
+            slot.latency_ms = (time.perf_counter() - slot.started) * 1000
+        self._on_sample(slot)
+        self._dispatch()
+
+    def _can_run(self, host):
+        if self.inflight >= int(self.limit):
+            return False
+        if self.per_host > 0 and host is not None:
+            return self._host_inflight.get(host, 0) < self.per_host
+        return True
+
+    def _take(self, host):
+        self.inflight += 1
+        if host is not None:
+            self._host_inflight[host] = self._host_inflight.get(host, 0) + 1
+
+    def _release(self, host):
+        self.inflight -= 1
+        if host is not None:
+            n = self._host_inflight.get(host, 1) - 1
+            if n <= 0:
+                self._host_inflight.pop(host, None)
+            else:
+                self._host_inflight[host] = n
+
+    def _remove_waiter(self, fut):
+        for i, (_, f) in enumerate(self._waiters):
+            if f is fut:
+                del self._waiters[i]
+                return
+
+    def _dispatch(self):
+        # bangunkan waiter paling awal yang host-nya masih punya slot
+        if not self._waiters:
+            return
+        kept = deque()
+        while self._waiters and self.inflight < int(self.limit):
+            host, fut = self._waiters.popleft()
+            if fut.done():
+                continue
+            if self._can_run(host):
+                self._take(host)
+                fut.set_result(None)
+            else:
+                kept.append((host, fut))
+        kept.extend(self._waiters)
+        self._waiters = kept
+
+    # -------------------------------
+    # Algoritma limit
+    # -------------------------------
+    def _on_sample(self, slot: Slot):
+        # sampel dikumpulkan per jendela (~satu putaran limit), baru limit dihitung
+        self.samples += 1
+        self._win_count += 1
+        self._win_max_inflight = max(self._win_max_inflight, self.inflight + 1)
+        if slot.dropped:
+            self.drops += 1
+            self._win_drops += 1
+        elif slot.latency_ms is not None:
+            self._win_rtt_sum += max(slot.latency_ms, 0.1)
+            self._win_rtt_n += 1
+
+        if self._win_count < max(int(self.limit), 10):
+            return
+
+        old = int(self.limit)
+        if self._win_drops:
+            self.limit = self.limit * self.backoff
+        elif self._win_rtt_n:
+            short = self._win_rtt_sum / self._win_rtt_n
+            if self._long_rtt is None:
+                self._long_rtt = short
+            self._short_rtt = short
+            self._long_rtt += (short - self._long_rtt) / 20
+
+            gradient = max(0.5, min(1.0, self.tolerance * self._long_rtt / short))
+            new_limit = self.limit * gradient + math.sqrt(self.limit)
+            # jangan naik kalau slot yang ada belum terpakai setengahnya
+            if self._win_max_inflight < self.limit / 2:
+                new_limit = min(new_limit, self.limit)
+            self.limit = self.limit * (1 - self.smoothing) + new_limit * self.smoothing
+        self.limit = min(max(self.limit, self.min_limit), self.max_limit)
+
+        self._win_count = self._win_drops = self._win_rtt_n = self._win_max_inflight = 0
+        self._win_rtt_sum = 0.0
+        if int(self.limit) != old:
+            self._record_limit()
+
+    def _record_limit(self):
+        self.history.append((round(time.time(), 3), int(self.limit)))
+
+    # -------------------------------
+    # Observability
+    # -------------------------------
+    def snapshot(self, with_history: bool = False):
+        data = {
+            "limit": int(self.limit),
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "per_host": self.per_host,
+            "inflight": self.inflight,
+            "waiting": len(self._waiters),
+            "samples": self.samples,
+            "drops": self.drops,
+            "short_rtt_ms": None if self._short_rtt is None else round(self._short_rtt, 1),
+            "long_rtt_ms": None if self._long_rtt is None else round(self._long_rtt, 1),
+        }
+        if with_history:
+            data["history"] = [{"ts": ts, "limit": limit} for ts, limit in self.history]
+        return data
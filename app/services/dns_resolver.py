@@ -0,0 +1,130 @@
+import asyncio
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app import config
+
+# ======================================
+# DNS RESOLVER NON-BLOCKING + CACHE
+# ======================================
+# socket.gethostbyname_ex itu blocking, jadi dijalankan di thread pool
+# sendiri supaya event loop (websocket, worker bulk) tidak ikut macet.
+# Hasil disimpan di cache LRU dengan TTL; lookup yang gagal juga
+# di-cache (lebih singkat) supaya domain mati tidak di-resolve berulang.
+#
+# Catatan: resolver sistem tidak memberi TTL record, jadi TTL cache
+# diambil dari konfigurasi (DNS_CACHE_TTL / DNS_NEGATIVE_TTL).
+
+
+class DnsResolver:
+    def __init__(
+        self,
+        ttl: float = config.DNS_CACHE_TTL,
+        negative_ttl: float = config.DNS_NEGATIVE_TTL,
+        max_size: int = config.DNS_CACHE_SIZE,
+        workers: int = config.DNS_WORKERS,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.workers = workers
+        self._cache = OrderedDict()   # host -> (expires_at, result)
+        self._inflight = {}           # host -> Future
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    async def start(self):
+        self._get_executor()
+
+    async def stop(self):
+        for fut in self._inflight.values():
+            fut.cancel()
+        self._inflight.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="dns"
+            )
+        return self._executor
+
+    # -------------------------------
+    # Cache
+    # -------------------------------
+    def _cache_get(self, host):
+        item = self._cache.get(host)
+        if item is None:
+            return False, None
+        expires_at, result = item
+        if expires_at < time.monotonic():
+            del self._cache[host]
+            return False, None
+        self._cache.move_to_end(host)
+        return True, result
+
+    def _cache_put(self, host, result):
+        ttl = self.ttl if result is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._cache[host] = (time.monotonic() + ttl, result)
+        self._cache.move_to_end(host)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
+
+    # -------------------------------
+    # Resolve
+    # -------------------------------
+    async def resolve(self, host: str):
+        """
+        Hasil sama dengan socket.gethostbyname_ex:
+        (hostname, aliaslist, ipaddrlist), atau None kalau gagal.
+        """
+        if not host:
+            return None
+        host = host.lower()
+
+        found, result = self._cache_get(host)
+        if found:
+            self.hits += 1
+            return result
+        self.misses += 1
+
+        # lookup yang sama sedang berjalan -> tunggu hasilnya saja
+        fut = self._inflight.get(host)
+        if fut is None:
+            fut = asyncio.ensure_future(self._lookup(host))
+            self._inflight[host] = fut
+            fut.add_done_callback(lambda _f, h=host: self._inflight.pop(h, None))
+        return await asyncio.shield(fut)
+
+    async def _lookup(self, host):
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self._get_executor(), socket.gethostbyname_ex, host
+            )
+        except (OSError, UnicodeError):
+            result = None
+        self._cache_put(host, result)
+        return result
+
+    async def prefetch(self, hosts):
+        # resolve semua host unik secara paralel (dipakai sebelum bulk scan)
+        unique = {h.lower() for h in hosts if h}
+        await asyncio.gather(*[self.resolve(h) for h in unique])
+        return len(unique)
+
+
+resolver = DnsResolver()
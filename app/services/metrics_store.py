@@ -0,0 +1,177 @@
+import math
+import time
+from array import array
+from collections import OrderedDict
+
+from app import config
+
+# ======================================
+# METRICS LIVE (RING BUFFER DI MEMORI)
+# ======================================
+# Dashboard membaca grafik dari sini, bukan dari scan_history di DB.
+# Satu series = ring buffer ukuran tetap (METRICS_RING_SIZE titik) dari
+# tiga array bertipe: timestamp (double), nilai (float), status (short).
+# - append O(1), tanpa alokasi; titik tertua tertimpa
+# - series per URL dibatasi METRICS_MAX_SERIES (LRU); per source & sinyal
+#   jumlahnya kecil dan tidak pernah dibuang
+# - query: cari awal window dengan binary search (timestamp urut), lalu
+#   satu kali jalan mengisi bucket min / max / avg / count / error
+# Kind: url (latency per URL), source (latency per source, "all" = semua
+# scan), signal (sinyal wifi % dari /scan/network dan agent).
+
+KINDS = ("url", "source", "signal")
+NAN = float("nan")
+
+
+class Ring:
+    __slots__ = ("size", "ts", "value", "status", "head", "count")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.ts = array("d", bytes(8 * size))
+        self.value = array("f", bytes(4 * size))
+        self.status = array("h", bytes(2 * size))
+        self.head = 0      # slot yang ditulis berikutnya
+        self.count = 0
+
+    def append(self, ts: float, value, status: int = 0):
+        if self.count:
+            # jam mundur / hasil yang datang terlambat: timestamp tetap urut
+            ts = max(ts, self.ts[self.head - 1])
+        i = self.head
+        self.ts[i] = ts
+        self.value[i] = NAN if value is None else value
+        self.status[i] = status or 0
+        self.head = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def _slot(self, n: int):
+        # urutan logis n (0 = tertua) -> index array
+        return (self.head - self.count + n) % self.size
+
+    def first_since(self, since: float):
+        lo, hi = 0, self.count
+        ts, slot = self.ts, self._slot
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ts[slot(mid)] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def last(self):
+        if not self.count:
+            return None
+        i = self.head - 1
+        v = self.value[i]
+        return {"ts": self.ts[i], "value": None if math.isnan(v) else round(v, 2), "status": self.status[i]}
+
+    def aggregate(self, since: float, until: float, buckets: int):
+        """min / max / avg / count / errors per bucket untuk [since, until)."""
+        width = (until - since) / buckets
+        count = [0] * buckets
+        errors = [0] * buckets
+        total = [0.0] * buckets
+        lo = [math.inf] * buckets
+        hi = [-math.inf] * buckets
+        n_values = [0] * buckets
+        ts, value, status = self.ts, self.value, self.status
+        for n in range(self.first_since(since), self.count):
+            i = self._slot(n)
+            t = ts[i]
+            if t >= until:
+                break
+            b = min(int((t - since) / width), buckets - 1)
+            count[b] += 1
+            st = status[i]
+            if st == 0 or st >= 500:
+                errors[b] += 1
+            v = value[i]
+            if v == v:      # bukan NaN
+                n_values[b] += 1
+                total[b] += v
+                if v < lo[b]:
+                    lo[b] = v
+                if v > hi[b]:
+                    hi[b] = v
+        return [{
+            "t": round(since + b * width, 3),
+            "count": count[b],
+            "errors": errors[b],
+            "min": round(lo[b], 2) if n_values[b] else None,
+            "max": round(hi[b], 2) if n_values[b] else None,
+            "avg": round(total[b] / n_values[b], 2) if n_values[b] else None,
+        } for b in range(buckets)]
+
+
+def _clamp(ts):
+    # ts dari luar (jam agent) tidak boleh di masa depan: ring "all" dipakai
+    # bersama, satu titik di depan akan menggeser semua titik sesudahnya
+    now = time.time()
+    return now if ts is None else min(ts, now)
+
+
+class MetricsStore:
+    def __init__(self, ring_size: int = config.METRICS_RING_SIZE,
+                 max_series: int = config.METRICS_MAX_SERIES):
+        self.ring_size = ring_size
+        self.max_series = max_series
+        self.series = {kind: OrderedDict() for kind in KINDS}
+        self.appends = 0
+
+    def _ring(self, kind, key):
+        rings = self.series[kind]
+        ring = rings.get(key)
+        if ring is None:
+            ring = rings[key] = Ring(self.ring_size)
+            if kind == "url" and len(rings) > self.max_series:
+                rings.popitem(last=False)
+        elif kind == "url":
+            rings.move_to_end(key)
+        return ring
+
+    # -------------------------------
+    # Feed (dipanggil dari pipeline scan)
+    # -------------------------------
+    def record_scan(self, url: str, source: str, latency_ms, status_code, ts: float = None):
+        ts = _clamp(ts)
+        status = status_code or 0
+        self._ring("url", url).append(ts, latency_ms, status)
+        self._ring("source", source).append(ts, latency_ms, status)
+        self._ring("source", "all").append(ts, latency_ms, status)
+        self.appends += 3
+
+    def record_signal(self, key: str, signal_pct, ts: float = None):
+        if signal_pct is None:
+            return
+        self._ring("signal", key).append(_clamp(ts), signal_pct, 200)
+        self.appends += 1
+
+    # -------------------------------
+    # Query
+    # -------------------------------
+    def query(self, kind: str, key: str, window: float, buckets: int, until: float = None):
+        ring = self.series[kind].get(key)
+        if ring is None:
+            return None
+        until = time.time() if until is None else until
+        return ring.aggregate(until - window, until, buckets)
+
+    def keys(self):
+        return {
+            kind: [{"key": key, "points": ring.count, "last": ring.last()} for key, ring in rings.items()]
+            for kind, rings in self.series.items()
+        }
+
+    def snapshot(self):
+        return {
+            "series": {kind: len(rings) for kind, rings in self.series.items()},
+            "ring_size": self.ring_size,
+            "max_series": self.max_series,
+            "appends": self.appends,
+        }
+
+
+metrics_store = MetricsStore()
@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+
+from app import config
+from app.db.database import AsyncSessionLocal
+from app.db.crud import list_monitor_targets
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# MONITOR: SCAN URL TERJADWAL
+# ======================================
+# Target (tabel monitor_target) dijadwalkan di satu heap (due, seq, id).
+# - fase awal acak dalam satu interval + jitter per tick, jadi ribuan
+#   target dengan interval sama tidak menembak di detik yang sama
+# - jadwal fixed-rate dari fase awal (tidak drift walau check lambat)
+# - satu target tidak pernah jalan dobel: tick yang jatuh saat check
+#   sebelumnya belum selesai ikut policy (skip / catchup)
+# - tambah / ubah / hapus target langsung berlaku (upsert / remove), plus
+#   sync berkala dari DB untuk perubahan dari worker lain
+# Default mati; jalankan di satu worker saja (MONITOR_ENABLED=1).
+
+POLICIES = ("skip", "catchup")
+
+
+class Target:
+    def __init__(self, id, url, interval_s, missed_policy="skip"):
+        self.id = id
+        self.url = url
+        self.interval = interval_s
+        self.policy = missed_policy if missed_policy in POLICIES else "skip"
+        self.version = 0          # naik setiap diubah; entri heap lama diabaikan
+        self.base_due = None      # jadwal tanpa jitter
+        self.running = False
+        self.owed = 0             # tick yang harus disusul (catchup)
+        self.checks = 0
+        self.skipped = 0
+        self.last_status = None
+        self.last_error = None
+        self.last_latency_ms = None
+
+    def state(self):
+        return {
+            "running": self.running,
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "owed": self.owed,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "last_latency_ms": self.last_latency_ms,
+        }
+
+
+class Monitor:
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        concurrency: int = config.MONITOR_CONCURRENCY,
+        jitter: float = config.MONITOR_JITTER,
+        max_catchup: int = config.MONITOR_MAX_CATCHUP,
+        sync_interval: int = config.MONITOR_SYNC_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.jitter = jitter
+        self.max_catchup = max_catchup
+        self.sync_interval = sync_interval
+        self.targets = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._sem = None
+        self._handle = None
+        self._tasks = []
+        self._running = set()
+        self.checks = 0
+        self.skipped = 0
+        self.lateness_ms = 0.0    # keterlambatan tick terakhir (rata-rata bergerak)
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    async def start(self, handle):
+        # handle: coroutine function(url) -> dict hasil (do_http_scan + simpan)
+        if self._tasks:
+            return
+        self._handle = handle
+        self._wakeup = asyncio.Event()
+        self._sem = asyncio.Semaphore(self.concurrency)
+        await self.sync()
+        self._tasks = [
+            asyncio.create_task(self._loop()),
+            asyncio.create_task(self._sync_loop()),
+        ]
+
+    async def stop(self):
+        tasks = self._tasks + list(self._running)
+        for t in tasks:
+            t.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._running.clear()
+        self._wakeup = None
+        self.targets.clear()
+        self._heap.clear()
+
+    # -------------------------------
+    # Target (berlaku tanpa restart)
+    # -------------------------------
+    def upsert(self, row):
+        if self._wakeup is None:
+            return     # monitor tidak jalan di worker ini
+        if not row.enabled:
+            self.remove(row.id)
+            return
+        t = self.targets.get(row.id)
+        if t is not None and (t.url, t.interval, t.policy) == (row.url, row.interval_s, row.missed_policy):
+            return
+        if t is None:
+            t = self.targets[row.id] = Target(row.id, row.url, row.interval_s, row.missed_policy)
+        else:
+            t.url, t.interval = row.url, row.interval_s
+            t.policy = row.missed_policy if row.missed_policy in POLICIES else "skip"
+            t.version += 1
+        # fase acak: target baru tersebar dalam satu interval
+        t.base_due = self._now() + random.random() * t.interval
+        self._push(t, t.base_due)
+
+    def remove(self, target_id):
+        t = self.targets.pop(target_id, None)
+        if t is not None:
+            t.version += 1
+
+    async def sync(self):
+        async with self.session_factory() as db:
+            rows = await list_monitor_targets(db, enabled_only=True)
+        seen = set()
+        for row in rows:
+            seen.add(row.id)
+            self.upsert(row)
+        for target_id in list(self.targets):
+            if target_id not in seen:
+                self.remove(target_id)
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                log.exception("Sync monitor_target gagal")
+
+    # -------------------------------
+    # Scheduler
+    # -------------------------------
+    @staticmethod
+    def _now():
+        return asyncio.get_running_loop().time()
+
+    def _push(self, t, base_due):
+        due = base_due + random.random() * self.jitter * t.interval
+        heapq.heappush(self._heap, (due, next(self._seq), t.id, t.version))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            now = self._now()
+            while self._heap and self._heap[0][0] <= now:
+                due, _, target_id, version = heapq.heappop(self._heap)
+                t = self.targets.get(target_id)
+                if t is None or t.version != version:
+                    continue   # target dihapus / diubah
+                self._tick(t, now, due)
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _tick(self, t, now, due):
+        late = now - due
+        self.lateness_ms += (late * 1000 - self.lateness_ms) * 0.05
+
+        # tick yang sudah lewat lebih dari satu interval = terlewat
+        missed = int((now - t.base_due) // t.interval) if now - t.base_due >= t.interval else 0
+        t.base_due += (missed + 1) * t.interval
+        self._push(t, t.base_due)
+
+        if t.policy == "catchup":
+            t.owed = min(t.owed + missed, self.max_catchup)
+        else:
+            t.skipped += missed
+            self.skipped += missed
+
+        if t.running:
+            if t.policy == "catchup":
+                t.owed = min(t.owed + 1, self.max_catchup)
+            else:
+                t.skipped += 1
+                self.skipped += 1
+            return
+        self._spawn(t)
+
+    def _spawn(self, t):
+        t.running = True
+        task = asyncio.create_task(self._check(t))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _check(self, t):
+        try:
+            async with self._sem:
+                res = await self._handle(t.url)
+            t.last_status = res.get("status_code")
+            t.last_error = res.get("error")
+            t.last_latency_ms = res.get("elapsed_ms")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.exception("Check monitor %s gagal", t.url)
+            t.last_error = str(e)
+        finally:
+            t.running = False
+        t.checks += 1
+        self.checks += 1
+        # catchup: susul tick yang tertunda, satu per satu
+        if t.owed and self.targets.get(t.id) is t:
+            t.owed -= 1
+            self._spawn(t)
+
+    # -------------------------------
+    # Observability
+    # -------------------------------
+    def snapshot(self):
+        return {
+            "enabled": bool(self._tasks),
+            "targets": len(self.targets),
+            "scheduled": len(self._heap),
+            "running": len(self._running),
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "lateness_ms": round(self.lateness_ms, 1),
+            "concurrency": self.concurrency,
+        }
+
+    def target_state(self, target_id):
+        t = self.targets.get(target_id)
+        return None if t is None else t.state()
+
+
+monitor = Monitor()
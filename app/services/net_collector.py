@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import os
+import shutil
+import socket
+import struct
+import sys
+import time
+
+try:
+    import fcntl
+except ImportError:     # Windows: backend linux tidak dipakai
+    fcntl = None
+
+from app import config
+from app.utils.parse_utils import parse_netsh_interfaces, parse_ipconfig, parse_ipconfig_adapters
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# COLLECTOR STATUS JARINGAN (/scan/network)
+# ======================================
+# Backend per OS, dipilih lewat NETWORK_BACKEND (auto = dari sys.platform):
+# - linux: baca /proc/net/route, /sys/class/net/*, /proc/net/wireless dan
+#   /etc/resolv.conf langsung; alamat IPv4 lewat ioctl. Tanpa subprocess,
+#   kecuali SSID wifi (iw) kalau ada interface wireless.
+# - windows: netsh + ipconfig lewat asyncio subprocess (tanpa shell).
+# Semua command punya timeout. Snapshot di-cache NETWORK_CACHE_TTL detik
+# dan koleksi yang sedang jalan dipakai bersama (refresh dashboard beruntun
+# = satu koleksi).
+#
+# Bentuk snapshot (sama untuk semua backend):
+#   wifi: {ssid, state, bssid, signal_pct, radio_type, channel, ...} / None
+#   ip:   {ipv4, gateway, interface, dns}
+#   interfaces: [{name, state, mac, mtu, speed_mbps, ipv4, ipv6, wireless}]
+
+
+async def run_command(*args, timeout: float = config.NETWORK_CMD_TIMEOUT):
+    """Jalankan command tanpa shell; proses dibunuh kalau lewat timeout."""
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise TimeoutError(f"{args[0]} tidak selesai dalam {timeout} detik")
+    return out.decode(errors="replace")
+
+
+# ======================================
+# BACKEND LINUX
+# ======================================
+
+SIOCGIFADDR = 0x8915
+RTF_GATEWAY = 0x2
+
+
+def _read(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def _hex_ip(value: str):
+    # /proc/net/route menulis alamat little-endian hex
+    return socket.inet_ntoa(struct.pack("<I", int(value, 16)))
+
+
+def default_route(route_text: str):
+    """(interface, gateway) dari isi /proc/net/route, metric terkecil."""
+    best = None
+    for line in route_text.splitlines()[1:]:
+        cols = line.split()
+        if len(cols) < 8 or cols[1] != "00000000":
+            continue
+        if not int(cols[3], 16) & RTF_GATEWAY:
+            continue
+        metric = int(cols[6])
+        if best is None or metric < best[0]:
+            best = (metric, cols[0], _hex_ip(cols[2]))
+    return (best[1], best[2]) if best else (None, None)
+
+
+def wireless_quality(wireless_text: str):
+    """{iface: (link_quality, level_dbm)} dari /proc/net/wireless."""
+    out = {}
+    for line in wireless_text.splitlines()[2:]:
+        if ":" not in line:
+            continue
+        name, rest = line.split(":", 1)
+        cols = rest.split()
+        if len(cols) < 3:
+            continue
+        try:
+            out[name.strip()] = (float(cols[1].rstrip(".")), float(cols[2].rstrip(".")))
+        except ValueError:
+            continue
+    return out
+
+
+def parse_iw_link(raw: str):
+    """Output `iw dev <if> link` -> field wifi."""
+    if not raw or raw.startswith("Not connected"):
+        return {}
+    info = {}
+    for line in raw.splitlines():
+        line = line.strip()
+        if line.startswith("Connected to"):
+            info["bssid"] = line.split()[2]
+        elif ":" in line:
+            k, v = line.split(":", 1)
+            info[k.strip().lower()] = v.strip()
+    freq = info.get("freq", "").split(".")[0]
+    return {
+        "ssid": info.get("ssid"),
+        "bssid": info.get("bssid"),
+        "freq_mhz": int(freq) if freq.isdigit() else None,
+        "tx_bitrate": info.get("tx bitrate"),
+    }
+
+
+def _ipv4(sock, name: str):
+    try:
+        req = struct.pack("256s", name[:15].encode())
+        return socket.inet_ntoa(fcntl.ioctl(sock.fileno(), SIOCGIFADDR, req)[20:24])
+    except OSError:
+        return None
+
+
+def _ipv6(inet6_text: str):
+    out = {}
+    for line in inet6_text.splitlines():
+        cols = line.split()
+        if len(cols) < 6:
+            continue
+        addr = ":".join(cols[0][i:i + 4] for i in range(0, 32, 4))
+        out.setdefault(cols[5], []).append(socket.inet_ntop(socket.AF_INET6, socket.inet_pton(socket.AF_INET6, addr)))
+    return out
+
+
+def _nameservers(resolv_text: str):
+    return [line.split()[1] for line in resolv_text.splitlines()
+            if line.startswith("nameserver") and len(line.split()) > 1]
+
+
+class LinuxBackend:
+    name = "linux"
+
+    def __init__(self, sys_net: str = "/sys/class/net", proc_net: str = "/proc/net",
+                 resolv_conf: str = "/etc/resolv.conf"):
+        self.sys_net = sys_net
+        self.proc_net = proc_net
+        self.resolv_conf = resolv_conf
+        self.iw = shutil.which("iw")
+
+    def _interfaces(self):
+        inet6 = _ipv6(_read(os.path.join(self.proc_net, "if_inet6"), ""))
+        out = []
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            for name in sorted(os.listdir(self.sys_net)):
+                base = os.path.join(self.sys_net, name)
+                if name == "lo":
+                    continue
+                speed = _read(os.path.join(base, "speed"))   # EINVAL kalau link down / virtual
+                mtu = _read(os.path.join(base, "mtu"))
+                out.append({
+                    "name": name,
+                    "state": _read(os.path.join(base, "operstate")),
+                    "mac": _read(os.path.join(base, "address")),
+                    "mtu": int(mtu) if mtu and mtu.isdigit() else None,
+                    "speed_mbps": int(speed) if speed and speed.lstrip("-").isdigit() and int(speed) > 0 else None,
+                    "ipv4": _ipv4(sock, name),
+                    "ipv6": inet6.get(name, []),
+                    "wireless": os.path.isdir(os.path.join(base, "wireless"))
+                                or os.path.exists(os.path.join(base, "phy80211")),
+                })
+        return out
+
+    def read_files(self):
+        # semua sumber dari procfs / sysfs (in-memory, tidak ada I/O disk nyata)
+        iface, gateway = default_route(_read(os.path.join(self.proc_net, "route"), ""))
+        interfaces = self._interfaces()
+        quality = wireless_quality(_read(os.path.join(self.proc_net, "wireless"), ""))
+        ipv4 = next((i["ipv4"] for i in interfaces if i["name"] == iface), None)
+        ip = {
+            "ipv4": ipv4,
+            "gateway": gateway,
+            "interface": iface,
+            "dns": _nameservers(_read(self.resolv_conf, "")),
+        }
+        return interfaces, ip, quality
+
+    async def collect(self):
+        interfaces, ip, quality = await asyncio.to_thread(self.read_files)
+
+        wifi = None
+        wlan = [i for i in interfaces if i["wireless"]]
+        if wlan:
+            # interface wireless yang dipakai default route, kalau tidak yang pertama
+            dev = next((i for i in wlan if i["name"] == ip["interface"]), wlan[0])
+            link, level = quality.get(dev["name"], (None, None))
+            up = dev["state"] == "up"
+            wifi = {
+                "interface": dev["name"],
+                "state": "connected" if up else "disconnected",
+                # link quality /proc/net/wireless umumnya skala 0-70
+                "signal_pct": min(100, int(link * 100 / 70)) if link is not None else None,
+                "signal_dbm": level,
+                "ssid": None,
+                "bssid": None,
+            }
+            if up and self.iw:
+                try:
+                    wifi.update(parse_iw_link(await run_command(self.iw, "dev", dev["name"], "link")))
+                except Exception as e:
+                    log.debug("iw gagal: %s", e)
+        return {"wifi": wifi, "ip": ip, "interfaces": interfaces}
+
+
+# ======================================
+# BACKEND WINDOWS
+# ======================================
+
+class WindowsBackend:
+    name = "windows"
+
+    async def collect(self):
+        wifi_raw, ip_raw = await asyncio.gather(
+            run_command("netsh", "wlan", "show", "interfaces"),
+            run_command("ipconfig", "/all"),
+        )
+        adapters = parse_ipconfig_adapters(ip_raw)
+        interfaces = [{
+            "name": a["name"],
+            "state": "up" if a["state"] == "connected" else "down",
+            "mac": a["mac"],
+            "mtu": None,
+            "speed_mbps": None,
+            "ipv4": a["ipv4"][0] if a["ipv4"] else None,
+            "ipv6": a["ipv6"],
+            "wireless": a["type"] == "wireless",
+        } for a in adapters]
+        return {"wifi": parse_netsh_interfaces(wifi_raw), "ip": parse_ipconfig(ip_raw), "interfaces": interfaces}
+
+
+BACKENDS = {"linux": LinuxBackend, "windows": WindowsBackend}
+
+
+def pick_backend(name: str = config.NETWORK_BACKEND):
+    if name == "auto":
+        name = "windows" if sys.platform.startswith("win") else "linux"
+    if name not in BACKENDS:
+        raise ValueError(f"NETWORK_BACKEND tidak dikenal: {name}")
+    return BACKENDS[name]()
+
+
+# ======================================
+# COLLECTOR (CACHE TTL + SINGLE-FLIGHT)
+# ======================================
+
+class NetworkCollector:
+    def __init__(self, backend=None, ttl: float = config.NETWORK_CACHE_TTL):
+        self._backend = backend
+        self.ttl = ttl
+        self._snapshot = None
+        self._expires = 0.0
+        self._inflight = None
+        self.collections = 0
+        self.hits = 0
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = pick_backend()
+        return self._backend
+
+    async def collect(self):
+        """Return (snapshot, fresh). fresh=False kalau dari cache / koleksi yang sama."""
+        if self._snapshot is not None and time.monotonic() < self._expires:
+            self.hits += 1
+            return self._snapshot, False
+        if self._inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(self._inflight), False
+
+        self._inflight = asyncio.ensure_future(self._collect())
+        return await asyncio.shield(self._inflight), True
+
+    async def _collect(self):
+        try:
+            snap = await self.backend.collect()
+            snap["platform"] = self.backend.name
+            self.collections += 1
+            self._snapshot = snap
+            self._expires = time.monotonic() + self.ttl
+            return snap
+        finally:
+            self._inflight = None
+
+    def snapshot(self):
+        return {
+            "backend": self.backend.name,
+            "ttl": self.ttl,
+            "collections": self.collections,
+            "hits": self.hits,
+        }
+
+
+net_collector = NetworkCollector()
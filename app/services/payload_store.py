@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.exc import IntegrityError
+
+from app import config
+from app.db.database import SessionLocal
+from app.db.crud import (
+    get_scan_payloads,
+    existing_scan_payload_hashes,
+    bulk_create_scan_payloads,
+    list_legacy_dns_rows,
+    set_scan_history_payloads,
+)
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# PAYLOAD STORE (CONTENT-ADDRESSED)
+# ======================================
+# Jawaban DNS dan snapshot wifi/ip disimpan sekali per isi di tabel
+# scan_payload, scan_history cukup menyimpan hash-nya. Monitoring berulang
+# ke host yang sama -> payload yang sama -> tidak ada baris payload baru.
+
+
+def encode_payload(obj):
+    """JSON ter-normalisasi (key urut, tanpa spasi) + hash blake2b-128."""
+    text = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest(), text
+
+
+def dns_payload(dns):
+    # (hostname, alias, ip) dari resolver; urutan ip bisa berputar (round robin)
+    if not dns:
+        return dns
+    name, aliases, ips = dns
+    return [name, sorted(aliases), sorted(ips)]
+
+
+class PayloadStore:
+    def __init__(self, session_factory=SessionLocal, cache_size: int = config.PAYLOAD_CACHE_SIZE):
+        self.session_factory = session_factory
+        self.cache_size = cache_size
+        self._known = OrderedDict()    # hash yang sudah ada di DB (LRU)
+        self._lock = threading.Lock()  # dipakai dari thread writer & request
+        self._task = None
+        self.stored = 0
+        self.reused = 0
+        self.migrated = 0
+
+    # -------------------------------
+    # Lifecycle (migrasi kolom dns lama)
+    # -------------------------------
+    async def start(self):
+        if config.PAYLOAD_MIGRATE_ON_START and self._task is None:
+            self._task = asyncio.create_task(self._migrate_task())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _migrate_task(self):
+        try:
+            last_id = 0
+            while True:
+                last_id, n = await asyncio.to_thread(self.migrate_chunk, last_id)
+                if n == 0:
+                    break
+                await asyncio.sleep(0)
+            if self.migrated:
+                log.info("Payload store: %d baris dns lama dipindah", self.migrated)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Migrasi payload dns lama gagal")
+
+    def migrate_chunk(self, after_id: int, chunk: int = config.PAYLOAD_MIGRATE_CHUNK):
+        db = self.session_factory()
+        try:
+            rows = list_legacy_dns_rows(db, after_id, chunk)
+            if not rows:
+                return after_id, 0
+            payloads, updates = {}, []
+            for row_id, raw in rows:
+                try:
+                    h, text = encode_payload(json.loads(raw))
+                except ValueError:
+                    # bukan JSON valid -> simpan apa adanya
+                    h, text = hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest(), raw
+                payloads[h] = text
+                updates.append({"id": row_id, "payload_hash": h})
+            self.intern(db, payloads)
+            set_scan_history_payloads(db, updates)
+            self.migrated += len(updates)
+            return rows[-1][0], len(rows)
+        finally:
+            db.close()
+
+    # -------------------------------
+    # Tulis
+    # -------------------------------
+    def intern(self, db, payloads: dict):
+        """Pastikan semua {hash: body} ada di scan_payload (insert yang belum ada)."""
+        with self._lock:
+            missing = [h for h in payloads if h not in self._known]
+        if not missing:
+            self.reused += len(payloads)
+            return
+
+        existing = existing_scan_payload_hashes(db, missing)
+        new = {h: payloads[h] for h in missing if h not in existing}
+        if new:
+            try:
+                bulk_create_scan_payloads(db, new)
+            except IntegrityError:
+                # proses lain baru saja menyimpan payload yang sama
+                db.rollback()
+                existing = existing_scan_payload_hashes(db, list(new))
+                new = {h: body for h, body in new.items() if h not in existing}
+                if new:
+                    bulk_create_scan_payloads(db, new)
+
+        self.stored += len(new)
+        self.reused += len(payloads) - len(new)
+        with self._lock:
+            for h in payloads:
+                self._known[h] = True
+                self._known.move_to_end(h)
+            while len(self._known) > self.cache_size:
+                self._known.popitem(last=False)
+
+    def prepare_rows(self, rows: list):
+        """Ganti field `payload` (object) di row dict dengan payload_hash."""
+        payloads = {}
+        for row in rows:
+            if "payload" not in row:
+                continue
+            obj = row.pop("payload")
+            if obj is None:
+                continue
+            h, text = encode_payload(obj)
+            row["payload_hash"] = h
+            payloads[h] = text
+        return payloads
+
+    # -------------------------------
+    # Baca
+    # -------------------------------
+    async def load(self, db, hashes):
+        hashes = [h for h in set(hashes) if h]
+        if not hashes:
+            return {}
+        return await get_scan_payloads(db, hashes)
+
+    def snapshot(self):
+        return {
+            "stored": self.stored,
+            "reused": self.reused,
+            "migrated": self.migrated,
+            "cached_hashes": len(self._known),
+        }
+
+
+payload_store = PayloadStore()
@@ -0,0 +1,551 @@
+import asyncio
+import errno
+import ipaddress
+import logging
+import socket
+import struct
+import time
+import uuid
+from collections import deque
+
+from app import config
+from app.db.database import SessionLocal
+from app.db.crud import save_open_ports
+from app.services.dns_resolver import resolver
+from app.services.prom import PORT_PROBES, DB_WRITE, DB_ROWS, DB_ERRORS
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# PORT SCANNER (TCP CONNECT SCAN)
+# ======================================
+# Target = host / IP / CIDR, port = "22,80,8000-8100" / "top".
+# - target dibangkitkan lazy (generator): /16 x 1000 port tidak pernah jadi list
+# - urutan port-major (port 1 ke semua host, lalu port 2, ...) supaya beban
+#   tersebar antar host; batas rate per host tetap dijaga PORT_SCAN_RATE_PER_HOST
+# - N worker tetap menarik dari satu iterator (tanpa task per probe);
+#   connect non-blocking langsung di socket + add_writer, timeout semua
+#   probe satu scan lewat satu antrian FIFO (timeout sama -> tanpa heap
+#   timer per probe). ProactorEventLoop (Windows) pakai loop.sock_connect.
+# - open / closed (RST) / filtered (timeout) / error dihitung; hanya port
+#   open yang dilaporkan, disimpan per batch ke tabel open_port
+# - socket open ditutup dengan RST (SO_LINGER 0) supaya tidak menumpuk TIME_WAIT
+# - EMFILE / ENFILE saat membuat socket: concurrency scan diturunkan (worker
+#   berlebih berhenti) dan probe diulang dengan jeda, bukan dihitung error
+
+FINISHED = ("done", "cancelled", "failed")
+SUBSCRIBER_TIMEOUT = 30.0
+
+TOP_PORTS = (
+    21, 22, 23, 25, 53, 80, 81, 110, 111, 135, 139, 143, 389, 443, 445, 465, 587,
+    993, 995, 1433, 1521, 1723, 2049, 2375, 3000, 3306, 3389, 5000, 5432, 5900,
+    5985, 6379, 8000, 8008, 8080, 8081, 8443, 8888, 9000, 9090, 9200, 11211, 27017,
+)
+# port yang diam sampai client bicara duluan -> kirim request HTTP kecil
+HTTP_PORTS = {80, 81, 3000, 5000, 8000, 8008, 8080, 8081, 8888, 9000, 9090, 9200}
+HTTP_PROBE = b"HEAD / HTTP/1.0\r\n\r\n"
+LINGER_RST = struct.pack("ii", 1, 0)
+TIMED_OUT = object()
+# kehabisan file descriptor: concurrency turun satu per kegagalan, probe diulang
+NO_FD = (errno.EMFILE, errno.ENFILE)
+FD_BACKOFF = 0.05
+FD_RETRIES = 20
+
+
+if hasattr(asyncio, "timeout"):
+    # python 3.11+: timeout tanpa task tambahan per probe
+    async def _with_timeout(aw, timeout):
+        async with asyncio.timeout(timeout):
+            return await aw
+else:
+    async def _with_timeout(aw, timeout):
+        return await asyncio.wait_for(aw, timeout)
+
+
+def _wake(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+def _selector_loop(loop):
+    # add_writer tidak tersedia di ProactorEventLoop
+    with socket.socket() as s:
+        try:
+            loop.remove_writer(s.fileno())
+        except NotImplementedError:
+            return False
+    return True
+
+
+class TimeoutQueue:
+    """Timeout connect bersama untuk satu scan; resolusi = tick."""
+
+    def __init__(self, loop, timeout: float):
+        self.loop = loop
+        self.timeout = timeout
+        self.tick = min(max(timeout / 10, 0.01), 0.1)
+        self.queue = deque()     # (deadline, future), deadline naik terus
+
+    def add(self, fut):
+        self.queue.append((self.loop.time() + self.timeout, fut))
+
+    async def run(self):
+        q = self.queue
+        while True:
+            await asyncio.sleep(self.tick)
+            now = self.loop.time()
+            while q and (q[0][1].done() or q[0][0] <= now):
+                fut = q.popleft()[1]
+                if not fut.done():
+                    fut.set_result(TIMED_OUT)
+
+
+# ======================================
+# TARGET & PORT
+# ======================================
+
+def parse_ports(spec):
+    """'22,80,8000-8100' / 'top' / [22, 80] -> tuple port unik terurut."""
+    if isinstance(spec, (list, tuple)):
+        parts = [str(p) for p in spec]
+    else:
+        parts = str(spec).replace(" ", "").split(",")
+    ports = set()
+    for part in parts:
+        if not part:
+            continue
+        if part.lower() == "top":
+            ports.update(TOP_PORTS)
+            continue
+        lo, sep, hi = part.partition("-")
+        try:
+            lo = int(lo)
+            hi = int(hi) if sep else lo
+        except ValueError:
+            raise ValueError(f"Port tidak valid: {part}")
+        if not 1 <= lo <= hi <= 65535:
+            raise ValueError(f"Port di luar 1-65535: {part}")
+        ports.update(range(lo, hi + 1))
+    if not ports:
+        raise ValueError("Tidak ada port")
+    return tuple(sorted(ports))
+
+
+def parse_targets(spec):
+    """Host / IP / CIDR (dipisah koma / spasi) -> list ip_network atau hostname."""
+    parts = spec if isinstance(spec, (list, tuple)) else str(spec).replace(",", " ").split()
+    out = []
+    for part in parts:
+        part = str(part).strip()
+        if not part:
+            continue
+        try:
+            out.append(ipaddress.ip_network(part, strict=False))
+        except ValueError:
+            if "/" in part or not all(c.isalnum() or c in "-._" for c in part):
+                raise ValueError(f"Target tidak valid: {part}")
+            out.append(part.lower())
+    if not out:
+        raise ValueError("Tidak ada target")
+    return out
+
+
+def _network_hosts(net):
+    # /31, /32 (dan /127, /128): semua alamat; selain itu tanpa network / broadcast
+    return iter(net) if net.num_addresses <= 2 else net.hosts()
+
+
+def _network_size(net):
+    return net.num_addresses if net.num_addresses <= 2 else net.num_addresses - (2 if net.version == 4 else 1)
+
+
+def host_count(targets):
+    return sum(_network_size(t) if not isinstance(t, str) else 1 for t in targets)
+
+
+def iter_hosts(targets, resolved):
+    """Generator (ip, hostname) tanpa materialisasi range."""
+    for t in targets:
+        if isinstance(t, str):
+            if resolved.get(t):
+                yield resolved[t], t
+        else:
+            for ip in _network_hosts(t):
+                yield str(ip), None
+
+
+def iter_probes(targets, ports, resolved):
+    for port in ports:
+        for ip, hostname in iter_hosts(targets, resolved):
+            yield ip, hostname, port
+
+
+# ======================================
+# SCAN
+# ======================================
+
+class PortScan:
+    def __init__(self, id, targets, ports, total, concurrency, timeout,
+                 rate_per_host, banner, spec):
+        self.id = id
+        self.targets = targets
+        self.ports = ports
+        self.total = total
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.rate_per_host = rate_per_host
+        self.banner = banner
+        self.spec = spec
+        self.status = "running"
+        self.error = None
+        self.probed = 0
+        self.open = 0
+        self.closed = 0
+        self.filtered = 0
+        self.errors = 0
+        self.unresolved = []
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.task = None
+        self._subscriber = None
+        self._next_slot = {}     # ip -> waktu probe berikutnya (rate per host)
+
+    def progress(self):
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "id": self.id,
+            "status": self.status,
+            "targets": self.spec,
+            "ports": len(self.ports),
+            "total": self.total,
+            "concurrency": self.concurrency,
+            "probed": self.probed,
+            "open": self.open,
+            "closed": self.closed,
+            "filtered": self.filtered,
+            "errors": self.errors,
+            "unresolved": self.unresolved,
+            "rate": round(self.probed / elapsed, 1) if elapsed > 0 else 0.0,
+            "elapsed_s": round(elapsed, 2),
+            "error": self.error,
+        }
+
+    # -------------------------------
+    # Stream hasil (sama dengan BulkJob)
+    # -------------------------------
+    def attach(self, size: int):
+        self._subscriber = asyncio.Queue(maxsize=size)
+
+    async def publish(self, event):
+        q = self._subscriber
+        if q is None:
+            return
+        try:
+            await asyncio.wait_for(q.put(event), SUBSCRIBER_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._subscriber = None
+
+    def _close_subscriber(self):
+        q = self._subscriber
+        if q is None:
+            return
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(None)
+
+    async def events(self):
+        """Yield (index, port open) sampai scan selesai / dibatalkan."""
+        q = self._subscriber
+        if q is None:
+            return
+        try:
+            while True:
+                ev = await q.get()
+                if ev is None:
+                    return
+                yield ev
+        finally:
+            self._subscriber = None
+
+
+class PortScanner:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_running: int = config.PORT_SCAN_MAX_RUNNING,
+        flush_size: int = config.PORT_SCAN_FLUSH_SIZE,
+        banner_timeout: float = config.PORT_SCAN_BANNER_TIMEOUT,
+        keep_finished: int = 50,
+    ):
+        self.session_factory = session_factory
+        self.max_running = max_running
+        self.flush_size = flush_size
+        self.banner_timeout = banner_timeout
+        self.keep_finished = keep_finished
+        self.scans = {}
+
+    async def stop(self):
+        running = [s for s in self.scans.values() if s.task is not None and not s.task.done()]
+        for s in running:
+            s.task.cancel()
+        if running:
+            await asyncio.wait([s.task for s in running])
+        for s in running:
+            self._finish_unstarted(s)
+
+    # -------------------------------
+    # Submit / cancel
+    # -------------------------------
+    def running(self):
+        return sum(1 for s in self.scans.values() if s.status == "running")
+
+    def create(self, targets, ports, concurrency=None, timeout=None,
+               rate_per_host=None, banner=False, spec=None):
+        """Validasi + buat scan (belum jalan). ValueError kalau input tidak valid."""
+        targets = parse_targets(targets)
+        ports = parse_ports(ports)
+        total = host_count(targets) * len(ports)
+        if total > config.PORT_SCAN_MAX_PROBES:
+            raise ValueError(f"Terlalu banyak probe ({total}), maksimal {config.PORT_SCAN_MAX_PROBES}")
+        if self.running() >= self.max_running:
+            raise RuntimeError("Terlalu banyak port scan berjalan")
+        concurrency = min(max(int(concurrency or config.PORT_SCAN_CONCURRENCY), 1),
+                          config.PORT_SCAN_MAX_CONCURRENCY, total)
+        return PortScan(
+            id=uuid.uuid4().hex[:16],
+            targets=targets,
+            ports=ports,
+            total=total,
+            concurrency=concurrency,
+            timeout=float(timeout or config.PORT_SCAN_TIMEOUT),
+            rate_per_host=float(config.PORT_SCAN_RATE_PER_HOST if rate_per_host is None else rate_per_host),
+            banner=banner,
+            spec=spec,
+        )
+
+    def launch(self, scan: PortScan, handle=None, attach: bool = False):
+        # handle: coroutine function(scan, result) untuk setiap port open
+        if attach:
+            scan.attach(1000)
+        self.scans[scan.id] = scan
+        scan.task = asyncio.create_task(self._run(scan, handle))
+        self._trim_finished()
+        return scan
+
+    async def cancel(self, scan_id):
+        scan = self.scans.get(scan_id)
+        if scan is None or scan.task is None or scan.task.done():
+            return False
+        scan.task.cancel()
+        await asyncio.wait([scan.task])
+        self._finish_unstarted(scan)
+        return True
+
+    def _finish_unstarted(self, scan):
+        # task dibatalkan sebelum _run sempat jalan -> finally di _run tidak
+        # pernah dieksekusi (sama dengan JobManager)
+        if scan.status != "running" or not scan.task.done():
+            return
+        scan.status = "cancelled"
+        scan.finished_at = time.monotonic()
+        scan._close_subscriber()
+
+    def _trim_finished(self):
+        finished = [s for s in self.scans.values() if s.status in FINISHED]
+        for s in finished[:max(len(finished) - self.keep_finished, 0)]:
+            self.scans.pop(s.id, None)
+
+    # -------------------------------
+    # Engine
+    # -------------------------------
+    async def _run(self, scan: PortScan, handle):
+        pending = []
+        try:
+            hostnames = [t for t in scan.targets if isinstance(t, str)]
+            results = await asyncio.gather(*[resolver.resolve(h) for h in hostnames])
+            resolved = {}
+            for h, res in zip(hostnames, results):
+                if res and res[2]:
+                    resolved[h] = res[2][0]
+                else:
+                    scan.unresolved.append(h)
+            scan.total -= len(scan.unresolved) * len(scan.ports)
+
+            probes = iter_probes(scan.targets, scan.ports, resolved)
+            loop = asyncio.get_running_loop()
+            timeouts = TimeoutQueue(loop, scan.timeout) if _selector_loop(loop) else None
+            if timeouts is not None:
+                sweeper = asyncio.create_task(timeouts.run())
+
+            workers = [scan.concurrency]
+
+            async def worker():
+                for ip, hostname, port in probes:
+                    if scan.rate_per_host > 0:
+                        await self._throttle(scan, ip, loop)
+                    state, res = await self.probe(ip, port, scan, timeouts, loop)
+                    tries = 0
+                    while state == "no_fd" and tries < FD_RETRIES:
+                        # tunggu socket worker lain tertutup lalu ulang probe yang sama
+                        scan.concurrency = max(scan.concurrency - 1, 1)
+                        tries += 1
+                        await asyncio.sleep(FD_BACKOFF * tries)
+                        state, res = await self.probe(ip, port, scan, timeouts, loop)
+                    scan.probed += 1
+                    if state == "closed":
+                        scan.closed += 1
+                    elif state == "filtered":
+                        scan.filtered += 1
+                    elif state != "open":
+                        scan.errors += 1
+                    else:
+                        res["hostname"] = hostname
+                        scan.open += 1
+                        pending.append(res)
+                        await scan.publish((scan.open - 1, res))
+                        if handle is not None:
+                            try:
+                                await handle(scan, res)
+                            except Exception:
+                                log.exception("Handle port scan gagal")
+                        if len(pending) >= self.flush_size:
+                            await self._flush(scan, pending)
+                    # concurrency diturunkan -> worker berlebih berhenti
+                    if workers[0] > scan.concurrency:
+                        workers[0] -= 1
+                        return
+
+            try:
+                await asyncio.gather(*[worker() for _ in range(scan.concurrency)])
+            finally:
+                if timeouts is not None:
+                    sweeper.cancel()
+            scan.status = "done"
+        except asyncio.CancelledError:
+            scan.status = "cancelled"
+        except Exception as e:
+            log.exception("Port scan %s gagal", scan.id)
+            scan.status = "failed"
+            scan.error = str(e)
+        finally:
+            scan.finished_at = time.monotonic()
+            scan._next_slot.clear()
+            # counter per probe terlalu mahal di loop 20k probe/detik -> sekali di akhir
+            for state in ("open", "closed", "filtered", "errors"):
+                PORT_PROBES.labels(state).inc(getattr(scan, state))
+            try:
+                await self._flush(scan, pending)
+            except Exception:
+                log.exception("Gagal menyimpan open_port scan %s", scan.id)
+            scan._close_subscriber()
+
+    async def _throttle(self, scan, ip, loop):
+        now = loop.time()
+        slot = max(scan._next_slot.get(ip, now), now)
+        scan._next_slot[ip] = slot + 1.0 / scan.rate_per_host
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def probe(self, ip, port, scan, timeouts, loop):
+        """Return (state, hasil): open / closed (RST) / filtered (timeout) / error / no_fd."""
+        try:
+            sock = socket.socket(socket.AF_INET6 if ":" in ip else socket.AF_INET, socket.SOCK_STREAM)
+        except OSError as e:
+            # EMFILE / ENFILE -> worker menurunkan concurrency lalu mengulang
+            return ("no_fd" if e.errno in NO_FD else "error"), None
+        sock.setblocking(False)
+        start = time.perf_counter()
+        try:
+            if timeouts is not None:
+                state = await self._connect(sock, (ip, port), timeouts, loop)
+            else:
+                state = await self._sock_connect(sock, (ip, port), scan.timeout, loop)
+            if state != "open":
+                return state, None
+            result = {
+                "host": ip,
+                "port": port,
+                "latency_ms": int((time.perf_counter() - start) * 1000),
+                "banner": await self._banner(sock, port, loop) if scan.banner else None,
+            }
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, LINGER_RST)
+            return "open", result
+        finally:
+            sock.close()
+
+    @staticmethod
+    async def _connect(sock, addr, timeouts, loop):
+        try:
+            sock.connect(addr)
+            return "open"
+        except BlockingIOError:
+            pass
+        except ConnectionRefusedError:
+            return "closed"
+        except OSError:
+            return "error"
+        fd = sock.fileno()
+        fut = loop.create_future()
+        loop.add_writer(fd, _wake, fut)
+        timeouts.add(fut)
+        try:
+            if await fut is TIMED_OUT:
+                return "filtered"
+        finally:
+            loop.remove_writer(fd)
+        err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err == 0:
+            return "open"
+        # host unreachable, network unreachable, dll -> error
+        return "closed" if err == errno.ECONNREFUSED else "error"
+
+    @staticmethod
+    async def _sock_connect(sock, addr, timeout, loop):
+        try:
+            await _with_timeout(loop.sock_connect(sock, addr), timeout)
+        except ConnectionRefusedError:
+            return "closed"
+        except asyncio.TimeoutError:
+            return "filtered"
+        except OSError:
+            return "error"
+        return "open"
+
+    async def _banner(self, sock, port, loop):
+        try:
+            if port in HTTP_PORTS:
+                await loop.sock_sendall(sock, HTTP_PROBE)
+            data = await _with_timeout(loop.sock_recv(sock, 512), self.banner_timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        text = data.decode("utf-8", "replace").strip()
+        return text.splitlines()[0][:255] if text else None
+
+    async def _flush(self, scan, pending):
+        if not pending:
+            return
+        rows = [{"scan_id": scan.id, **r} for r in pending]
+        pending.clear()
+        try:
+            with DB_WRITE.labels("open_port").time():
+                await asyncio.to_thread(self._write, rows)
+        except Exception:
+            DB_ERRORS.labels("open_port").inc()
+            raise
+        DB_ROWS.labels("open_port").inc(len(rows))
+
+    def _write(self, rows):
+        db = self.session_factory()
+        try:
+            save_open_ports(db, rows)
+        finally:
+            db.close()
+
+    # -------------------------------
+    # Observability
+    # -------------------------------
+    def list(self):
+        return [s.progress() for s in self.scans.values()]
+
+
+port_scanner = PortScanner()
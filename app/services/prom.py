@@ -0,0 +1,367 @@
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from app import config
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# REGISTRY METRICS (PROMETHEUS / OPENMETRICS)
+# ======================================
+# Counter, Gauge dan Histogram ringan tanpa dependency, diekspos di
+# GET /metrics (app/routes/metrics.py).
+# - update = satu lock kecil + penjumlahan float, aman dari thread writer
+# - gauge callback (fn) dihitung saat scrape, jadi tidak ada biaya di jalur scan
+# - multi-process (uvicorn --workers N / gunicorn): kalau PROM_MULTIPROC_DIR
+#   diisi, tiap proses menulis snapshot ke <dir>/metrics_<pid>.json setiap
+#   PROM_FLUSH_INTERVAL detik (atomic rename). Scrape di worker mana pun
+#   menggabungkan semua file: counter & histogram dijumlah (termasuk proses
+#   yang sudah mati, supaya counter tidak turun), gauge dijumlah hanya dari
+#   proses yang masih hidup.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+TEXT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Child:
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, n: float = 1.0):
+        with self.lock:
+            self.value += n
+
+    def dec(self, n: float = 1.0):
+        with self.lock:
+            self.value -= n
+
+    def set(self, v: float):
+        self.value = v
+
+    def get(self):
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ("lock", "bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # bucket terakhir = +Inf
+        self.sum = 0.0
+
+    def observe(self, v: float):
+        i = 0
+        for b in self.bounds:
+            if v <= b:
+                break
+            i += 1
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += v
+
+    def time(self):
+        return _Timer(self)
+
+    def get(self):
+        with self.lock:
+            return list(self.counts) + [self.sum]
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, doc: str, labelnames=(), registry=None):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+        (registry or REGISTRY).register(self)
+
+    def _new_child(self):
+        return _Child()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: label {self.labelnames}, dapat {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def collect(self):
+        """{label_values: nilai} (histogram: [count per bucket..., sum])."""
+        return {k: c.get() for k, c in list(self._children.items())}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, n: float = 1.0):
+        self._default.inc(n)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, doc, labelnames=(), fn=None, registry=None):
+        # fn: dipanggil saat scrape -> angka, atau {label_values: angka}
+        self.fn = fn
+        super().__init__(name, doc, labelnames, registry)
+
+    def inc(self, n: float = 1.0):
+        self._default.inc(n)
+
+    def dec(self, n: float = 1.0):
+        self._default.dec(n)
+
+    def set(self, v: float):
+        self._default.set(v)
+
+    def collect(self):
+        if self.fn is None:
+            return super().collect()
+        try:
+            value = self.fn()
+        except Exception:
+            log.exception("Gauge %s gagal dihitung", self.name)
+            return {}
+        if isinstance(value, dict):
+            return {tuple(str(x) for x in (k if isinstance(k, tuple) else (k,))): float(v)
+                    for k, v in value.items()}
+        return {(): float(value)}
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, v: float):
+        self._default.observe(v)
+
+    def time(self):
+        return self._default.time()
+
+
+# ======================================
+# REGISTRY + MULTI-PROCESS
+# ======================================
+
+def _pid_alive(pid: int):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True     # ada, tapi milik user lain
+    return True
+
+
+def _fmt(v: float):
+    if v == math.inf:
+        return "+Inf"
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(v)
+
+
+def _escape(v: str):
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    def __init__(self, multiproc_dir: str = config.PROM_MULTIPROC_DIR,
+                 flush_interval: float = config.PROM_FLUSH_INTERVAL):
+        self.metrics = {}
+        self.multiproc_dir = multiproc_dir or None
+        self.flush_interval = flush_interval
+        self._task = None
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} sudah terdaftar")
+        self.metrics[metric.name] = metric
+
+    # -------------------------------
+    # Lifecycle (flush file per proses)
+    # -------------------------------
+    @property
+    def _path(self):
+        return os.path.join(self.multiproc_dir, f"metrics_{os.getpid()}.json")
+
+    async def start(self):
+        if self.multiproc_dir and self._task is None:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.flush()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Gagal menulis file metrics")
+            await asyncio.sleep(self.flush_interval)
+
+    def _local(self):
+        return {name: [[list(k), v] for k, v in m.collect().items()] for name, m in self.metrics.items()}
+
+    async def flush(self):
+        # nilai dikumpulkan di event loop (gauge callback membaca state service),
+        # hanya tulis file yang di thread
+        await asyncio.to_thread(self._write_file, self._local())
+
+    def _write_file(self, metrics):
+        tmp = self._path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"pid": os.getpid(), "metrics": metrics}, f)
+        os.replace(tmp, self._path)
+
+    # -------------------------------
+    # Gabung semua proses
+    # -------------------------------
+    def _merged(self):
+        local = self._local()
+        if not self.multiproc_dir:
+            return {name: {tuple(k): v for k, v in samples} for name, samples in local.items()}
+
+        out = {name: {} for name in self.metrics}
+        sources = [(os.getpid(), local)]
+        for path in glob.glob(os.path.join(self.multiproc_dir, "metrics_*.json")):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue    # sedang ditulis / rusak
+            if data.get("pid") != os.getpid():
+                sources.append((data.get("pid"), data.get("metrics", {})))
+
+        for pid, metrics in sources:
+            alive = pid == os.getpid() or _pid_alive(pid)
+            for name, samples in metrics.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                merged = out[name]
+                for key, value in samples:
+                    key = tuple(key)
+                    if metric.kind == "histogram":
+                        prev = merged.get(key)
+                        merged[key] = value if prev is None else [a + b for a, b in zip(prev, value)]
+                    else:
+                        merged[key] = merged.get(key, 0.0) + value
+        return out
+
+    # -------------------------------
+    # Exposition
+    # -------------------------------
+    def render(self, openmetrics: bool = True):
+        lines = []
+        merged = self._merged()
+        for name, metric in sorted(self.metrics.items()):
+            samples = merged.get(name, {})
+            family = name[:-6] if metric.kind == "counter" and name.endswith("_total") else name
+            lines.append(f"# HELP {family if openmetrics else name} {metric.doc}")
+            lines.append(f"# TYPE {family if openmetrics else name} {metric.kind}")
+            names = metric.labelnames
+            for key, value in sorted(samples.items()):
+                if metric.kind == "histogram":
+                    counts, total = value[:-1], value[-1]
+                    cumulative = 0
+                    for bound, n in zip(list(metric.bounds) + [math.inf], counts):
+                        cumulative += n
+                        le = 'le="%s"' % _fmt(bound)
+                        lines.append(f"{name}_bucket{_labels(names, key, le)} {cumulative}")
+                    lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(names, key)} {_fmt(total)}")
+                else:
+                    lines.append(f"{name}{_labels(names, key)} {_fmt(value)}")
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ======================================
+# METRICS SCANNER
+# ======================================
+# gauge berbasis callback (WebSocket, antrian writer, agent) didaftarkan di
+# app/routes/metrics.py supaya modul ini tidak mengimpor service lain.
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+SCANS_INFLIGHT = Gauge("scanner_scans_inflight", "HTTP scan yang sedang berjalan")
+SCAN_DURATION = Histogram("scanner_scan_duration_seconds", "Durasi do_http_scan (DNS + antri slot host + HTTP)")
+SCAN_RESULTS = Counter("scanner_scan_results_total", "Hasil scan web per source dan kategori (WEB_RESULTS)",
+                       ("source", "category"))
+SEMAPHORE_WAIT = Histogram("scanner_semaphore_wait_seconds", "Waktu menunggu slot concurrency",
+                           ("limiter",), buckets=WAIT_BUCKETS)
+
+DB_WRITE = Histogram("scanner_db_write_seconds", "Durasi satu batch tulis ke DB (sampai commit)", ("table",))
+DB_ROWS = Counter("scanner_db_rows_written_total", "Baris yang ditulis ke DB", ("table",))
+DB_ERRORS = Counter("scanner_db_write_errors_total", "Batch yang gagal ditulis ke DB", ("table",))
+
+WS_FRAMES_SENT = Counter("scanner_ws_frames_sent_total", "Frame WebSocket terkirim")
+WS_FRAMES_DROPPED = Counter("scanner_ws_frames_dropped_total", "Frame dibuang karena antrian client penuh")
+WS_SLOW_DISCONNECTS = Counter("scanner_ws_slow_disconnects_total", "Client diputus karena terlalu lambat")
+
+AGENT_POLLS = Counter("scanner_agent_polls_total", "Poll agent per hasil", ("result",))
+AGENT_POLL_DURATION = Histogram("scanner_agent_poll_seconds", "Durasi poll satu agent")
+AGENT_INGEST_SAMPLES = Counter("scanner_agent_ingest_samples_total", "Sample agent push yang disimpan")
+AGENT_INGEST_BYTES = Counter("scanner_agent_ingest_bytes_total", "Byte upload agent push (sebelum dekompresi)")
+
+PORT_PROBES = Counter("scanner_port_probes_total", "Probe port scan per hasil", ("state",))
@@ -0,0 +1,249 @@
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from app import config
+from app.utils.tracing import Trace, activate, deactivate
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# REQUEST TRACING (MIDDLEWARE)
+# ======================================
+# Setiap request HTTP dapat satu Trace (root span) yang diisi span dari
+# route, crud dan mesin scan (app/utils/tracing.py). Hasilnya:
+# - header Server-Timing: total durasi per nama span + total request,
+#   langsung terlihat di tab Network / Timing browser
+# - log request lambat: request >= TRACE_SLOW_MS (diambil sebagian
+#   TRACE_SLOW_SAMPLE) disimpan lengkap dengan pohon span, dibaca lewat
+#   GET /scan/traces
+# - ?profile=1 (khusus admin, header x-admin-token): request dijalankan
+#   dengan sampling profiler dan response diganti profil stack collapsed
+#   (format flamegraph.pl / speedscope)
+
+SERVER_TIMING_MAX = 20      # jumlah metric maksimal di header
+
+
+def server_timing(root):
+    totals = {}
+    stack = list(reversed(root.children))
+    now = time.perf_counter()
+    while stack:
+        sp = stack.pop()
+        totals[sp.name] = totals.get(sp.name, 0.0) + sp.duration_ms(now)
+        stack.extend(reversed(sp.children))
+    parts = [f"{name};dur={ms:.1f}" for name, ms in list(totals.items())[:SERVER_TIMING_MAX]]
+    parts.append(f"total;dur={root.duration_ms(now):.1f}")
+    return ", ".join(parts)
+
+
+def admin_allowed(token: str, admin_token: str = None):
+    """x-admin-token cocok dengan ADMIN_TOKEN; ADMIN_TOKEN kosong = fitur admin mati."""
+    admin_token = config.ADMIN_TOKEN if admin_token is None else admin_token
+    return bool(admin_token) and hmac.compare_digest((token or "").encode(), admin_token.encode())
+
+
+def format_tree(node: dict, depth: int = 0):
+    attrs = " ".join(f"{k}={v}" for k, v in (node.get("attrs") or {}).items())
+    lines = [f"{'  ' * depth}{node['name']} {node['ms']:.1f}ms {attrs}".rstrip()]
+    for child in node.get("children", []):
+        lines.extend(format_tree(child, depth + 1))
+    return lines
+
+
+# ======================================
+# SAMPLING PROFILER (?profile=1)
+# ======================================
+# Thread terpisah mengambil stack thread event loop tiap interval
+# (sys._current_frames), ditambah thread worker yang sedang menjalankan
+# kode aplikasi (DB lewat asyncio.to_thread). Satu profil dalam satu waktu.
+# Catatan: event loop dipakai bersama, jadi request lain yang berjalan
+# bersamaan ikut tersampel.
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_profile_lock = threading.Lock()
+
+
+def _frame_label(code):
+    path = code.co_filename
+    if path.startswith(_APP_DIR):
+        path = os.path.relpath(path, os.path.dirname(_APP_DIR))
+    else:
+        path = "/".join(path.split(os.sep)[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class Profiler:
+    def __init__(self, interval: float = config.TRACE_PROFILE_INTERVAL_MS / 1000,
+                 max_seconds: float = config.TRACE_PROFILE_MAX_S):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        """False kalau profiler sedang dipakai request lain."""
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        _profile_lock.release()
+
+    def _run(self):
+        me = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    in_app = in_app or code.co_filename.startswith(_APP_DIR)
+                    stack.append(_frame_label(code))
+                    frame = frame.f_back
+                if ident != self._target and not in_app:
+                    continue    # thread idle / library saja
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common()) + "\n"
+
+
+# ======================================
+# MIDDLEWARE
+# ======================================
+
+class TracingMiddleware:
+    def __init__(self, app, enabled: bool = config.TRACE_ENABLED,
+                 slow_ms: float = config.TRACE_SLOW_MS, sample: float = config.TRACE_SLOW_SAMPLE,
+                 log_size: int = config.TRACE_LOG_SIZE, admin_token: str = config.ADMIN_TOKEN):
+        self.app = app
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.sample = sample
+        self.admin_token = admin_token
+        self.slow = deque(maxlen=log_size)
+        self.requests = 0
+        self.slow_seen = 0
+        tracer.middleware = self
+
+    def _profile_allowed(self, scope):
+        token = dict(scope.get("headers") or []).get(b"x-admin-token", b"").decode("latin-1")
+        return admin_allowed(token, self.admin_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        profile = query.get("profile", ["0"])[-1] not in ("0", "")
+        if profile and not self._profile_allowed(scope):
+            await JSONResponse({"detail": "Profil hanya untuk admin (x-admin-token)"}, 403)(scope, receive, send)
+            return
+
+        trace = Trace(f"{scope['method']} {scope['path']}")
+        root = trace.root
+        status = {"code": 500}
+
+        async def send_traced(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(root).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        async def send_discard(message):
+            # response asli dibuang, diganti profil setelah selesai
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+
+        profiler = Profiler() if profile else None
+        if profiler is not None and not profiler.start():
+            await JSONResponse({"detail": "Profiler sedang dipakai request lain"}, 409)(scope, receive, send)
+            return
+
+        token = activate(root)
+        try:
+            await self.app(scope, receive, send_discard if profiler else send_traced)
+        finally:
+            root.end = time.perf_counter()
+            trace.finished = True
+            deactivate(token)
+            if profiler is not None:
+                profiler.stop()
+            self._finish(scope, trace, status["code"])
+
+        if profiler is not None:
+            await PlainTextResponse(profiler.collapsed(), headers={
+                "server-timing": server_timing(root),
+                "x-profile-samples": str(profiler.samples),
+                "x-profile-status": str(status["code"]),
+            })(scope, receive, send)
+
+    def _finish(self, scope, trace, status_code):
+        self.requests += 1
+        ms = trace.root.duration_ms()
+        if ms < self.slow_ms:
+            return
+        self.slow_seen += 1
+        if random.random() >= self.sample:
+            return
+        tree = trace.root.to_dict()
+        entry = {
+            "ts": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "status": status_code,
+            "ms": round(ms, 1),
+            "dropped_spans": trace.dropped,
+            "spans": tree,
+        }
+        self.slow.append(entry)
+        log.warning("Request lambat %s %s %d %.0f ms\n%s", entry["method"], entry["path"],
+                    status_code, ms, "\n".join(format_tree(tree)))
+
+
+class _Tracer:
+    # pegangan ke middleware yang terpasang (dibaca GET /scan/traces)
+    middleware = None
+
+    def snapshot(self, limit: int = 50):
+        m = self.middleware
+        if m is None:
+            return {"enabled": False, "slow": []}
+        return {
+            "enabled": m.enabled,
+            "slow_ms": m.slow_ms,
+            "sample": m.sample,
+            "requests": m.requests,
+            "slow_seen": m.slow_seen,
+            "slow": list(reversed(m.slow))[:limit],
+        }
+
+
+tracer = _Tracer()
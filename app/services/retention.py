@@ -0,0 +1,318 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from app import config
+from app.db.database import SessionLocal
+from app.db.crud import list_expired_scan_history, delete_scan_history_ids
+from app.models.models import ScanHistory
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# RETENTION & ARSIP SCAN HISTORY
+# ======================================
+# Baris scan_history yang lebih tua dari RETENTION_DAYS dipindah ke file
+# NDJSON gzip per tanggal, lalu dihapus dari DB per chunk:
+#
+#   ARCHIVE_DIR/scan_history/date=2026-01-31/part-<ts>-<id>.ndjson.gz
+#
+# Urutan per chunk: tulis file (tmp + fsync + rename) -> DELETE -> commit.
+# Kalau proses mati di antaranya, baris bisa ada di arsip dan di DB;
+# pembaca arsip membuang id kembar, jadi tidak ada data yang hilang.
+# Compaction menggabung part kecil: member gzip cukup disambung byte-nya.
+
+TABLE = "scan_history"
+PART_SUFFIX = ".ndjson.gz"
+LOCK_NAME = ".retention.lock"
+
+COLUMNS = [c.name for c in ScanHistory.__table__.columns]
+
+
+def _row_to_dict(r):
+    out = {}
+    for name in COLUMNS:
+        v = getattr(r, name)
+        out[name] = v.isoformat() if isinstance(v, datetime) else v
+    return out
+
+
+def _dict_to_row(d):
+    d = dict(d)
+    if d.get("created_at"):
+        d["created_at"] = datetime.fromisoformat(d["created_at"])
+    for name in COLUMNS:
+        d.setdefault(name, None)
+    return SimpleNamespace(**d)
+
+
+class Retention:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        archive_dir: str = config.ARCHIVE_DIR,
+        days: int = config.RETENTION_DAYS,
+        chunk: int = config.RETENTION_CHUNK,
+        interval: int = config.RETENTION_INTERVAL,
+        compact_bytes: int = config.ARCHIVE_COMPACT_BYTES,
+    ):
+        self.session_factory = session_factory
+        self.archive_dir = archive_dir
+        self.days = days
+        self.chunk = chunk
+        self.interval = interval
+        self.compact_bytes = compact_bytes
+        self._task = None
+        self.last_run = None
+        self.rows_archived = 0
+        self.files_compacted = 0
+
+    @property
+    def table_dir(self):
+        return os.path.join(self.archive_dir, TABLE)
+
+    # -------------------------------
+    # Lifecycle (loop terjadwal)
+    # -------------------------------
+    async def start(self):
+        if self.days > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                log.exception("Retention scan_history gagal")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        return await asyncio.to_thread(self._run_locked)
+
+    def _run_locked(self):
+        # satu proses saja (worker uvicorn lain melewati putaran ini)
+        os.makedirs(self.table_dir, exist_ok=True)
+        lock = os.path.join(self.archive_dir, LOCK_NAME)
+        try:
+            if time.time() - os.path.getmtime(lock) > max(self.interval * 2, 600):
+                os.remove(lock)     # lock basi dari proses yang mati
+        except OSError:
+            pass
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return {"skipped": True}
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            archived = self.archive_expired()
+            compacted = self.compact()
+            self.last_run = datetime.now().replace(microsecond=0)
+            return {"archived": archived, "compacted": compacted}
+        finally:
+            os.close(fd)
+            os.remove(lock)
+
+    # -------------------------------
+    # Arsip
+    # -------------------------------
+    def archive_expired(self):
+        cutoff = datetime.now() - timedelta(days=self.days)
+        total = 0
+        while True:
+            db = self.session_factory()
+            try:
+                rows = list_expired_scan_history(db, cutoff, self.chunk)
+                if not rows:
+                    break
+                by_date = {}
+                for r in rows:
+                    by_date.setdefault(r.created_at.date(), []).append(_row_to_dict(r))
+                for day, items in by_date.items():
+                    self._write_part(day, items)
+                total += delete_scan_history_ids(db, [r.id for r in rows])
+            finally:
+                db.close()
+            self.rows_archived += len(rows)
+        if total:
+            log.info("Retention: %d scan_history dipindah ke arsip", total)
+        return total
+
+    def _partition(self, day: date):
+        return os.path.join(self.table_dir, f"date={day.isoformat()}")
+
+    def _write_part(self, day: date, items):
+        part_dir = self._partition(day)
+        os.makedirs(part_dir, exist_ok=True)
+        name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}{PART_SUFFIX}"
+        path = os.path.join(part_dir, name)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as gz:
+                for d in items:
+                    gz.write(json.dumps(d, separators=(",", ":")).encode() + b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp, path)
+        return path
+
+    # -------------------------------
+    # Compaction
+    # -------------------------------
+    def compact(self):
+        merged = 0
+        for part_dir in self._partitions():
+            small = [
+                os.path.join(part_dir, f) for f in sorted(os.listdir(part_dir))
+                if f.endswith(PART_SUFFIX)
+                and os.path.getsize(os.path.join(part_dir, f)) < self.compact_bytes
+            ]
+            if len(small) < 2:
+                continue
+            # gzip multi-member: cukup disambung, tidak perlu decompress
+            name = f"part-{int(time.time() * 1000)}-c{uuid.uuid4().hex[:7]}{PART_SUFFIX}"
+            path = os.path.join(part_dir, name)
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as out:
+                for f in small:
+                    with open(f, "rb") as src:
+                        while True:
+                            buf = src.read(1024 * 1024)
+                            if not buf:
+                                break
+                            out.write(buf)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, path)
+            for f in small:
+                os.remove(f)
+            merged += len(small)
+        self.files_compacted += merged
+        return merged
+
+    def _partitions(self, since: datetime = None, until: datetime = None):
+        """Folder partisi (terbaru dulu), dipangkas berdasarkan rentang waktu."""
+        if not os.path.isdir(self.table_dir):
+            return []
+        out = []
+        for name in os.listdir(self.table_dir):
+            if not name.startswith("date="):
+                continue
+            try:
+                day = date.fromisoformat(name[5:])
+            except ValueError:
+                continue
+            if since is not None and day < since.date():
+                continue
+            if until is not None and day > until.date():
+                continue
+            out.append((day, os.path.join(self.table_dir, name)))
+        out.sort(reverse=True)
+        return [p for _, p in out]
+
+    # -------------------------------
+    # Baca arsip (untuk /scan/history)
+    # -------------------------------
+    def read(self, limit: int, cursor: tuple = None, since: datetime = None,
+             until: datetime = None, match=None):
+        """
+        Baris arsip terbaru dulu di (created_at, id), maksimal `limit`.
+        match: fungsi(row) -> bool untuk filter lain.
+        """
+        upper = until
+        if cursor is not None and (upper is None or cursor[0] < upper):
+            upper = cursor[0] + timedelta(microseconds=1)
+
+        def keep(row):
+            if cursor is not None and (row.created_at, row.id) >= cursor:
+                return False
+            if since is not None and row.created_at < since:
+                return False
+            if until is not None and row.created_at >= until:
+                return False
+            return match is None or match(row)
+
+        out = []
+        for part_dir in self._partitions(since, upper):
+            try:
+                rows = self._read_partition(part_dir, keep)
+            except FileNotFoundError:
+                # compaction menggabung segmen selagi dibaca; file gabungan
+                # sudah ada sebelum segmen lama dihapus -> cukup list ulang
+                rows = self._read_partition(part_dir, keep, skip_missing=True)
+            rows.sort(key=lambda r: (r.created_at, r.id), reverse=True)
+            out.extend(rows)
+            # partisi lebih lama pasti lebih tua -> cukup berhenti di sini
+            if len(out) >= limit:
+                break
+        return dedupe_rows(out)[:limit]
+
+    @staticmethod
+    def _read_partition(part_dir, keep, skip_missing=False):
+        rows = []
+        for f in os.listdir(part_dir):
+            if not f.endswith(PART_SUFFIX):
+                continue
+            try:
+                with gzip.open(os.path.join(part_dir, f), "rb") as gz:
+                    for line in gz:
+                        row = _dict_to_row(json.loads(line))
+                        if keep(row):
+                            rows.append(row)
+            except FileNotFoundError:
+                if not skip_missing:
+                    raise
+        return rows
+
+    def snapshot(self):
+        parts = self._partitions()
+        files = size = 0
+        for p in parts:
+            for f in os.listdir(p):
+                if not f.endswith(PART_SUFFIX):
+                    continue
+                try:
+                    size += os.path.getsize(os.path.join(p, f))
+                except FileNotFoundError:   # baru saja digabung compaction
+                    continue
+                files += 1
+        return {
+            "enabled": self.days > 0,
+            "days": self.days,
+            "last_run": str(self.last_run) if self.last_run else None,
+            "rows_archived": self.rows_archived,
+            "files_compacted": self.files_compacted,
+            "partitions": len(parts),
+            "files": files,
+            "bytes": size,
+        }
+
+
+def dedupe_rows(rows):
+    # rows sudah urut (created_at, id) desc; id kembar pasti bersebelahan
+    out = []
+    last = None
+    for r in rows:
+        key = (r.created_at, r.id)
+        if key == last:
+            continue
+        out.append(r)
+        last = key
+    return out
+
+
+retention = Retention()
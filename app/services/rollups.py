@@ -0,0 +1,227 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import config
+from app.db.crud import get_scan_rollups, list_scan_rollups
+from app.models.models import ScanRollup
+from app.utils.latency_sketch import LatencySketch
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# ROLLUP LATENCY / UPTIME PER URL
+# ======================================
+# Setiap batch ScanWriter ikut di-rollup ke bucket 1m / 1h / 1d per URL:
+# count, error, kelas status, min/max/sum latency + LatencySketch.
+# /scan/stats menggabungkan bucket yang menutup window (1d di tengah,
+# 1h / 1m di tepi), jadi tidak perlu membaca scan_history mentah.
+
+RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+COARSE_FIRST = ("1d", "1h", "1m")
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+MERGE_ATTEMPTS = 3
+
+
+def floor_bucket(ts: datetime, resolution: str) -> datetime:
+    if resolution == "1m":
+        return ts.replace(second=0, microsecond=0)
+    if resolution == "1h":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_bucket(ts: datetime, resolution: str) -> datetime:
+    start = floor_bucket(ts, resolution)
+    return start if start == ts else start + RESOLUTIONS[resolution]
+
+
+class Rollup:
+    """Agregat satu bucket (di memori); bisa di-merge dari baris DB."""
+
+    def __init__(self, accuracy: float = config.ROLLUP_SKETCH_ACCURACY):
+        self.count = 0
+        self.error_count = 0
+        self.status = {"2xx": 0, "3xx": 0, "4xx": 0, "5xx": 0}
+        self.latency_sum = 0
+        self.latency_min = None
+        self.latency_max = None
+        self.sketch = LatencySketch(accuracy)
+
+    def add(self, status_code, latency_ms, error):
+        self.count += 1
+        if error:
+            # latency request gagal = lama sampai timeout, bukan latency server
+            self.error_count += 1
+            return
+        if status_code:
+            cls = f"{status_code // 100}xx"
+            if cls in self.status:
+                self.status[cls] += 1
+        if latency_ms is not None:
+            self.latency_sum += latency_ms
+            self.latency_min = latency_ms if self.latency_min is None else min(self.latency_min, latency_ms)
+            self.latency_max = latency_ms if self.latency_max is None else max(self.latency_max, latency_ms)
+            self.sketch.add(latency_ms)
+
+    @classmethod
+    def from_row(cls, row: ScanRollup):
+        acc = cls()
+        acc.count = row.count
+        acc.error_count = row.error_count
+        acc.status = {"2xx": row.status_2xx, "3xx": row.status_3xx,
+                      "4xx": row.status_4xx, "5xx": row.status_5xx}
+        acc.latency_sum = row.latency_sum
+        acc.latency_min = row.latency_min
+        acc.latency_max = row.latency_max
+        if row.sketch:
+            acc.sketch = LatencySketch.from_json(row.sketch)
+        return acc
+
+    def merge(self, other: "Rollup"):
+        self.count += other.count
+        self.error_count += other.error_count
+        for k, v in other.status.items():
+            self.status[k] += v
+        self.latency_sum += other.latency_sum
+        if other.latency_min is not None:
+            self.latency_min = other.latency_min if self.latency_min is None else min(self.latency_min, other.latency_min)
+        if other.latency_max is not None:
+            self.latency_max = other.latency_max if self.latency_max is None else max(self.latency_max, other.latency_max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def write_row(self, row: ScanRollup):
+        row.count = self.count
+        row.error_count = self.error_count
+        row.status_2xx = self.status["2xx"]
+        row.status_3xx = self.status["3xx"]
+        row.status_4xx = self.status["4xx"]
+        row.status_5xx = self.status["5xx"]
+        row.latency_sum = self.latency_sum
+        row.latency_min = self.latency_min
+        row.latency_max = self.latency_max
+        row.sketch = self.sketch.to_json()
+
+    def summary(self):
+        # uptime: tidak error koneksi dan bukan 5xx
+        ok = self.count - self.error_count - self.status["5xx"]
+        measured = self.sketch.count
+        latency = {
+            "min": self.latency_min,
+            "max": self.latency_max,
+            "avg": round(self.latency_sum / measured, 1) if measured else None,
+        }
+        for name, q in QUANTILES.items():
+            v = self.sketch.quantile(q)
+            latency[name] = None if v is None else round(v, 1)
+        return {
+            "count": self.count,
+            "errors": self.error_count,
+            "uptime": round(100 * ok / self.count, 3) if self.count else None,
+            "status": dict(self.status),
+            "latency": latency,
+        }
+
+
+# -------------------------------
+# Update incremental (dipanggil ScanWriter)
+# -------------------------------
+def aggregate(recs):
+    out = {}
+    for r in recs:
+        if not r.url.startswith(("http://", "https://")) or r.created_at is None:
+            continue  # agent / network tidak punya latency per URL
+        for res in RESOLUTIONS:
+            key = (r.url, res, floor_bucket(r.created_at, res))
+            acc = out.get(key)
+            if acc is None:
+                acc = out[key] = Rollup()
+            acc.add(r.status_code, r.latency_ms, r.error)
+    return out
+
+
+def apply_rollups(db, recs):
+    pending = aggregate(recs)
+    if not pending:
+        return 0
+    for attempt in range(MERGE_ATTEMPTS):
+        try:
+            _merge(db, pending)
+            break
+        except (IntegrityError, OperationalError):
+            # proses lain (worker uvicorn lain) baru saja membuat bucket yang
+            # sama (IntegrityError) atau saling tunggu kunci (deadlock)
+            db.rollback()
+            if attempt == MERGE_ATTEMPTS - 1:
+                raise
+    return len(pending)
+
+
+def _merge(db, pending):
+    # read-modify-write: baris bucket dikunci (FOR UPDATE) sampai commit,
+    # jadi writer di proses lain menunggu lalu membaca nilai yang sudah
+    # ditambah, bukan menimpanya. Key diurutkan supaya urutan kunci sama
+    # di semua proses (mengurangi deadlock).
+    existing = {
+        (row.url, row.resolution, row.bucket_start): row
+        for row in get_scan_rollups(db, sorted(pending), for_update=True)
+    }
+    for key, acc in pending.items():
+        row = existing.get(key)
+        if row is None:
+            url, res, start = key
+            row = ScanRollup(url=url, resolution=res, bucket_start=start)
+            db.add(row)
+        else:
+            acc = Rollup.from_row(row).merge(acc)
+        acc.write_row(row)
+    db.commit()
+
+
+# -------------------------------
+# Query window
+# -------------------------------
+def plan_window(since: datetime, until: datetime, levels=COARSE_FIRST):
+    """Pecah [since, until) jadi range per resolusi: bucket kasar di tengah, halus di tepi."""
+    res = levels[0]
+    if len(levels) == 1:
+        return [(res, floor_bucket(since, res), until)]
+    lo, hi = ceil_bucket(since, res), floor_bucket(until, res)
+    if lo >= hi:
+        return plan_window(since, until, levels[1:])
+    out = [(res, lo, hi)]
+    if since < lo:
+        out += plan_window(since, lo, levels[1:])
+    if hi < until:
+        out += plan_window(hi, until, levels[1:])
+    return out
+
+
+async def window_stats(db, url: str, since: datetime, until: datetime):
+    total = Rollup()
+    buckets = 0
+    for res, start, end in plan_window(since, until):
+        for row in await list_scan_rollups(db, url, res, start, end):
+            total.merge(Rollup.from_row(row))
+            buckets += 1
+    return {**total.summary(), "buckets_read": buckets}
+
+
+async def series(db, url: str, resolution: str, since: datetime, until: datetime):
+    points = []
+    for row in await list_scan_rollups(db, url, resolution, floor_bucket(since, resolution), until):
+        s = Rollup.from_row(row).summary()
+        points.append({
+            "bucket": str(row.bucket_start),
+            "count": s["count"],
+            "uptime": s["uptime"],
+            "p50": s["latency"]["p50"],
+            "p95": s["latency"]["p95"],
+        })
+    return points
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import importlib.util
+import ipaddress
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import httpcore
+import httpx
+
+from app import config
+from app.services.dns_resolver import resolver as default_resolver
+from app.services.prom import SEMAPHORE_WAIT
+from app.utils.tracing import record, current
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# SHARED HTTP CLIENT UNTUK SCANNER
+# ======================================
+# Satu AsyncClient dipakai selama aplikasi hidup, jadi koneksi TCP/TLS
+# ke host yang sama bisa dipakai ulang (keep-alive / HTTP/2) dan tidak
+# handshake ulang untuk setiap URL.
+#
+# Hostname di-resolve lewat DnsResolver yang sama dengan dns_ms di scan
+# (cache + thread pool), lalu connect langsung ke IP-nya. SNI dan header
+# Host tetap hostname asli (diambil httpcore dari URL, bukan dari host
+# connect_tcp). Jadi tidak ada lookup kedua di dalam connect, dan
+# connect_ms murni TCP.
+
+
+def _is_ip(host: str):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class ResolvingBackend(httpcore.AsyncNetworkBackend):
+    def __init__(self, resolver, backend=None):
+        self.resolver = resolver
+        self._backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = host
+        if not _is_ip(host):
+            res = await self.resolver.resolve(host)
+            if not res or not res[2]:
+                raise httpcore.ConnectError(f"DNS gagal untuk {host}")
+            address = res[2][0]
+        return await self._backend.connect_tcp(
+            address, port, timeout=timeout, local_address=local_address,
+            socket_options=socket_options,
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class ScanTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, resolver, **kwargs):
+        super().__init__(**kwargs)
+        # httpx belum membuka opsi network_backend, pasang di pool httpcore
+        self._pool._network_backend = ResolvingBackend(resolver)
+
+
+class _HostSlot:
+    def __init__(self, limit: int):
+        self.sem = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class ScanClient:
+    def __init__(
+        self,
+        max_connections: int = config.SCAN_MAX_CONNECTIONS,
+        max_keepalive: int = config.SCAN_MAX_KEEPALIVE,
+        keepalive_expiry: float = config.SCAN_KEEPALIVE_EXPIRY,
+        max_per_host: int = config.SCAN_MAX_PER_HOST,
+        http2: bool = config.SCAN_HTTP2,
+        connect_timeout: float = config.SCAN_CONNECT_TIMEOUT,
+        read_timeout: float = config.SCAN_READ_TIMEOUT,
+        write_timeout: float = config.SCAN_WRITE_TIMEOUT,
+        pool_timeout: float = config.SCAN_POOL_TIMEOUT,
+        resolver=default_resolver,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout,
+            read=read_timeout,
+            write=write_timeout,
+            pool=pool_timeout,
+        )
+        self.max_per_host = max_per_host
+        self.resolver = resolver
+        self.http2 = http2 and self._h2_available()
+        self._client = None
+        self._host_slots = {}
+
+    @staticmethod
+    def _h2_available():
+        if importlib.util.find_spec("h2") is None:
+            log.warning("SCAN_HTTP2 aktif tapi paket 'h2' tidak terpasang, pakai HTTP/1.1")
+            return False
+        return True
+
+    # -------------------------------
+    # Lifecycle (dipanggil dari lifespan FastAPI)
+    # -------------------------------
+    async def start(self):
+        self.get()
+
+    async def stop(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_slots.clear()
+
+    def get(self) -> httpx.AsyncClient:
+        # fallback kalau dipanggil di luar lifespan (script / test)
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=ScanTransport(self.resolver, limits=self.limits, http2=self.http2),
+                timeout=self.timeout,
+                follow_redirects=True,
+            )
+        return self._client
+
+    # -------------------------------
+    # Batas request bersamaan per host
+    # -------------------------------
+    @asynccontextmanager
+    async def host_slot(self, host: str):
+        if self.max_per_host <= 0:
+            yield
+            return
+
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = _HostSlot(self.max_per_host)
+        slot.users += 1
+        waited = time.perf_counter()
+        try:
+            async with slot.sem:
+                now = time.perf_counter()
+                SEMAPHORE_WAIT.labels("host").observe(now - waited)
+                record(current(), "host_wait", waited, now)
+                yield
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                self._host_slots.pop(host, None)
+
+
+scan_client = ScanClient()
+
+
+# ======================================
+# BACA BODY TERBATAS
+# ======================================
+
+async def read_bounded(response: httpx.Response, max_bytes: int, hash_body: bool = True):
+    """
+    Hitung byte body (setelah decode gzip/br) tanpa menyimpannya.
+    Berhenti di max_bytes; sisa body tidak di-download.
+    Return (jumlah_byte, truncated, hash_hex_atau_None).
+    """
+    total = 0
+    truncated = False
+    hasher = hashlib.blake2b(digest_size=16) if hash_body else None
+
+    async for chunk in response.aiter_bytes():
+        if max_bytes and total + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - total]
+            truncated = True
+        total += len(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+        if truncated:
+            break
+
+    return total, truncated, hasher.hexdigest() if hasher is not None else None
+
+
+# ======================================
+# TRACE PER FASE (httpcore trace hook)
+# ======================================
+# Dipasang lewat extensions={"trace": tracer}. Kalau ada redirect, waktu
+# tiap fase dijumlahkan untuk semua hop. Fase yang tidak terjadi (mis.
+# connect/TLS karena koneksi dipakai ulang) tetap None.
+
+class PhaseTracer:
+    FIELDS = {
+        "connection.connect_tcp": "connect_ms",
+        "connection.start_tls": "tls_ms",
+    }
+
+    def __init__(self):
+        self.connect_ms = None
+        self.tls_ms = None
+        self.ttfb_ms = None
+        self.hops = 0
+        self._started = {}
+        self._request_start = None
+
+    def _add(self, field, ms):
+        cur = getattr(self, field)
+        setattr(self, field, ms if cur is None else cur + ms)
+
+    async def __call__(self, name, info):
+        now = time.perf_counter()
+        phase, _, stage = name.rpartition(".")
+
+        # TTFB: mulai kirim header request -> header response diterima
+        if phase.endswith(".send_request_headers"):
+            if stage == "started":
+                self._request_start = now
+                self.hops += 1
+            return
+        if phase.endswith(".receive_response_headers"):
+            if stage == "complete" and self._request_start is not None:
+                self._add("ttfb_ms", (now - self._request_start) * 1000)
+                self._request_start = None
+            return
+
+        field = self.FIELDS.get(phase)
+        if field is None:
+            return
+        if stage == "started":
+            self._started[phase] = now
+        elif stage == "complete" and phase in self._started:
+            self._add(field, (now - self._started.pop(phase)) * 1000)
@@ -0,0 +1,126 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from app import config
+from app.utils.url_utils import canonical_url
+
+# ======================================
+# SINGLE-FLIGHT + CACHE HASIL SCAN
+# ======================================
+# Scan ke URL (kanonik) yang sama digabung:
+# - sedang berjalan -> pemanggil lain menunggu hasil yang sama (single-flight)
+# - baru selesai    -> hasil dipakai ulang selama ttl (LRU terbatas)
+# Scan dijalankan di task sendiri: pemanggil pertama yang batal (client
+# putus) tidak membatalkan hasil untuk pemanggil lain. Kalau semua
+# pemanggil batal, task scan ikut dibatalkan (tidak ada probe yatim).
+
+PROBE = "miss"          # scan baru dijalankan
+COALESCED = "coalesced"  # ikut scan yang sedang berjalan
+CACHED = "hit"          # hasil dari cache
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+class ScanDedup:
+    def __init__(
+        self,
+        ttl: float = config.SCAN_RESULT_TTL,
+        max_size: int = config.SCAN_RESULT_CACHE_SIZE,
+        cacheable=None,
+    ):
+        # ttl None = tidak kadaluarsa (dedup satu bulk job); 0 = tanpa cache
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cacheable = cacheable      # fungsi(hasil) -> bool; None = semua
+        self._cache = OrderedDict()     # key -> (expires_at, hasil)
+        self._inflight = {}             # key -> _Flight
+        self.probes = 0
+        self.coalesced = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(url: str):
+        return canonical_url(url)
+
+    def _cache_get(self, key):
+        item = self._cache.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._cache[key]
+            return False, None
+        self._cache.move_to_end(key)
+        return True, value
+
+    def _cache_put(self, key, value):
+        if self.ttl == 0 or self.max_size <= 0:
+            return
+        if self.cacheable is not None and not self.cacheable(value):
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        self._cache[key] = (expires_at, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def run(self, url: str, fn, use_cache: bool = True):
+        """
+        Jalankan fn() (coroutine function) sekali per URL kanonik.
+        Return (hasil, cara): cara = "miss" | "coalesced" | "hit".
+        """
+        key = self.key(url)
+        if use_cache:
+            found, value = self._cache_get(key)
+            if found:
+                self.hits += 1
+                return value, CACHED
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self.coalesced += 1
+            return await self._wait(flight), COALESCED
+
+        self.probes += 1
+        flight = self._inflight[key] = _Flight(asyncio.ensure_future(fn()))
+
+        def done(t):
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+            if not t.cancelled() and t.exception() is None:
+                self._cache_put(key, t.result())
+
+        flight.task.add_done_callback(done)
+        return await self._wait(flight), PROBE
+
+    @staticmethod
+    async def _wait(flight):
+        # shield: satu pemanggil batal tidak membatalkan scan untuk yang lain;
+        # pemanggil terakhir yang pergi membatalkan scan-nya
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def snapshot(self):
+        return {
+            "cached": len(self._cache),
+            "inflight": len(self._inflight),
+            "probes": self.probes,
+            "coalesced": self.coalesced,
+            "hits": self.hits,
+        }
+
+
+# dipakai /scan/run dan /scan/web (hasil error tidak di-cache)
+scan_dedup = ScanDedup(cacheable=lambda out: not out["result"]["error"])
@@ -0,0 +1,398 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import aclosing
+
+from app import config
+from app.db.database import SessionLocal
+from app.db.crud import (
+    create_scan_job,
+    update_scan_job,
+    get_scan_job,
+    list_scan_jobs,
+    mark_interrupted_jobs,
+)
+from app.services.bulk_pool import run_bounded
+from app.services.concurrency import AdaptiveLimiter
+from app.services.dns_resolver import resolver
+from app.services.validator_cache import validator_cache
+from app.utils.url_source import open_upload, iter_batches
+from app.utils.url_utils import url_host
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# JOB MANAGER BULK SCAN
+# ======================================
+# Setiap /scan/bulk jadi satu job dengan id sendiri:
+# - cancel per job (task dibatalkan, termasuk request yang sedang jalan)
+# - progress live: done, failed, pending, inflight, rate
+# - checkpoint ke tabel scan_job, jadi job yang terputus bisa di-resume
+#   dari cursor terakhir (URL setelah cursor yang sempat selesai akan
+#   di-scan ulang, tidak ada yang terlewat)
+
+FINISHED = ("done", "cancelled", "failed", "interrupted")
+# client stream yang tidak membaca selama ini dianggap sudah putus
+SUBSCRIBER_TIMEOUT = 30.0
+
+
+class BulkJob:
+    def __init__(self, id, input_path, content_type=None, source="bulk",
+                 total=None, cursor=0, done=0, failed=0):
+        self.id = id
+        self.input_path = input_path
+        self.content_type = content_type
+        self.source = source
+        self.status = "running"
+        self.error = None
+        self.total = total
+
+        # checkpoint (konsisten dengan cursor)
+        self.cursor = cursor
+        self.ckpt_done = done
+        self.ckpt_failed = failed
+        self._ahead = {}   # index > cursor yang sudah selesai -> ok?
+        self._ckpt = None  # checkpoint terakhir yang jalan di thread
+
+        # counter live
+        self.done = done
+        self.failed = failed
+        self.inflight = 0
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._processed_at_start = done + failed
+
+        # batas probe bersamaan, menyesuaikan latency / timeout
+        self.limiter = AdaptiveLimiter()
+
+        self.task = None
+        self.cancel_requested = False
+        self._subscriber = None
+
+    # -------------------------------
+    # Progress
+    # -------------------------------
+    def record(self, idx: int, ok: bool):
+        if ok:
+            self.done += 1
+        else:
+            self.failed += 1
+
+        self._ahead[idx] = ok
+        while self.cursor in self._ahead:
+            if self._ahead.pop(self.cursor):
+                self.ckpt_done += 1
+            else:
+                self.ckpt_failed += 1
+            self.cursor += 1
+
+    def progress(self):
+        processed = self.done + self.failed
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        rate = (processed - self._processed_at_start) / elapsed if elapsed > 0 else 0.0
+        return {
+            "id": self.id,
+            "status": self.status,
+            "source": self.source,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "pending": None if self.total is None else max(self.total - processed, 0),
+            "inflight": self.inflight,
+            "rate": round(rate, 2),
+            "cursor": self.cursor,
+            "error": self.error,
+            "concurrency": self.limiter.snapshot(),
+        }
+
+    # -------------------------------
+    # Stream hasil ke pemanggil HTTP
+    # -------------------------------
+    def attach(self, size: int):
+        self._subscriber = asyncio.Queue(maxsize=size)
+
+    async def publish(self, event):
+        q = self._subscriber
+        if q is None:
+            return
+        try:
+            await asyncio.wait_for(q.put(event), SUBSCRIBER_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._subscriber = None
+
+    def _close_subscriber(self):
+        q = self._subscriber
+        if q is None:
+            return
+        if q.full():
+            q.get_nowait()
+        q.put_nowait(None)
+
+    async def events(self):
+        """Yield (index, hasil) sampai job selesai / dibatalkan."""
+        q = self._subscriber
+        if q is None:
+            return
+        try:
+            while True:
+                ev = await q.get()
+                if ev is None:
+                    return
+                yield ev
+        finally:
+            # client putus -> job tetap jalan di background
+            self._subscriber = None
+
+
+class JobManager:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        job_dir: str = config.SCAN_JOB_DIR,
+        inflight: int = config.SCAN_BULK_INFLIGHT,
+        batch_size: int = config.SCAN_BULK_BATCH,
+        checkpoint_every: int = config.SCAN_JOB_CHECKPOINT_EVERY,
+        checkpoint_interval: float = config.SCAN_JOB_CHECKPOINT_INTERVAL,
+        keep_finished: int = config.SCAN_JOB_KEEP_FINISHED,
+    ):
+        self.session_factory = session_factory
+        self.job_dir = job_dir
+        self.inflight = inflight
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self.interrupted = []
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    async def start(self):
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.interrupted = await asyncio.to_thread(self._db, mark_interrupted_jobs)
+        if self.interrupted:
+            log.warning("%d bulk job terputus, bisa di-resume: %s",
+                        len(self.interrupted), ", ".join(self.interrupted))
+
+    async def stop(self):
+        # dibatalkan tanpa cancel_requested -> status "interrupted" (bisa resume)
+        running = [j.task for j in self.jobs.values() if j.task and not j.task.done()]
+        for t in running:
+            t.cancel()
+        if running:
+            await asyncio.wait(running)
+        for job in list(self.jobs.values()):
+            await self._finish_unstarted(job, "interrupted")
+
+    def _db(self, fn, *args, **kwargs):
+        db = self.session_factory()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    # -------------------------------
+    # Buat / jalankan job
+    # -------------------------------
+    def new_input_path(self):
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir, exist_ok=True)
+        return job_id, os.path.join(self.job_dir, job_id + ".input")
+
+    async def submit(self, job_id, input_path, handle, content_type=None,
+                     source="bulk", total=None, attach=False):
+        # handle: coroutine function(url, limiter) -> dict hasil scan
+        await asyncio.to_thread(
+            self._db, create_scan_job,
+            id=job_id, status="running", source=source, input_path=input_path,
+            content_type=content_type, total=total,
+        )
+        job = BulkJob(job_id, input_path, content_type, source, total=total)
+        return self._launch(job, handle, attach)
+
+    async def resume(self, job_id, handle):
+        job = self.jobs.get(job_id)
+        if job is not None and job.status == "running":
+            raise ValueError("Job masih berjalan")
+
+        row = await asyncio.to_thread(self._db, get_scan_job, job_id)
+        if row is None:
+            raise LookupError("Job tidak ditemukan")
+        if row.status not in ("interrupted", "cancelled", "failed"):
+            raise ValueError(f"Job berstatus '{row.status}' tidak bisa di-resume")
+        if not os.path.exists(row.input_path):
+            raise ValueError("File input job sudah tidak ada")
+
+        job = BulkJob(row.id, row.input_path, row.content_type, row.source,
+                      total=row.total, cursor=row.cursor, done=row.done, failed=row.failed)
+        await self._checkpoint(job)
+        return self._launch(job, handle, attach=False)
+
+    def _launch(self, job, handle, attach):
+        if attach:
+            job.attach(self.inflight * 2)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, handle))
+        return job
+
+    async def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.task is None or job.task.done():
+            return False
+        job.cancel_requested = True
+        job.task.cancel()
+        await asyncio.wait([job.task])
+        await self._finish_unstarted(job, "cancelled")
+        return True
+
+    async def _finish_unstarted(self, job, status):
+        # task dibatalkan sebelum _run sempat jalan -> finally di _run tidak
+        # pernah dieksekusi, status & checkpoint diselesaikan di sini
+        if job.status != "running" or job.task is None or not job.task.done():
+            return
+        job.status = status
+        job.finished_at = time.monotonic()
+        await self._checkpoint(job)
+        job._close_subscriber()
+
+    # -------------------------------
+    # Progress
+    # -------------------------------
+    async def get_progress(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.progress()
+        row = await asyncio.to_thread(self._db, get_scan_job, job_id)
+        return None if row is None else self._row_progress(row)
+
+    async def list_progress(self, limit: int = 50):
+        rows = await asyncio.to_thread(self._db, list_scan_jobs, limit)
+        out = {job.id: job.progress() for job in self.jobs.values()}
+        for row in rows:
+            out.setdefault(row.id, self._row_progress(row))
+        return list(out.values())[:limit]
+
+    @staticmethod
+    def _row_progress(row):
+        processed = row.done + row.failed
+        return {
+            "id": row.id,
+            "status": row.status,
+            "source": row.source,
+            "total": row.total,
+            "done": row.done,
+            "failed": row.failed,
+            "pending": None if row.total is None else max(row.total - processed, 0),
+            "inflight": 0,
+            "rate": None,
+            "cursor": row.cursor,
+            "error": row.error,
+            "concurrency": None,
+        }
+
+    # -------------------------------
+    # Eksekusi
+    # -------------------------------
+    async def _source(self, job, lines):
+        # lewati baris yang sudah selesai (resume), prefetch DNS + validator per batch
+        skip = job.cursor
+        count = 0
+        async for batch in iter_batches(lines, self.batch_size):
+            if skip >= len(batch):
+                skip -= len(batch)
+                count += len(batch)
+                continue
+            if skip:
+                count += skip
+                batch = batch[skip:]
+                skip = 0
+
+            prefetch = asyncio.ensure_future(self._prefetch(batch))
+            try:
+                for u in batch:
+                    count += 1
+                    yield u
+                await prefetch
+            finally:
+                if not prefetch.done():
+                    prefetch.cancel()
+        job.total = count
+
+    @staticmethod
+    async def _prefetch(batch):
+        # DNS + validator conditional request untuk satu batch sekaligus
+        tasks = [resolver.prefetch(url_host(u) for u in batch)]
+        if config.SCAN_CONDITIONAL:
+            tasks.append(validator_cache.prefetch(batch))
+        await asyncio.gather(*tasks)
+
+    async def _run(self, job, handle):
+        async def tracked(url):
+            job.inflight += 1
+            try:
+                return await handle(url, job.limiter)
+            finally:
+                job.inflight -= 1
+
+        last_n = job.done + job.failed
+        last_t = time.monotonic()
+        try:
+            with open(job.input_path, "rb") as f:
+                source = self._source(job, open_upload(f, job.content_type))
+                results = run_bounded(source, tracked, self.inflight, start=job.cursor)
+                # aclosing: worker yang masih jalan ikut dibatalkan saat job di-cancel
+                async with aclosing(results):
+                    async for idx, res in results:
+                        job.record(idx, not res.get("error"))
+                        await job.publish((idx, res))
+
+                        n = job.done + job.failed
+                        now = time.monotonic()
+                        if n - last_n >= self.checkpoint_every or now - last_t >= self.checkpoint_interval:
+                            await self._checkpoint(job)
+                            last_n, last_t = n, now
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled" if job.cancel_requested else "interrupted"
+        except Exception as e:
+            log.exception("Bulk job %s gagal", job.id)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.monotonic()
+            try:
+                await self._checkpoint(job)
+            except Exception:
+                log.exception("Gagal checkpoint bulk job %s", job.id)
+            if job.status == "done":
+                try:
+                    os.remove(job.input_path)
+                except OSError:
+                    pass
+            job._close_subscriber()
+            self._trim_finished()
+
+    async def _checkpoint(self, job):
+        # UPDATE di thread tetap jalan walau task job di-cancel saat menunggu;
+        # tunggu yang sebelumnya selesai dulu supaya checkpoint lama
+        # ("running") tidak menimpa status akhir
+        prev = job._ckpt
+        if prev is not None and not prev.done():
+            await asyncio.wait([prev])
+        job._ckpt = asyncio.ensure_future(asyncio.to_thread(
+            self._db, update_scan_job, job.id,
+            status=job.status, total=job.total, cursor=job.cursor,
+            done=job.ckpt_done, failed=job.ckpt_failed, error=job.error,
+        ))
+        await asyncio.shield(job._ckpt)
+
+    def _trim_finished(self):
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        for job in finished[:max(len(finished) - self.keep_finished, 0)]:
+            self.jobs.pop(job.id, None)
+
+
+job_manager = JobManager()
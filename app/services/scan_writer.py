@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from app import config
+from app.db.database import SessionLocal
+from app.db.crud import bulk_create_scan_history
+from app.services.rollups import apply_rollups
+from app.services.payload_store import payload_store
+from app.services.prom import DB_WRITE, DB_ROWS, DB_ERRORS
+from app.utils.tracing import record, current
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# WRITE-BEHIND PERSISTENCE SCAN HISTORY
+# ======================================
+# Hasil scan masuk ke antrian terbatas, lalu satu writer task menulis
+# per batch (jumlah baris atau jendela waktu) dengan satu commit.
+# Penulisan DB jalan di thread, jadi event loop tidak ikut menunggu.
+# submit() tetap mengembalikan record dengan id, untuk event websocket.
+
+
+class ScanWriter:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = config.SCAN_WRITE_BATCH,
+        flush_interval: float = config.SCAN_WRITE_INTERVAL,
+        queue_size: int = config.SCAN_WRITE_QUEUE,
+        rollups: bool = config.ROLLUP_ENABLED,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.rollups = rollups
+        self._queue = None
+        self._task = None
+        self.rows_written = 0
+        self.batches_written = 0
+
+    # -------------------------------
+    # Lifecycle
+    # -------------------------------
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # tulis semua yang masih di antrian sebelum berhenti
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    # -------------------------------
+    # API
+    # -------------------------------
+    async def submit(self, **fields):
+        """
+        Masukkan satu hasil scan ke antrian dan tunggu sampai tersimpan.
+        Kalau antrian penuh, pemanggil ikut menunggu (backpressure).
+        """
+        if self._task is None:
+            await self.start()
+        # created_at diisi di sini supaya langsung tersedia tanpa refresh
+        fields.setdefault("created_at", datetime.now().replace(microsecond=0))
+        fut = asyncio.get_running_loop().create_future()
+        # span request pemanggil: batch commit dicatat di bawahnya (db.commit)
+        await self._queue.put((fields, fut, current()))
+        return await fut
+
+    # -------------------------------
+    # Writer loop
+    # -------------------------------
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        rows = [fields for fields, _, _ in batch]
+        started = time.perf_counter()
+        try:
+            with DB_WRITE.labels("scan_history").time():
+                recs = await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            DB_ERRORS.labels("scan_history").inc()
+            log.exception("Gagal menulis %d scan history", len(rows))
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        self.rows_written += len(recs)
+        DB_ROWS.labels("scan_history").inc(len(recs))
+        self.batches_written += 1
+        finished = time.perf_counter()
+        for (_, fut, parent), rec in zip(batch, recs):
+            record(parent, "db.commit", started, finished, batch=len(rows))
+            if not fut.done():
+                fut.set_result(rec)
+
+    def _write(self, rows):
+        # session sendiri per batch; expire_on_commit=False supaya atribut
+        # record tetap bisa dibaca setelah session ditutup
+        db = self.session_factory(expire_on_commit=False)
+        try:
+            # payload (dns / snapshot) disimpan sekali per isi, row cukup hash-nya
+            payloads = payload_store.prepare_rows(rows)
+            if payloads:
+                payload_store.intern(db, payloads)
+            recs = bulk_create_scan_history(db, rows)
+        except Exception:
+            db.rollback()
+            db.close()
+            raise
+
+        try:
+            # history sudah ter-commit; rollup gagal tidak menggagalkan scan
+            if self.rollups:
+                apply_rollups(db, recs)
+        except Exception:
+            log.exception("Gagal update rollup untuk %d scan", len(recs))
+            db.rollback()
+        finally:
+            db.close()
+        return recs
+
+
+scan_writer = ScanWriter()
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy.exc import IntegrityError
+
+from app import config
+from app.db.database import SessionLocal, AsyncSessionLocal
+from app.db.crud import get_url_validators, save_url_validators
+from app.utils.url_utils import canonical_url
+from app.services.prom import DB_WRITE, DB_ROWS, DB_ERRORS
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# VALIDATOR CACHE (CONDITIONAL REQUEST)
+# ======================================
+# Per URL (dinormalisasi) disimpan ETag, Last-Modified dan hash body dari
+# scan terakhir. Scan berikutnya mengirim If-None-Match / If-Modified-Since;
+# server yang mendukung menjawab 304 tanpa body.
+# - tier memori: LRU terbatas (VALIDATOR_CACHE_SIZE), termasuk "tidak ada"
+#   supaya URL baru tidak di-SELECT berulang
+# - tier DB: tabel url_validator, ditulis per batch di background
+#   (write-behind), jadi validator tetap ada setelah restart
+# Validator yang tidak berubah (304 dengan ETag sama) tidak ditulis ulang.
+
+Validator = namedtuple("Validator", "etag last_modified content_hash")
+
+
+def url_key(url: str):
+    return hashlib.blake2b(canonical_url(url).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def conditional_headers(prev: Validator):
+    headers = {}
+    if prev is None:
+        return headers
+    if prev.etag:
+        headers["If-None-Match"] = prev.etag
+    if prev.last_modified:
+        headers["If-Modified-Since"] = prev.last_modified
+    return headers
+
+
+def _same_etag(a, b):
+    # perbandingan lemah (RFC 9110): W/"x" == "x"
+    strip = lambda e: e[2:] if e.startswith("W/") else e
+    return strip(a) == strip(b)
+
+
+class ValidatorCache:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        async_session_factory=AsyncSessionLocal,
+        size: int = config.VALIDATOR_CACHE_SIZE,
+        flush_interval: float = config.VALIDATOR_FLUSH_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.async_session_factory = async_session_factory
+        self.size = size
+        self.flush_interval = flush_interval
+        self._mem = OrderedDict()   # key -> Validator / None (tidak ada di DB)
+        self._dirty = {}            # key -> (url, Validator) belum ditulis
+        self._loading = {}          # key -> Future (satu SELECT per key)
+        self._task = None
+        self.hits = 0
+        self.db_reads = 0
+        self.not_modified = 0
+        self.changed = 0
+        self.written = 0
+
+    # -------------------------------
+    # Lifecycle (flush write-behind)
+    # -------------------------------
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("Gagal menulis url_validator")
+
+    async def flush(self):
+        if not self._dirty:
+            return 0
+        dirty, self._dirty = self._dirty, {}
+        try:
+            with DB_WRITE.labels("url_validator").time():
+                await asyncio.to_thread(self._write, dirty)
+        except Exception:
+            DB_ERRORS.labels("url_validator").inc()
+            # dicoba lagi di putaran berikutnya, kecuali sudah ada yang lebih baru
+            for key, item in dirty.items():
+                self._dirty.setdefault(key, item)
+            raise
+        self.written += len(dirty)
+        DB_ROWS.labels("url_validator").inc(len(dirty))
+        return len(dirty)
+
+    def _write(self, dirty):
+        items = [
+            {"url_hash": key, "url": url[:512], "etag": v.etag and v.etag[:255],
+             "last_modified": v.last_modified and v.last_modified[:64], "content_hash": v.content_hash}
+            for key, (url, v) in dirty.items()
+        ]
+        db = self.session_factory()
+        try:
+            try:
+                save_url_validators(db, items)
+            except IntegrityError:
+                # worker lain baru saja insert key yang sama
+                db.rollback()
+                save_url_validators(db, items)
+        finally:
+            db.close()
+
+    # -------------------------------
+    # Baca
+    # -------------------------------
+    def _remember(self, key, value):
+        self._mem[key] = value
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.size:
+            self._mem.popitem(last=False)
+
+    def _cached(self, key):
+        if key in self._dirty:
+            return True, self._dirty[key][1]
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return True, self._mem[key]
+        return False, None
+
+    async def get(self, url: str):
+        key = url_key(url)
+        found, value = self._cached(key)
+        if found:
+            self.hits += 1
+            return value
+        fut = self._loading.get(key)
+        if fut is None:
+            await self._load([key])
+            return self._mem.get(key)
+        return await asyncio.shield(fut)
+
+    async def prefetch(self, urls):
+        # satu SELECT untuk satu batch URL (dipakai sebelum bulk scan)
+        keys = {url_key(u) for u in urls if u}
+        missing = [k for k in keys if not self._cached(k)[0] and k not in self._loading]
+        for i in range(0, len(missing), 500):
+            await self._load(missing[i:i + 500])
+        return len(missing)
+
+    async def _load(self, keys):
+        loop = asyncio.get_running_loop()
+        futs = {k: loop.create_future() for k in keys}
+        self._loading.update(futs)
+        rows, ok = {}, False
+        try:
+            async with self.async_session_factory() as db:
+                rows = await get_url_validators(db, keys)
+            self.db_reads += 1
+            ok = True
+        except Exception:
+            log.exception("Gagal membaca url_validator")
+        finally:
+            for k, fut in futs.items():
+                row = rows.get(k)
+                value = Validator(row.etag, row.last_modified, row.content_hash) if row else None
+                # hasil scan yang masuk selama SELECT lebih baru dari isi DB
+                if k in self._dirty:
+                    value = self._dirty[k][1]
+                elif ok:
+                    # SELECT gagal -> tidak di-cache ("tidak ada" palsu), dicoba lagi scan berikutnya
+                    self._remember(k, value)
+                self._loading.pop(k, None)
+                fut.set_result(value)
+
+    # -------------------------------
+    # Tulis (dari hasil scan)
+    # -------------------------------
+    def observe(self, url: str, prev: Validator, status_code, etag, last_modified, content_hash):
+        """
+        Catat validator dari response. Return (content_changed, content_hash):
+        False = tidak berubah (304 / hash sama), None = belum ada pembanding.
+        """
+        if status_code == 304 and prev is not None:
+            self.not_modified += 1
+            new = Validator(etag or prev.etag, last_modified or prev.last_modified, prev.content_hash)
+            changed = False
+        elif status_code is not None and 200 <= status_code < 300:
+            # body tidak di-hash (HEAD-first / hash mati): hash lama tetap disimpan
+            kept_hash = content_hash if content_hash is not None else prev and prev.content_hash
+            new = Validator(etag, last_modified, kept_hash)
+            if prev is None:
+                changed = None
+            elif content_hash and prev.content_hash:
+                changed = content_hash != prev.content_hash
+            elif etag and prev.etag:
+                changed = not _same_etag(etag, prev.etag)
+            elif last_modified and prev.last_modified:
+                changed = last_modified != prev.last_modified
+            else:
+                changed = None
+            if changed:
+                self.changed += 1
+        else:
+            # redirect / error: validator lama tetap dipakai
+            return None, content_hash
+
+        if new != prev and any(new):
+            key = url_key(url)
+            self._dirty[key] = (canonical_url(url), new)
+            self._remember(key, new)
+        # hash lama hanya berlaku untuk response ini kalau isinya memang sama
+        return changed, new.content_hash if changed is False else content_hash
+
+    def snapshot(self):
+        return {
+            "cached": len(self._mem),
+            "pending_writes": len(self._dirty),
+            "hits": self.hits,
+            "db_reads": self.db_reads,
+            "not_modified": self.not_modified,
+            "changed": self.changed,
+            "written": self.written,
+        }
+
+
+validator_cache = ValidatorCache()
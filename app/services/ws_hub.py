@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import zlib
+from collections import deque
+
+from fastapi import WebSocket
+
+from app import config
+from app.services.prom import WS_FRAMES_SENT, WS_FRAMES_DROPPED, WS_SLOW_DISCONNECTS
+
+log = logging.getLogger(__name__)
+
+# ======================================
+# WEBSOCKET FAN-OUT HUB
+# ======================================
+# broadcast() tidak pernah menunggu socket: pesan di-encode sekali, lalu
+# dimasukkan ke antrian terbatas tiap client. Setiap client punya sender
+# task sendiri, jadi satu tab dashboard yang lambat tidak memperlambat scan.
+#
+# - client yang tertinggal: drop_oldest / drop_newest / disconnect
+# - event scan_result dikumpulkan per jendela waktu lalu dikirim sebagai
+#   satu frame {"type": "scan_result_batch", "data": [...]}
+#   (client bisa menolak batch lewat /scan/ws?batch=0)
+# - /scan/ws?compress=deflate -> frame biner zlib (DecompressionStream
+#   "deflate" di browser). permessage-deflate di level protokol diatur
+#   server ASGI (uvicorn --ws-per-message-deflate, default aktif).
+
+COALESCE_TYPES = ("scan_result",)
+
+
+class _Frame:
+    __slots__ = ("text", "_deflated")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._deflated = None
+
+    @property
+    def deflated(self) -> bytes:
+        # dikompres sekali saja walau dikirim ke banyak client
+        if self._deflated is None:
+            self._deflated = zlib.compress(self.text.encode("utf-8"), 6)
+        return self._deflated
+
+
+class _Client:
+    def __init__(self, ws: WebSocket, batch: bool, compress: bool, queue_size: int):
+        self.ws = ws
+        self.batch = batch
+        self.compress = compress
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.sent = 0
+        self.dropped = 0
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        queue_size: int = config.WS_QUEUE_SIZE,
+        slow_policy: str = config.WS_SLOW_POLICY,
+        coalesce_ms: int = config.WS_COALESCE_MS,
+        coalesce_max: int = config.WS_COALESCE_MAX,
+    ):
+        self.queue_size = queue_size
+        self.slow_policy = slow_policy
+        self.coalesce_window = coalesce_ms / 1000
+        self.coalesce_max = coalesce_max
+        self.clients = {}          # ws -> _Client
+        self._pending = {}         # type -> [data json str]
+        self._flush_handle = None
+        self.disconnected_slow = 0
+
+    @property
+    def active(self):
+        return list(self.clients)
+
+    # -------------------------------
+    # Koneksi
+    # -------------------------------
+    async def connect(self, ws: WebSocket, batch: bool = True, compress: bool = False):
+        await ws.accept()
+        client = _Client(ws, batch, compress, self.queue_size)
+        client.task = asyncio.create_task(self._sender(client))
+        self.clients[ws] = client
+
+    def disconnect(self, ws: WebSocket):
+        client = self.clients.pop(ws, None)
+        if client is not None and client.task is not None:
+            if client.task is not asyncio.current_task():
+                client.task.cancel()
+
+    async def stop(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for ws in list(self.clients):
+            self.disconnect(ws)
+
+    # -------------------------------
+    # Broadcast (tidak pernah menunggu socket)
+    # -------------------------------
+    async def broadcast(self, message: dict):
+        self.publish(message)
+
+    def publish(self, message: dict):
+        if not self.clients:
+            return
+        mtype = message.get("type")
+        if mtype in COALESCE_TYPES and self.coalesce_window > 0:
+            data = json.dumps(message.get("data"), default=str)
+            pending = self._pending.setdefault(mtype, [])
+            pending.append(data)
+            if len(pending) >= self.coalesce_max:
+                self._flush()
+            elif self._flush_handle is None:
+                loop = asyncio.get_running_loop()
+                self._flush_handle = loop.call_later(self.coalesce_window, self._flush)
+            return
+
+        # pesan lain: kirim batch yang tertunda dulu supaya urutan tetap
+        self._flush()
+        self._fanout(_Frame(json.dumps(message, default=str)))
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+
+        for mtype, items in pending.items():
+            batch_frame = _Frame(
+                '{"type": "%s_batch", "data": [%s]}' % (mtype, ", ".join(items))
+            )
+            singles = None
+            for client in list(self.clients.values()):
+                if client.batch:
+                    self._enqueue(client, batch_frame)
+                else:
+                    if singles is None:
+                        singles = [_Frame('{"type": "%s", "data": %s}' % (mtype, d)) for d in items]
+                    for frame in singles:
+                        self._enqueue(client, frame)
+
+    def _fanout(self, frame: _Frame):
+        for client in list(self.clients.values()):
+            self._enqueue(client, frame)
+
+    def _enqueue(self, client: _Client, frame: _Frame):
+        if len(client.queue) >= client.queue_size:
+            if self.slow_policy == "disconnect":
+                self.disconnected_slow += 1
+                WS_SLOW_DISCONNECTS.inc()
+                self.disconnect(client.ws)
+                asyncio.ensure_future(self._close(client.ws))
+                return
+            client.dropped += 1
+            WS_FRAMES_DROPPED.inc()
+            if self.slow_policy == "drop_newest":
+                return
+            client.queue.popleft()      # drop_oldest
+        client.queue.append(frame)
+        client.wakeup.set()
+
+    # -------------------------------
+    # Sender per client
+    # -------------------------------
+    async def _sender(self, client: _Client):
+        ws = client.ws
+        try:
+            while True:
+                await client.wakeup.wait()
+                client.wakeup.clear()
+                while client.queue:
+                    frame = client.queue.popleft()
+                    if client.compress:
+                        await ws.send_bytes(frame.deflated)
+                    else:
+                        await ws.send_text(frame.text)
+                    client.sent += 1
+                    WS_FRAMES_SENT.inc()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.debug("WebSocket client putus: %s", e)
+            self.disconnect(ws)
+
+    @staticmethod
+    async def _close(ws: WebSocket):
+        try:
+            await ws.close(code=1013)   # try again later
+        except Exception:
+            pass
+
+    # -------------------------------
+    # Observability
+    # -------------------------------
+    def snapshot(self):
+        clients = list(self.clients.values())
+        return {
+            "clients": len(clients),
+            "backlog": sum(len(c.queue) for c in clients),
+            "max_backlog": max((len(c.queue) for c in clients), default=0),
+            "dropped": sum(c.dropped for c in clients),
+            "disconnected_slow": self.disconnected_slow,
+            "policy": self.slow_policy,
+            "coalesce_ms": int(self.coalesce_window * 1000),
+        }
+
+
+manager = ConnectionManager()
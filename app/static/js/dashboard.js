@@ -26,6 +26,7 @@ document.getElementById("btn-quick").onclick = async () => {
 // ======================
 const btnBulk = document.getElementById("btn-bulk");
 const btnStop = document.getElementById("btn-stop-bulk");
+let bulkJobId = null;
 
 btnBulk.onclick = async () => {
   const txt = document.getElementById("bulk-urls").value.trim();
@@ -36,21 +37,39 @@ btnBulk.onclick = async () => {
 
   const urls = txt.split(/\r?\n/).map((u) => u.trim()).filter(Boolean);
 
-  const res = await fetch("/scan/bulk", {
+  // NDJSON: baris pertama berisi id job (dipakai tombol stop)
+  const res = await fetch("/scan/bulk?stream=ndjson", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({ urls }),
   });
 
-  const result = await res.json();
-  console.log("Bulk Result:", result);
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let nl;
+    while ((nl = buf.indexOf("\n")) >= 0) {
+      const line = buf.slice(0, nl);
+      buf = buf.slice(nl + 1);
+      if (!line) continue;
+      const ev = JSON.parse(line);
+      if (ev.type === "job") bulkJobId = ev.id;
+      if (ev.type === "done") console.log("Bulk Result:", ev);
+    }
+  }
 
+  bulkJobId = null;
   btnBulk.disabled = false;
   btnStop.disabled = true;
 };
 
 btnStop.onclick = async () => {
-  await fetch("/scan/stop", { method: "POST" });
+  if (!bulkJobId) return;
+  await fetch(`/scan/jobs/${bulkJobId}/cancel`, { method: "POST" });
 };
 
 
@@ -68,22 +87,30 @@ ws.onmessage = (ev) => {
 
   if (!p.data) return;
 
-  const d = p.data;
+  // scan_result_batch: beberapa hasil digabung server jadi satu frame
+  const items = p.type === "scan_result_batch" ? p.data : [p.data];
 
   const tbody = document.getElementById("history-body");
+  const frag = document.createDocumentFragment();
+  let alert = false;
 
-  const row = document.createElement("tr");
-  row.innerHTML = `
+  for (const d of items) {
+    const row = document.createElement("tr");
+    row.innerHTML = `
     <td>${d.url}</td>
     <td>${d.status_code ?? "-"}</td>
     <td>${d.latency_ms ?? "-"}</td>
     <td>${new Date(d.created_at).toLocaleTimeString()}</td>
   `;
+    // yang terbaru paling atas
+    frag.prepend(row);
+    if (d.status_code >= 500) alert = true;
+  }
 
-  tbody.prepend(row);
+  tbody.prepend(frag);
 
   // suara notif
-  if (d.status_code >= 500) {
+  if (alert) {
     document.getElementById("notifSound").play();
   }
 };
@@ -0,0 +1,49 @@
+# ============================================
+# DELTA SNAPSHOT (AGENT PUSH)
+# ============================================
+# Snapshot (dict bertingkat) diratakan jadi {"a.b.c": nilai}; list dianggap
+# satu nilai utuh. Delta antar dua snapshot hanya berisi field yang berubah:
+#   {"set": {"ipinfo.gateway": "10.0.0.1"}, "del": ["wifi.bssid"]}
+
+SEP = "."
+
+
+def flatten(obj, prefix: str = "", out: dict = None):
+    if out is None:
+        out = {}
+    if isinstance(obj, dict) and obj:
+        for k, v in obj.items():
+            flatten(v, f"{prefix}{k}{SEP}", out)
+    else:
+        out[prefix[:-1] if prefix else ""] = obj
+    return out
+
+
+def unflatten(flat: dict):
+    if "" in flat:
+        return flat[""]
+    out = {}
+    for path, value in flat.items():
+        cur = out
+        *parents, leaf = path.split(SEP)
+        for p in parents:
+            cur = cur.setdefault(p, {})
+        cur[leaf] = value
+    return out
+
+
+def diff(prev: dict, cur: dict):
+    """Delta dari snapshot rata prev ke cur."""
+    return {
+        "set": {k: v for k, v in cur.items() if k not in prev or prev[k] != v},
+        "del": [k for k in prev if k not in cur],
+    }
+
+
+def apply_delta(flat: dict, delta: dict):
+    """Snapshot rata baru (flat tidak diubah)."""
+    out = dict(flat)
+    for k in delta.get("del", ()):
+        out.pop(k, None)
+    out.update(delta.get("set", {}))
+    return out
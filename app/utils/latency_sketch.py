@@ -0,0 +1,69 @@
+import json
+import math
+
+# ============================================
+# LATENCY SKETCH (MERGEABLE, LOG BUCKET)
+# ============================================
+# Histogram dengan bucket logaritmik (gaya DDSketch): setiap nilai masuk ke
+# bucket ceil(log_gamma(v)), jadi error relatif percentile <= accuracy
+# berapa pun rentang latency-nya. Dua sketch digabung cukup dengan
+# menjumlah count per bucket -> rollup 1m bisa digabung jadi 1h / 1d / window
+# apa saja tanpa membaca data mentah.
+
+
+class LatencySketch:
+    def __init__(self, accuracy: float = 0.01, buckets: dict = None, zero: int = 0):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = buckets or {}   # index -> count
+        self.zero = zero               # nilai <= 0 ms (mis. cache lokal)
+
+    @property
+    def count(self):
+        return self.zero + sum(self.buckets.values())
+
+    def add(self, value, n: int = 1):
+        if value is None:
+            return
+        if value <= 0:
+            self.zero += n
+            return
+        idx = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[idx] = self.buckets.get(idx, 0) + n
+
+    def merge(self, other: "LatencySketch"):
+        if other.accuracy != self.accuracy:
+            raise ValueError("accuracy sketch berbeda")
+        self.zero += other.zero
+        for idx, n in other.buckets.items():
+            self.buckets[idx] = self.buckets.get(idx, 0) + n
+        return self
+
+    def quantile(self, q: float):
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        if rank < self.zero:
+            return 0.0
+        seen = self.zero
+        for idx in sorted(self.buckets):
+            seen += self.buckets[idx]
+            if seen > rank:
+                # titik tengah bucket (gamma^(i-1), gamma^i]
+                return 2 * self.gamma ** idx / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    # -------------------------------
+    # Serialisasi (kolom Text di DB)
+    # -------------------------------
+    def to_json(self):
+        return json.dumps({"a": self.accuracy, "z": self.zero, "b": self.buckets},
+                          separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, raw: str):
+        data = json.loads(raw)
+        buckets = {int(k): v for k, v in data.get("b", {}).items()}
+        return cls(data.get("a", 0.01), buckets, data.get("z", 0))
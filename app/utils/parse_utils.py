@@ -1,89 +1,232 @@
-# agent/parse_utils.py
+# app/utils/parse_utils.py  (dipakai server dan agent)
 import re
 
 # ============================================
-# PARSER: netsh wlan show interfaces
+# POLA (dikompilasi sekali saat import)
 # ============================================
 
-def parse_netsh_interfaces(raw: str):
-    data = {}
+# Baris dipilah lewat indent + str.partition (key tidak pernah mengandung ":"),
+# regex hanya untuk header adapter dan angka.
+# "Wireless LAN adapter Wi-Fi:"
+_IPCONFIG_HEADER = re.compile(r"^(\S.*?) adapter (.+?):\s*$")
+# "192.168.1.23(Preferred)"
+_SUFFIXES = {"preferred", "deprecated", "tentative", "duplicate"}
+_DIGITS = re.compile(r"\d+")
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+_IPV4 = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+def _int(s):
+    if not s:
+        return None
+    m = _DIGITS.search(s)
+    return int(m.group()) if m else None
+
+
+def _float(s):
+    if not s:
+        return None
+    m = _NUMBER.search(s)
+    return float(m.group()) if m else None
+
 
-    # ambil key: value
+def _clean(value):
+    value = value.strip()
+    if value.endswith(")"):
+        head, _, tail = value.rpartition("(")
+        if tail[:-1].lower() in _SUFFIXES:
+            return head
+    return value
+
+
+def _mac(s):
+    return s.replace("-", ":").lower() if s else None
+
+
+# ============================================
+# PARSER: netsh wlan show interfaces
+# ============================================
+
+# label netsh -> field (label versi lama & baru)
+NETSH_FIELDS = {
+    "name": "name",
+    "description": "description",
+    "physical address": "mac",
+    "state": "state",
+    "ssid": "ssid",
+    "bssid": "bssid",
+    "ap bssid": "bssid",
+    "band": "band",
+    "channel": "channel",
+    "radio type": "radio_type",
+    "authentication": "authentication",
+    "cipher": "cipher",
+    "receive rate (mbps)": "receive_mbps",
+    "transmit rate (mbps)": "transmit_mbps",
+    "signal": "signal_pct",
+    "profile": "profile",
+}
+NETSH_INT_FIELDS = ("channel", "signal_pct")
+NETSH_FLOAT_FIELDS = ("receive_mbps", "transmit_mbps")
+
+WIFI_KEYS = ("ssid", "state", "bssid", "signal_pct", "radio_type", "channel", "authentication", "cipher")
+
+
+def parse_netsh_all(raw: str):
+    """Satu record per interface wifi, satu kali jalan per baris."""
+    out = []
+    cur = None
+    fields = NETSH_FIELDS
     for line in raw.splitlines():
-        if ":" in line:
-            k, v = line.split(":", 1)
-            data[k.strip().lower()] = v.strip()
+        # "    Name                   : Wi-Fi"
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        field = fields.get(key.strip().lower())
+        if field is None:
+            continue
+        if field == "name":
+            cur = dict.fromkeys(fields.values())
+            cur["name"] = value.strip()
+            out.append(cur)
+        elif cur is not None:
+            value = value.strip() or None
+            if field in NETSH_INT_FIELDS:
+                value = _int(value)
+            elif field in NETSH_FLOAT_FIELDS:
+                value = _float(value)
+            elif field == "mac":
+                value = _mac(value)
+            cur[field] = value
+    return out
 
-    # fungsi konversi angka
-    def maybe_int(s):
-        if not s:
-            return None
-        m = re.sub(r"[^0-9]", "", s)
-        return int(m) if m.isdigit() else None
 
-    return {
-        "ssid": data.get("ssid"),
-        "state": data.get("state"),
-        "bssid": data.get("bssid"),
-        "signal_pct": maybe_int(data.get("signal")),
-        "radio_type": data.get("radio type"),
-        "channel": maybe_int(data.get("channel")),
-        "authentication": data.get("authentication"),
-        "cipher": data.get("cipher")
-    }
+def parse_netsh_interfaces(raw: str):
+    """Interface wifi utama (yang connected dulu); bentuk lama untuk summary."""
+    interfaces = parse_netsh_all(raw)
+    best = next((i for i in interfaces if i.get("state") == "connected"),
+                interfaces[0] if interfaces else {})
+    return {**{k: best.get(k) for k in WIFI_KEYS}, **best}
 
 
 # ============================================
 # PARSER: ipconfig /all
 # ============================================
 
+# label ipconfig -> (field, list?)
+IPCONFIG_FIELDS = {
+    "description": ("description", False),
+    "physical address": ("mac", False),
+    "media state": ("media_state", False),
+    "dhcp enabled": ("dhcp", False),
+    "dhcp server": ("dhcp_server", False),
+    "ipv4 address": ("ipv4", True),
+    "ip address": ("ipv4", True),              # windows lama
+    "autoconfiguration ipv4 address": ("ipv4", True),
+    "subnet mask": ("masks", True),
+    "ipv6 address": ("ipv6", True),
+    "temporary ipv6 address": ("ipv6", True),
+    "link-local ipv6 address": ("ipv6", True),
+    "default gateway": ("gateways", True),
+    "dns servers": ("dns", True),
+}
+ADAPTER_TYPES = {"ethernet": "ethernet", "wireless lan": "wireless"}
+
+
+def _new_adapter(kind, name):
+    return {
+        "name": name,
+        "type": ADAPTER_TYPES.get(kind.lower(), kind.lower()),
+        "description": None,
+        "mac": None,
+        "state": "connected",
+        "dhcp": None,
+        "dhcp_server": None,
+        "ipv4": [],
+        "masks": [],
+        "ipv6": [],
+        "gateways": [],
+        "dns": [],
+    }
+
+
+def parse_ipconfig_adapters(raw: str):
+    """Satu record per adapter; gateway / DNS multiline ikut terbaca."""
+    out = []
+    cur = None
+    last = None     # field list terakhir, untuk baris lanjutan
+    fields = IPCONFIG_FIELDS
+    for line in raw.splitlines():
+        value = line.lstrip()
+        if not value:
+            continue
+        indent = len(line) - len(value)
+        if indent == 0:
+            # "Wireless LAN adapter Wi-Fi:" / "Windows IP Configuration"
+            m = _IPCONFIG_HEADER.match(line)
+            if m:
+                cur = _new_adapter(m.group(1), m.group(2))
+                out.append(cur)
+            last = None
+            continue
+        if cur is None:
+            continue    # bagian "Windows IP Configuration"
+
+        if indent > 6:
+            # nilai lanjutan (Default Gateway / DNS Servers multiline)
+            if last is not None:
+                cur[last].append(_clean(value))
+            continue
+
+        # "   IPv4 Address. . . . . . . . . . . : 192.168.1.23(Preferred)"
+        key, _, value = value.partition(":")
+        last = None
+        spec = fields.get(key.rstrip(" .").lower())
+        if spec is None:
+            continue
+        field, is_list = spec
+        value = _clean(value)
+        if is_list:
+            last = field
+            if value:
+                cur[field].append(value)
+        elif field == "media_state":
+            if "disconnected" in value.lower():
+                cur["state"] = "disconnected"
+        elif field == "dhcp":
+            cur["dhcp"] = value.lower() == "yes"
+        elif field == "mac":
+            cur["mac"] = _mac(value)
+        else:
+            cur[field] = value or None
+    return out
+
+
+def pick_adapter(adapters):
+    """Adapter utama: connected + punya gateway IPv4, kalau tidak yang punya IPv4."""
+    def v4_gateway(a):
+        return next((g for g in a["gateways"] if _IPV4.match(g)), None)
+
+    for a in adapters:
+        if a["state"] == "connected" and a["ipv4"] and v4_gateway(a):
+            return a, v4_gateway(a)
+    for a in adapters:
+        if a["state"] == "connected" and a["ipv4"]:
+            return a, None
+    return None, None
+
+
 def parse_ipconfig(raw: str):
     """
-    Parser diperbaiki:
-    - Menangani Default Gateway multiline
-    - Membersihkan IPv4 dari '(Preferred)'
-    - Compatible untuk Ethernet & WiFi
+    Ringkasan adapter utama {ipv4, gateway, interface, dns}, dipakai summary.
+    Detail semua adapter: parse_ipconfig_adapters.
     """
-
-    ipv4 = None
-    gateway = None
-
-    lines = raw.splitlines()
-
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-
-        # -------------------------------
-        # IPv4 Address
-        # -------------------------------
-        if "IPv4 Address" in stripped or ("IPv4" in stripped and ":" in stripped):
-            match = re.search(r"IPv4.*?:\s*([\d\.]+)", stripped)
-            if match:
-                ipv4 = match.group(1).strip()
-
-        # -------------------------------
-        # Default Gateway
-        # Format kemungkinan:
-        # Default Gateway . . . : 192.168.1.1
-        # Default Gateway . . . :
-        #                         192.168.1.1
-        # -------------------------------
-        if stripped.startswith("Default Gateway"):
-            parts = stripped.split(":", 1)
-
-            # case 1: gateway ada di baris yang sama
-            if len(parts) > 1 and parts[1].strip():
-                gw = parts[1].strip()
-                if re.match(r"^\d+\.\d+\.\d+\.\d+$", gw):
-                    gateway = gw
-
-            # case 2: gateway di baris berikutnya (multiline)
-            if gateway is None and i + 1 < len(lines):
-                next_line = lines[i+1].strip()
-                if re.match(r"^\d+\.\d+\.\d+\.\d+$", next_line):
-                    gateway = next_line
-
+    adapter, gateway = pick_adapter(parse_ipconfig_adapters(raw))
+    if adapter is None:
+        return {"ipv4": None, "gateway": None, "interface": None, "dns": []}
     return {
-        "ipv4": ipv4,
-        "gateway": gateway
+        "ipv4": adapter["ipv4"][0],
+        "gateway": gateway,
+        "interface": adapter["name"],
+        "dns": adapter["dns"],
     }
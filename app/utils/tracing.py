@@ -0,0 +1,173 @@
+import contextvars
+import functools
+import inspect
+import time
+
+from app import config
+
+# ============================================
+# SPAN TRACING (PER REQUEST)
+# ============================================
+# Pohon span ringan untuk satu request HTTP:
+#   with span("dns"):
+#       ...
+# Span baru jadi anak span yang sedang aktif (contextvar), jadi ikut ke
+# task anak (asyncio.gather / create_task) dan asyncio.to_thread. Di luar
+# request (bulk job, monitor, writer) tidak ada trace aktif -> span() tidak
+# melakukan apa-apa selain satu contextvar.get().
+# Root dan middleware ada di app/services/request_trace.py.
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Trace:
+    __slots__ = ("root", "spans", "dropped", "finished", "max_spans")
+
+    def __init__(self, name: str, max_spans: int = config.TRACE_MAX_SPANS):
+        self.spans = 0
+        self.dropped = 0
+        self.finished = False
+        self.max_spans = max_spans
+        self.root = Span(name, self)
+
+
+class Span:
+    __slots__ = ("name", "trace", "start", "end", "attrs", "children")
+
+    def __init__(self, name: str, trace: Trace, start: float = None, attrs: dict = None):
+        self.name = name
+        self.trace = trace
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attrs = attrs
+        self.children = []
+
+    def set(self, **attrs):
+        if self.attrs is None:
+            self.attrs = {}
+        self.attrs.update(attrs)
+
+    def duration_ms(self, now: float = None):
+        end = self.end if self.end is not None else (now or time.perf_counter())
+        return (end - self.start) * 1000
+
+    def to_dict(self, t0: float = None):
+        t0 = self.start if t0 is None else t0
+        out = {
+            "name": self.name,
+            "start_ms": round((self.start - t0) * 1000, 2),
+            "ms": round(self.duration_ms(), 2),
+        }
+        if self.end is None:
+            out["unfinished"] = True
+        if self.attrs:
+            out["attrs"] = self.attrs
+        if self.children:
+            out["children"] = [c.to_dict(t0) for c in list(self.children)]
+        return out
+
+
+class _NoSpan:
+    # dipakai kalau tidak ada trace aktif / batas span habis
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class _SpanScope:
+    __slots__ = ("parent", "name", "attrs", "span", "token")
+
+    def __init__(self, parent: Span, name: str, attrs: dict):
+        self.parent = parent
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        sp = self.span = _child(self.parent, self.name, None, self.attrs)
+        if sp is None:
+            self.token = None
+            return NO_SPAN
+        self.token = _current.set(sp)
+        return sp
+
+    def __exit__(self, *exc):
+        if self.token is not None:
+            self.span.end = time.perf_counter()
+            if exc[0] is not None:
+                self.span.set(error=exc[0].__name__)
+            _current.reset(self.token)
+        return False
+
+
+def _child(parent: Span, name: str, start, attrs):
+    trace = parent.trace
+    if trace.finished:
+        return None         # task background yang lahir dari request yang sudah selesai
+    if trace.spans >= trace.max_spans:
+        trace.dropped += 1
+        return None
+    trace.spans += 1
+    sp = Span(name, trace, start, attrs or None)
+    parent.children.append(sp)
+    return sp
+
+
+def current():
+    return _current.get()
+
+
+def span(name: str, **attrs):
+    parent = _current.get()
+    if parent is None:
+        return NO_SPAN
+    return _SpanScope(parent, name, attrs)
+
+
+def record(parent: Span, name: str, start: float, end: float, **attrs):
+    """Tambah span yang sudah selesai (mis. diukur di task lain) ke parent."""
+    if parent is None:
+        return
+    sp = _child(parent, name, start, attrs)
+    if sp is not None:
+        sp.end = end
+
+
+def activate(sp: Span):
+    return _current.set(sp)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def traced(name: str = None):
+    """Decorator span untuk fungsi sync / async (nama default: crud.<fungsi>)."""
+    def wrap(fn):
+        label = name or f"crud.{fn.__name__}"
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def run_async(*args, **kwargs):
+                if _current.get() is None:
+                    return await fn(*args, **kwargs)
+                with span(label):
+                    return await fn(*args, **kwargs)
+            return run_async
+
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(label):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
@@ -0,0 +1,122 @@
+import asyncio
+import codecs
+import csv
+import gzip
+import io
+import itertools
+
+# ============================================
+# SUMBER URL UNTUK BULK SCAN (UPLOAD BESAR)
+# ============================================
+# Body upload (text / csv / gzip) langsung ditulis ke file di disk,
+# lalu dibaca ulang per batch. Jadi memori tidak ikut membesar walau
+# list-nya 1 juta URL, dan file yang sama bisa dipakai untuk resume job.
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+CSV_TYPES = ("text/csv", "application/csv", "application/vnd.ms-excel")
+# chunk dari request dikumpulkan dulu, baru ditulis ke disk (di thread)
+WRITE_BUFFER = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+async def save_upload(request, fileobj, max_bytes: int = 0):
+    """Tulis body request ke fileobj. UploadTooLarge kalau lewat max_bytes (0 = tanpa batas)."""
+    size = 0
+    buf = bytearray()
+    async for chunk in request.stream():
+        if not chunk:
+            continue
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise UploadTooLarge(f"Upload lebih dari {max_bytes} byte")
+        buf += chunk
+        if len(buf) >= WRITE_BUFFER:
+            await asyncio.to_thread(fileobj.write, bytes(buf))
+            buf.clear()
+    if buf:
+        await asyncio.to_thread(fileobj.write, bytes(buf))
+    await asyncio.to_thread(fileobj.flush)
+    return size
+
+
+def write_url_list(fileobj, urls):
+    for u in urls:
+        fileobj.write(u.encode("utf-8") + b"\n")
+    fileobj.flush()
+
+
+def open_upload(fileobj, content_type: str = ""):
+    """
+    Kembalikan iterator baris-URL dari file upload.
+    - gzip dideteksi dari magic bytes (tidak perlu header)
+    - csv: dari content type, atau (setelah gunzip) baris pertama berupa
+      header csv dengan kolom "url"; kolom "url" kalau ada header, selain
+      itu kolom pertama
+    - text: satu URL per baris, baris kosong / '#' dilewati
+    """
+    head = fileobj.read(2)
+    fileobj.seek(0)
+    raw = gzip.GzipFile(fileobj=fileobj, mode="rb") if head == GZIP_MAGIC else fileobj
+    text = io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+
+    first = text.readline()
+    lines = itertools.chain([first], text)
+    if content_type in CSV_TYPES or _is_csv_header(first):
+        return _iter_csv(lines)
+    return _iter_text(lines)
+
+
+def _header(row):
+    return [c.strip().lower().lstrip(codecs.BOM_UTF8.decode()) for c in row]
+
+
+def _is_csv_header(line):
+    # text biasa tidak punya header; URL dengan koma tidak dianggap csv
+    row = next(csv.reader([line]), [])
+    return len(row) > 1 and "url" in _header(row)
+
+
+def _iter_text(text):
+    for line in text:
+        line = line.strip().lstrip(codecs.BOM_UTF8.decode())
+        if line and not line.startswith("#"):
+            yield line
+
+
+def _iter_csv(text):
+    reader = csv.reader(text)
+    col = 0
+    for i, row in enumerate(reader):
+        if not row:
+            continue
+        if i == 0:
+            header = _header(row)
+            if "url" in header:
+                col = header.index("url")
+                continue
+        if col < len(row):
+            url = row[col].strip()
+            if url and not url.startswith("#"):
+                yield url
+
+
+def _take(it, n):
+    out = []
+    for item in it:
+        out.append(item)
+        if len(out) >= n:
+            break
+    return out
+
+
+async def iter_batches(lines, batch_size: int = 1000):
+    # baca file di thread supaya event loop tidak ikut menunggu disk / gunzip
+    while True:
+        batch = await asyncio.to_thread(_take, lines, batch_size)
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,42 @@
+import httpx
+
+from app import config
+
+# ============================================
+# HELPER URL
+# ============================================
+
+def with_scheme(url: str):
+    # tanpa scheme -> http:// (scheme ditulis huruf besar tetap dikenali)
+    if not url[:8].lower().startswith(("http://", "https://")):
+        return "http://" + url
+    return url
+
+def url_host(url: str):
+    url = with_scheme(url)
+    try:
+        return httpx.URL(url).host or None
+    except Exception:
+        return None
+
+def canonical_url(url: str, strip_trailing_slash: bool = config.URL_STRIP_TRAILING_SLASH):
+    """
+    Bentuk baku URL (key cache / dedup scan):
+    - scheme default http://, scheme & host huruf kecil (IDN -> punycode)
+    - port default (80 / 443), fragment dan "?" kosong dibuang
+    - path kosong -> "/", segmen "." / ".." diselesaikan
+    - "/a/" -> "/a" hanya kalau strip_trailing_slash (server boleh membedakan)
+    """
+    url = with_scheme(url.strip())
+    try:
+        u = httpx.URL(url)
+    except Exception:
+        return url
+    port = u.port
+    if (u.scheme, port) in (("http", 80), ("https", 443)):
+        port = None
+    path = u.path or "/"
+    if strip_trailing_slash and len(path) > 1:
+        path = path.rstrip("/") or "/"
+    return str(u.copy_with(scheme=u.scheme.lower(), host=u.host.lower(), port=port,
+                           path=path, query=u.query or None, fragment=None))
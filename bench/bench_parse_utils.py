@@ -0,0 +1,108 @@
+import glob
+import json
+import os
+import re
+import timeit
+
+from app.utils.parse_utils import (
+    parse_ipconfig,
+    parse_ipconfig_adapters,
+    parse_netsh_all,
+    parse_netsh_interfaces,
+)
+
+# ======================================
+# FIXTURE + BENCHMARK PARSER netsh / ipconfig
+# ======================================
+# python -m bench.bench_parse_utils
+# Setiap bench/fixtures/network/<nama>.txt (output asli command) punya
+# pasangan <nama>.json berisi hasil yang diharapkan. Script ini:
+# 1. mengecek parser terhadap semua fixture (gagal = exit code 1)
+# 2. mengukur waktu parse per call, dibanding parser lama (regex dikompilasi
+#    ulang per baris, satu adapter saja)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "network")
+NUMBER = 2000
+
+
+def parse(name, raw):
+    if name.startswith("ipconfig"):
+        return {"adapters": parse_ipconfig_adapters(raw), "summary": parse_ipconfig(raw)}
+    return {"interfaces": parse_netsh_all(raw), "primary": parse_netsh_interfaces(raw)}
+
+
+# parser versi sebelumnya, hanya sebagai pembanding
+def legacy_parse_netsh(raw):
+    data = {}
+    for line in raw.splitlines():
+        if ":" in line:
+            k, v = line.split(":", 1)
+            data[k.strip().lower()] = v.strip()
+
+    def maybe_int(s):
+        if not s:
+            return None
+        m = re.sub(r"[^0-9]", "", s)
+        return int(m) if m.isdigit() else None
+
+    return {"ssid": data.get("ssid"), "state": data.get("state"), "signal_pct": maybe_int(data.get("signal"))}
+
+
+def legacy_parse_ipconfig(raw):
+    ipv4 = gateway = None
+    lines = raw.splitlines()
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        if "IPv4 Address" in stripped or ("IPv4" in stripped and ":" in stripped):
+            match = re.search(r"IPv4.*?:\s*([\d\.]+)", stripped)
+            if match:
+                ipv4 = match.group(1).strip()
+        if stripped.startswith("Default Gateway"):
+            parts = stripped.split(":", 1)
+            if len(parts) > 1 and parts[1].strip():
+                gw = parts[1].strip()
+                if re.match(r"^\d+\.\d+\.\d+\.\d+$", gw):
+                    gateway = gw
+            if gateway is None and i + 1 < len(lines):
+                next_line = lines[i + 1].strip()
+                if re.match(r"^\d+\.\d+\.\d+\.\d+$", next_line):
+                    gateway = next_line
+    return {"ipv4": ipv4, "gateway": gateway}
+
+
+def check():
+    failed = 0
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        name = os.path.basename(path)[:-4]
+        with open(path) as f:
+            raw = f.read()
+        with open(path[:-4] + ".json") as f:
+            expected = json.load(f)
+        got = json.loads(json.dumps(parse(name, raw)))
+        ok = got == expected
+        failed += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            print("  expected:", json.dumps(expected))
+            print("  got:     ", json.dumps(got))
+    return failed
+
+
+def bench():
+    for path in sorted(glob.glob(os.path.join(FIXTURES, "*.txt"))):
+        name = os.path.basename(path)[:-4]
+        with open(path) as f:
+            raw = f.read()
+        if name.startswith("ipconfig"):
+            new, old = parse_ipconfig_adapters, legacy_parse_ipconfig
+        else:
+            new, old = parse_netsh_all, legacy_parse_netsh
+        t_new = timeit.timeit(lambda: new(raw), number=NUMBER) / NUMBER * 1e6
+        t_old = timeit.timeit(lambda: old(raw), number=NUMBER) / NUMBER * 1e6
+        print(f"{name:<18} baru={t_new:7.1f} us  lama={t_old:7.1f} us  ({len(raw.splitlines())} baris)")
+
+
+if __name__ == "__main__":
+    failed = check()
+    bench()
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.models import ScanHistory, ScanPayload
+from app.services import scan_writer as scan_writer_module
+from app.services.payload_store import PayloadStore, dns_payload
+from app.services.scan_writer import ScanWriter
+
+# ======================================
+# BENCHMARK: dns inline vs payload store (dedup per hash)
+# ======================================
+# python -m bench.bench_payload_store
+# Workload monitoring: N_HOSTS host di-scan berulang N_ROUNDS kali, plus
+# snapshot network (wifi/ip) tiap putaran. Dibandingkan ukuran file SQLite
+# dan byte payload yang tersimpan.
+
+N_HOSTS = 200
+N_ROUNDS = 50
+
+
+def dns_answer(h, round_no):
+    # round robin: urutan ip berganti tiap putaran, isinya sama
+    ips = [f"10.{h // 250}.{h % 250}.{i}" for i in range(4)]
+    if round_no % 2:
+        ips.reverse()
+    return (f"host{h}.example.com", [f"alias{h}.example.com"], ips)
+
+
+def network_snapshot():
+    adapters = [{"name": f"Ethernet {i}", "ipv4": f"192.168.{i}.10", "mask": "255.255.255.0",
+                 "gateway": f"192.168.{i}.1", "dns": ["8.8.8.8", "1.1.1.1"]} for i in range(4)]
+    return {"wifi": {"ssid": "kantor", "signal": "92%", "state": "connected"}, "ip": adapters}
+
+
+def rows(inline: bool):
+    for r in range(N_ROUNDS):
+        for h in range(N_HOSTS):
+            dns = dns_answer(h, r)
+            row = dict(url=f"https://host{h}.example.com/", status_code=200,
+                       latency_ms=40, source="bulk")
+            if inline:
+                row["dns"] = json.dumps(dns)
+            else:
+                row["payload"] = dns_payload(dns)
+            yield row
+        snap = network_snapshot()
+        if inline:
+            yield dict(url="network://local", source="network", dns=json.dumps(snap))
+        else:
+            yield dict(url="network://local", source="network", payload=snap)
+
+
+async def run(label, inline):
+    tmp = tempfile.mkdtemp()
+    path = f"{tmp}/bench.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # payload store & writer memakai DB benchmark, rollup dimatikan
+    scan_writer_module.payload_store = PayloadStore(session_factory=Session)
+    writer = ScanWriter(session_factory=Session, rollups=False)
+    await writer.start()
+    start = time.perf_counter()
+    await asyncio.gather(*[writer.submit(**row) for row in rows(inline)])
+    await writer.stop()
+    dur = time.perf_counter() - start
+
+    with Session() as s:
+        n = s.query(ScanHistory).count()
+        inline_bytes = s.query(func.coalesce(func.sum(func.length(ScanHistory.dns)), 0)).scalar()
+        payload_rows = s.query(ScanPayload).count()
+        payload_bytes = s.query(func.coalesce(func.sum(ScanPayload.size), 0)).scalar()
+    engine.dispose()
+    size = os.path.getsize(path)
+    print(f"{label:<16} rows={n:<6} payload_rows={payload_rows:<5} "
+          f"payload_bytes={inline_bytes + payload_bytes:<9} db={size / 1024:8.0f} KiB  {dur:5.2f}s")
+    return inline_bytes + payload_bytes, size
+
+
+async def main():
+    old_bytes, old_size = await run("dns inline", inline=True)
+    new_bytes, new_size = await run("payload store", inline=False)
+    print(f"payload bytes: {old_bytes / max(new_bytes, 1):.0f}x lebih kecil, "
+          f"file DB: {old_size / new_size:.1f}x lebih kecil")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import httpx
+
+from app.routes.scan import do_http_scan
+from app.services.scan_client import scan_client
+from bench.standin_server import StandinServer
+
+# ======================================
+# BENCHMARK: client baru per URL vs shared pooled client
+# ======================================
+# python -m bench.bench_scan_client
+
+N_URLS = 500
+CONCURRENCY = 8
+
+
+async def scan_fresh_client(url):
+    # perilaku lama: AsyncClient baru untuk setiap URL
+    async with httpx.AsyncClient(timeout=15, follow_redirects=True) as c:
+        r = await c.get(url)
+    return len(r.content)
+
+
+async def run(label, fn, urls, srv):
+    sem = asyncio.Semaphore(CONCURRENCY)
+    conn_before = srv.connections
+
+    async def worker(u):
+        async with sem:
+            await fn(u)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(u) for u in urls])
+    dur = time.perf_counter() - start
+    print(f"{label:<14} {len(urls)/dur:8.0f} scan/s  "
+          f"{dur:6.2f}s  koneksi TCP baru: {srv.connections - conn_before}")
+    return dur
+
+
+async def main():
+    async with StandinServer() as srv:
+        urls = [f"{srv.base_url}/page/{i}" for i in range(N_URLS)]
+        await scan_client.start()
+        try:
+            old = await run("fresh client", scan_fresh_client, urls, srv)
+            new = await run("pooled client", do_http_scan, urls, srv)
+        finally:
+            await scan_client.stop()
+    print(f"speedup: {old/new:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.database import Base
+from app.models.models import ScanHistory
+from app.services.scan_writer import ScanWriter
+
+# ======================================
+# BENCHMARK: commit+refresh per hasil vs write-behind batch
+# ======================================
+# python -m bench.bench_scan_writer
+# Pakai SQLite file (BENCH_DATABASE_URL untuk DB lain, misal MySQL).
+
+N_ROWS = 10000
+CONCURRENCY = 8
+
+
+def create_scan_history(db, **fields):
+    # perilaku lama route: satu baris, commit + refresh per hasil
+    rec = ScanHistory(**fields)
+    db.add(rec)
+    db.commit()
+    db.refresh(rec)
+    return rec
+
+
+def fake_result(i):
+    return dict(
+        url=f"http://example.com/page/{i}",
+        status_code=200,
+        latency_ms=42,
+        content_length=1024,
+        dns=json.dumps(["example.com", [], ["93.184.216.34"]]),
+        error=None,
+        source="bulk",
+    )
+
+
+async def bulk(label, save):
+    sem = asyncio.Semaphore(CONCURRENCY)
+
+    async def worker(i):
+        # sama seperti bulk_scan: semaphore untuk probe, simpan di luar slot
+        async with sem:
+            await asyncio.sleep(0)
+        rec = await save(fake_result(i))
+        assert rec.id is not None
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(N_ROWS)])
+    dur = time.perf_counter() - start
+    print(f"{label:<22} {N_ROWS/dur:8.0f} rows/s  {dur:6.2f}s")
+    return dur
+
+
+async def main():
+    tmp = tempfile.mkdtemp()
+    url = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # perilaku lama: satu session dipakai semua worker, commit+refresh per baris
+    db = Session()
+
+    async def save_per_row(row):
+        return create_scan_history(db, **row)
+
+    old = await bulk("commit per row", save_per_row)
+    db.close()
+
+    writer = ScanWriter(session_factory=Session)
+    await writer.start()
+    new = await bulk("write-behind batch", lambda row: writer.submit(**row))
+    await writer.stop()
+    print(f"batches: {writer.batches_written}  "
+          f"rata-rata {writer.rows_written / writer.batches_written:.0f} rows/batch")
+
+    with Session() as s:
+        assert s.query(ScanHistory).count() == 2 * N_ROWS
+    print(f"speedup: {old/new:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.database import async_url, pool_options
+
+# ======================================
+# LOAD TEST: latency request saat DB sedang sibuk
+# ======================================
+# python -m bench.load_db_contention
+# (BENCH_DATABASE_URL untuk MySQL, misal mysql+mysqlconnector://root:@localhost/scan_db)
+#
+# CONCURRENCY client terus memanggil endpoint yang query-nya lambat
+# (SLEEP di DB = lock / query berat), sementara satu client mengukur
+# latency /ping yang tidak menyentuh DB:
+# - "sync session": Session sync di dalam async def (pola lama)
+# - "async session": AsyncSession dari pool async (pola baru)
+# Pola lama menahan event loop selama query, jadi /ping ikut lambat.
+
+CONCURRENCY = 40
+DURATION = 5.0
+QUERY_SECONDS = 0.02
+PING_INTERVAL = 0.01
+
+
+def sqlite_sleep(seconds):
+    time.sleep(seconds)
+    return 1
+
+
+def build_app(url: str):
+    # pool sync harus >= CONCURRENCY: checkout yang menunggu di dalam event
+    # loop tidak akan pernah dilepas coroutine lain (deadlock pola lama)
+    sync_engine = create_engine(url, **{**pool_options(url),
+                                        "pool_size": CONCURRENCY, "max_overflow": 10})
+    a_url = async_url(url)
+    async_engine = create_async_engine(a_url, **pool_options(a_url))
+
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite tidak punya SLEEP(); daftarkan fungsi python di setiap koneksi
+        for eng in (sync_engine, async_engine.sync_engine):
+            event.listen(eng, "connect",
+                         lambda conn, _rec: conn.create_function("sleep", 1, sqlite_sleep))
+
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    slow_sql = text("SELECT SLEEP(:s)")
+
+    def get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.get("/slow/sync")
+    async def slow_sync(db: Session = Depends(get_db)):
+        db.execute(slow_sql, {"s": QUERY_SECONDS})
+        return {"ok": True}
+
+    @app.get("/slow/async")
+    async def slow_async(db: AsyncSession = Depends(get_async_db)):
+        await db.execute(slow_sql, {"s": QUERY_SECONDS})
+        return {"ok": True}
+
+    async def close():
+        sync_engine.dispose()
+        await async_engine.dispose()
+
+    return app, close
+
+
+async def run(app, label, path):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        stop = time.perf_counter() + DURATION
+        slow_done = 0
+
+        async def loader():
+            nonlocal slow_done
+            while time.perf_counter() < stop:
+                r = await client.get(path)
+                r.raise_for_status()
+                slow_done += 1
+
+        async def pinger():
+            # latency dihitung dari jadwal kirim, bukan saat coroutine sempat
+            # jalan: waktu event loop tertahan ikut terukur
+            lat = []
+            due = time.perf_counter()
+            while due < stop:
+                await asyncio.sleep(max(0.0, due - time.perf_counter()))
+                (await client.get("/ping")).raise_for_status()
+                lat.append((time.perf_counter() - due) * 1000)
+                due += PING_INTERVAL
+            return lat
+
+        loaders = [asyncio.create_task(loader()) for _ in range(CONCURRENCY if path else 0)]
+        lat = await pinger()
+        await asyncio.gather(*loaders)
+
+    lat.sort()
+    p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+    print(f"{label:<16} ping p50={statistics.median(lat):7.2f} ms  p99={p99:7.2f} ms  "
+          f"max={lat[-1]:7.2f} ms  slow queries={slow_done / DURATION:6.0f}/s")
+
+
+async def main():
+    tmp = tempfile.mkdtemp()
+    url = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{tmp}/bench.db")
+    app, close = build_app(url)
+    try:
+        await run(app, "tanpa beban", None)
+        await run(app, "sync session", "/slow/sync")
+        await run(app, "async session", "/slow/async")
+    finally:
+        await close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+import asyncio
+
+# ======================================
+# STAND-IN HTTP SERVER UNTUK BENCHMARK
+# ======================================
+# HTTP/1.1 minimal dengan keep-alive, cukup untuk mengukur scanner
+# tanpa internet. Jalankan lewat `async with StandinServer() as srv:`.
+
+
+class StandinServer:
+    def __init__(self, host="127.0.0.1", port=0, body_size=512):
+        self.host = host
+        self.port = port
+        self.body = b"x" * body_size
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                method = head.split(b" ", 1)[0]
+                keep_alive = b"connection: close" not in head.lower()
+                body = b"" if method == b"HEAD" else self.body
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: text/plain\r\n"
+                    b"Content-Length: " + str(len(self.body)).encode() + b"\r\n"
+                    + (b"" if keep_alive else b"Connection: close\r\n")
+                    + b"\r\n" + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+# ======================================
+# SETUP TEST
+# ======================================
+# Semua test memakai SQLite sementara (sync + aiosqlite), bukan MySQL.
+# Env diisi sebelum modul app diimpor, karena config dibaca saat import.
+_TMP = tempfile.mkdtemp(prefix="scantool-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP}/test.db"
+os.environ["ASYNC_DATABASE_URL"] = ""
+os.environ.setdefault("SCAN_JOB_DIR", os.path.join(_TMP, "jobs"))
+os.environ.setdefault("ARCHIVE_DIR", os.path.join(_TMP, "archive"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from app.db.database import Base, engine, SessionLocal, dispose_async_engine
+import app.models.models  # noqa: F401  (daftarkan tabel)
+
+Base.metadata.create_all(engine)
+
+
+@pytest.fixture
+def tmp_dir():
+    return _TMP
+
+
+@pytest.fixture
+def db():
+    """Session sync; semua tabel dikosongkan setelah test."""
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        with engine.begin() as conn:
+            for table in reversed(Base.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def arun(db):
+    """asyncio.run + engine async ditutup di loop yang sama."""
+    def run(coro):
+        async def main():
+            try:
+                return await coro
+            finally:
+                await dispose_async_engine()
+        return asyncio.run(main())
+    return run
+
+
+@pytest.fixture
+def api(arun):
+    """fn(client) dijalankan dengan httpx client ke router /scan (tanpa lifespan)."""
+    import httpx
+    from fastapi import FastAPI
+    from app.routes.scan import router
+    from app.services.scan_writer import scan_writer
+    from app.services.agent_fleet import agent_poller
+
+    def run(fn):
+        async def main():
+            app = FastAPI()
+            app.include_router(router)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                try:
+                    return await fn(client)
+                finally:
+                    # singleton terikat ke loop test ini
+                    await scan_writer.stop()
+                    agent_poller.agents.clear()
+        return arun(main())
+    return run
@@ -0,0 +1,150 @@
+import asyncio
+import functools
+import logging
+
+import httpx
+import pytest
+
+from app import config
+from app.models.models import Agent
+from app.services import agent_fleet
+from app.services.agent_fleet import AgentPoller, AgentState, agent_poller
+
+
+@pytest.fixture
+def fake_agents(monkeypatch):
+    """Semua AsyncClient poller diarahkan ke agent palsu (MockTransport)."""
+    hits = []
+
+    def handler(request):
+        hits.append(request.url.host)
+        if request.url.host == "rusak":
+            return httpx.Response(500)
+        if request.url.host == "lapor-error":
+            return httpx.Response(200, json={"error": "netsh gagal"})
+        return httpx.Response(200, json={"host": request.url.host,
+                                         "token": request.headers.get("x-agent-token")})
+
+    transport = httpx.MockTransport(handler)
+    monkeypatch.setattr(agent_fleet.httpx, "AsyncClient",
+                        functools.partial(httpx.AsyncClient, transport=transport))
+    return hits
+
+
+def add_agents(db, *rows):
+    db.add_all([Agent(**r) for r in rows])
+    db.commit()
+
+
+# ======================================
+# PUTARAN POLL
+# ======================================
+
+def test_poll_round_records_ok_and_errors(db, arun, fake_agents):
+    add_agents(
+        db,
+        {"name": "ok", "address": "sehat:8008", "token": "t1"},
+        {"name": "rusak", "address": "http://rusak:8008"},
+        {"name": "lapor", "address": "http://lapor-error:8008"},
+        {"name": "push", "mode": "push", "token": "x"},
+        {"name": "mati", "address": "http://mati:8008", "enabled": False},
+    )
+    seen = []
+
+    async def handle(state, snapshot, error, changed):
+        seen.append((state.name, error, changed))
+
+    async def main():
+        poller = AgentPoller(interval=3600, concurrency=2)
+        await poller.start(handle)
+        try:
+            while poller.rounds == 0:
+                await asyncio.sleep(0.01)
+            return poller.list(), poller.snapshot()
+        finally:
+            await poller.stop()
+
+    agents, snap = arun(main())
+    by_name = {a["name"]: a for a in agents}
+
+    # push & nonaktif tidak dipoll
+    assert sorted(fake_agents) == ["lapor-error", "rusak", "sehat"]
+    assert set(by_name) == {"ok", "rusak", "lapor", "push"}
+    assert by_name["ok"]["status"] == "ok"
+    assert by_name["ok"]["snapshot"] == {"host": "sehat", "token": "t1"}
+    assert by_name["rusak"]["status"] == "down"
+    assert by_name["rusak"]["last_error"] == "HTTP 500"
+    assert by_name["lapor"]["last_error"] == "netsh gagal"
+    assert by_name["push"]["status"] == "unknown"
+    assert sorted(seen) == [("lapor", "netsh gagal", True), ("ok", None, True), ("rusak", "HTTP 500", True)]
+    assert snap["enabled"] and snap["rounds"] == 1
+    assert snap["status"] == {"ok": 1, "down": 2, "unknown": 1}
+
+
+def test_record_reports_change_only_on_new_snapshot_or_status():
+    state = AgentState(Agent(id=1, name="a", mode="pull", address="a:1", enabled=True))
+    assert state.record({"x": 1}, None, 5)
+    assert not state.record({"x": 1}, None, 5)
+    assert state.record({"x": 2}, None, 5)
+    assert state.record(None, "timeout", 5)
+    assert not state.record(None, "timeout", 5)
+    assert state.failures == 2 and state.snapshot == {"x": 2}
+    assert state.record({"x": 2}, None, 5)
+    assert state.status(stale_after=60) == "ok"
+
+
+# ======================================
+# POLL MANUAL TANPA POLLER BERJALAN
+# ======================================
+
+def test_poll_requires_running_poller(db, arun, fake_agents):
+    async def main():
+        poller = AgentPoller()
+        state = AgentState(Agent(id=1, name="a", mode="pull", address="sehat:1", enabled=True))
+        assert not poller.running
+        with pytest.raises(RuntimeError):
+            await poller.poll(state)
+        await poller.start()
+        assert poller.running
+        await poller.poll(state)
+        await poller.stop()
+        assert not poller.running
+        return state
+
+    assert arun(main()).snapshot == {"host": "sehat", "token": None}
+
+
+def test_poll_route_503_when_poller_stopped(api):
+    async def main(client):
+        r = await client.post("/scan/agents", json={"name": "pc-1", "address": "sehat:8008"})
+        assert r.status_code == 200, r.text
+        agent_id = r.json()["agent"]["id"]
+        return await client.post(f"/scan/agents/{agent_id}/poll")
+
+    r = api(main)
+    assert r.status_code == 503
+
+
+# ======================================
+# STARTUP: DEFAULT MATI, TANPA DRIVER ASYNC DILEWATI
+# ======================================
+
+def test_lifespan_skips_poller_without_async_driver(db, arun, monkeypatch, caplog):
+    from app import main
+
+    def no_driver():
+        raise ModuleNotFoundError("No module named 'aiomysql'")
+
+    assert config.AGENT_POLL_ENABLED is False
+    monkeypatch.setattr(config, "AGENT_POLL_ENABLED", True)
+    monkeypatch.setattr(config, "MONITOR_ENABLED", False)
+    monkeypatch.setattr(config, "SCAN_JOB_AUTO_RESUME", False)
+    monkeypatch.setattr(main, "get_async_engine", no_driver)
+
+    async def run():
+        async with main.lifespan(main.app):
+            return agent_poller.running
+
+    with caplog.at_level(logging.WARNING, logger="app.main"):
+        assert arun(run()) is False
+    assert "Polling agent tidak dijalankan" in caplog.text
@@ -0,0 +1,181 @@
+import copy
+import gzip
+import json
+import time
+
+import httpx
+
+from app.models.models import ScanHistory
+from app.routes import scan as scan_routes
+from app.services.metrics_store import MetricsStore
+from app.services.agent import Sampler, Uploader
+from app.services.agent_fleet import agent_poller
+from app.utils.delta import flatten, unflatten, diff, apply_delta
+
+SNAP = {"os": "windows", "interfaces": {"ssid": "kantor", "signal_pct": 90},
+        "ipinfo": {"gateway": "10.0.0.1", "dns": ["1.1.1.1"]}}
+
+
+def make_sampler():
+    n = [0]
+
+    async def collect():
+        n[0] += 1
+        s = copy.deepcopy(SNAP)
+        s["interfaces"]["signal_pct"] = 90 - n[0] % 3
+        return s
+    return Sampler(collect_fn=collect, interval=0, size=100)
+
+
+async def register(client, name="pc-push", token="rahasia"):
+    r = await client.post("/scan/agents", json={"name": name, "mode": "push", "token": token})
+    assert r.status_code == 200, r.text
+
+
+def agent_rows(db):
+    return db.query(ScanHistory).filter_by(source="agent").order_by(ScanHistory.id).all()
+
+
+# ======================================
+# DELTA
+# ======================================
+
+def test_delta_roundtrip():
+    a = flatten(SNAP)
+    b = flatten({**SNAP, "interfaces": {"ssid": "tamu"}, "extra": [1, 2]})
+    d = diff(a, b)
+    assert d["set"] == {"interfaces.ssid": "tamu", "extra": [1, 2]}
+    assert d["del"] == ["interfaces.signal_pct"]
+    assert unflatten(apply_delta(a, d)) == unflatten(b)
+
+
+# ======================================
+# UPLOAD -> INGEST
+# ======================================
+
+def test_upload_full_then_delta(api, db):
+    async def main(client):
+        await register(client)
+        sampler = make_sampler()
+        up = Uploader(sampler, url="http://test", name="pc-push", token="rahasia", batch=20, client=client)
+        for _ in range(3):
+            await sampler.sample()
+        samples, _ = up.build()
+        assert "full" in samples[0] and "full" not in samples[1]
+        assert await up.upload_once() == 3
+        for _ in range(2):
+            await sampler.sample()
+        samples, _ = up.build()
+        assert all("full" not in s for s in samples)
+        assert await up.upload_once() == 2
+        assert await up.upload_once() == 0
+        return up
+
+    up = api(main)
+    assert up.acked_seq == 5
+    rows = agent_rows(db)
+    assert len(rows) == 5 and all(r.status_code == 200 for r in rows)
+
+
+def test_server_without_base_gets_full_resend(api, db):
+    async def main(client):
+        await register(client)
+        sampler = make_sampler()
+        up = Uploader(sampler, url="http://test", name="pc-push", token="rahasia", client=client)
+        await sampler.sample()
+        await up.upload_once()
+        # server restart / worker lain: basis delta hilang -> 409 -> kirim penuh
+        state = next(iter(agent_poller.agents.values()))
+        state.push_flat = None
+        await sampler.sample()
+        assert await up.upload_once() == 1
+        return state
+
+    state = api(main)
+    assert state.push_seq == 2
+    assert len(agent_rows(db)) == 2
+
+
+def test_resend_after_lost_ack_is_not_stored_twice(api, db):
+    async def main(client):
+        await register(client)
+        sampler = make_sampler()
+        up = Uploader(sampler, url="http://test", name="pc-push", token="rahasia", client=client)
+        await sampler.sample()
+        await up.upload_once()
+        await sampler.sample()
+        saved = (up.acked_seq, up.acked_state)
+        await up.upload_once()
+        up.acked_seq, up.acked_state = saved     # ack hilang di jalan
+        await up.upload_once()
+
+    api(main)
+    assert len(agent_rows(db)) == 2
+
+
+def test_upload_failure_keeps_samples_buffered(api, db):
+    class Down(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            raise httpx.ConnectError("down")
+
+    async def main(client):
+        await register(client)
+        sampler = make_sampler()
+        async with httpx.AsyncClient(transport=Down(), base_url="http://test") as down:
+            up = Uploader(sampler, url="http://test", name="pc-push", token="rahasia", client=down)
+            await sampler.sample()
+            try:
+                await up.upload_once()
+            except httpx.ConnectError:
+                pass
+        assert up.acked_seq == 0
+        up.client = client
+        assert await up.upload_once() == 1
+
+    api(main)
+    assert len(agent_rows(db)) == 1
+
+
+def ingest(client, body, token="rahasia"):
+    return client.post("/scan/agents/ingest", content=gzip.compress(json.dumps(body).encode()),
+                       headers={"x-agent-token": token, "content-encoding": "gzip",
+                                "content-type": "application/json"})
+
+
+def test_ingest_rejects_bad_token_and_bad_samples(api, db):
+    async def main(client):
+        await register(client)
+        body = {"agent": "pc-push", "session": "s1", "base_seq": None,
+                "samples": [{"seq": 1, "ts": 1_700_000_000, "full": SNAP}]}
+        assert (await ingest(client, body, token="salah")).status_code == 401
+        for bad_ts in ("nan", 1e20, "kemarin"):
+            bad = {**body, "samples": [{"seq": 1, "ts": bad_ts, "full": SNAP}]}
+            r = await ingest(client, bad)
+            assert r.status_code == 422, (bad_ts, r.text)
+        # delta tanpa basis
+        r = await ingest(client, {**body, "base_seq": 7, "samples": [{"seq": 8, "ts": 1_700_000_000, "set": {}}]})
+        assert r.status_code == 409 and r.json()["need_full"]
+        r = await ingest(client, body)
+        assert r.json() == {"ok": True, "acked": 1, "stored": 1}
+
+    api(main)
+    assert len(agent_rows(db)) == 1
+
+
+def test_agent_clock_ahead_does_not_shift_live_metrics(api, db, monkeypatch):
+    store = MetricsStore(ring_size=64)
+    monkeypatch.setattr(scan_routes, "metrics_store", store)
+
+    async def main(client):
+        await register(client)
+        body = {"agent": "pc-push", "session": "s1", "base_seq": None,
+                "samples": [{"seq": 1, "ts": time.time() + 86400, "full": SNAP}]}
+        assert (await ingest(client, body)).status_code == 200
+
+    api(main)
+    for _ in range(5):
+        store.record_scan("http://lokal.test/", "web", 10, 200)
+    points = store.query("source", "all", 2400, 40)
+    assert sum(p["count"] for p in points) == 6
+    # scan_history tetap memakai waktu sample dari agent
+    assert agent_rows(db)[0].created_at.timestamp() > time.time() + 3600
@@ -0,0 +1,187 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+from contextlib import aclosing
+
+import pytest
+
+from app import config
+from app.routes import scan as scan_routes
+from app.services.bulk_pool import run_bounded
+from app.services.scan_jobs import JobManager
+from app.utils.url_source import open_upload, iter_batches, save_upload, UploadTooLarge
+
+
+async def numbers(n, seen=None):
+    for i in range(n):
+        if seen is not None:
+            seen.append(i)
+        yield i
+
+
+# ======================================
+# WORKER POOL
+# ======================================
+
+def test_run_bounded_caps_workers_and_yields_all():
+    state = {"now": 0, "max": 0}
+
+    async def handle(i):
+        state["now"] += 1
+        state["max"] = max(state["max"], state["now"])
+        await asyncio.sleep(0.001 * (i % 5))
+        state["now"] -= 1
+        return i * 2
+
+    async def main():
+        return [x async for x in run_bounded(numbers(200), handle, workers=7, start=10)]
+
+    out = asyncio.run(main())
+    assert state["max"] == 7
+    assert sorted(out) == [(10 + i, i * 2) for i in range(200)]
+
+
+def test_run_bounded_pulls_input_lazily():
+    seen = []
+
+    async def handle(i):
+        await asyncio.sleep(0.01)
+        return i
+
+    async def main():
+        results = run_bounded(numbers(10_000, seen), handle, workers=4, buffer=4)
+        async with aclosing(results):
+            async for idx, _ in results:
+                if idx >= 20:
+                    break
+
+    asyncio.run(main())
+    # hanya sedikit di depan konsumen, bukan seluruh input
+    assert len(seen) < 40
+
+
+def test_run_bounded_propagates_worker_error_and_cancels_rest():
+    cancelled = []
+
+    async def handle(i):
+        if i == 3:
+            raise RuntimeError("rusak")
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(i)
+            raise
+        return i
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with aclosing(run_bounded(numbers(10), handle, workers=4)) as results:
+                async for _ in results:
+                    pass
+
+    asyncio.run(main())
+    assert sorted(cancelled) == [0, 1, 2]
+
+
+# ======================================
+# SUMBER URL (TEXT / CSV / GZIP)
+# ======================================
+
+def test_open_upload_text_csv_and_gzip():
+    text = "﻿http://a\n\n# komentar\n  http://b  \n".encode()
+    assert list(open_upload(io.BytesIO(text))) == ["http://a", "http://b"]
+
+    csv_body = b"nama,url\nsatu,http://c\ndua,\ntiga,http://d\n"
+    assert list(open_upload(io.BytesIO(csv_body), "text/csv")) == ["http://c", "http://d"]
+    assert list(open_upload(io.BytesIO(b"http://e,x\n"), "text/csv")) == ["http://e"]
+
+    gz = io.BytesIO(gzip.compress(b"http://f\nhttp://g\n"))
+    assert list(open_upload(gz)) == ["http://f", "http://g"]
+
+
+def test_iter_batches():
+    async def main():
+        return [b async for b in iter_batches(iter(range(7)), 3)]
+
+    assert asyncio.run(main()) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+# ======================================
+# /scan/bulk: UPLOAD -> NDJSON
+# ======================================
+
+def test_bulk_upload_streams_ndjson(api, db, tmp_dir, monkeypatch):
+    async def do_http_scan(url, **kwargs):
+        await asyncio.sleep(0.001)
+        return {"url": url, "elapsed_ms": 1, "status_code": 200, "error": None, "error_type": None}
+
+    async def save_web_result(res, source):
+        class Rec:
+            id = 1
+        return Rec(), "Website cepat"
+
+    async def no_prefetch(batch):
+        pass
+
+    jobs = JobManager(job_dir=f"{tmp_dir}/bulk-jobs", inflight=8)
+    monkeypatch.setattr(scan_routes, "job_manager", jobs)
+    monkeypatch.setattr(scan_routes, "do_http_scan", do_http_scan)
+    monkeypatch.setattr(scan_routes, "save_web_result", save_web_result)
+    monkeypatch.setattr(JobManager, "_prefetch", staticmethod(no_prefetch))
+    body = gzip.compress("\n".join(f"http://u{i}.test/" for i in range(300)).encode())
+
+    async def main(client):
+        async with client.stream("POST", "/scan/bulk", content=body,
+                                 headers={"content-type": "application/gzip"}) as r:
+            lines = [json.loads(line) async for line in r.aiter_lines() if line]
+            return r, lines
+
+    r, lines = api(main)
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    job = jobs.jobs[r.headers["x-scan-job"]]
+    assert job.status == "done" and job.done == 300
+    assert lines[0] == {"type": "job", "id": job.id}
+    assert lines[-1]["type"] == "done" and lines[-1]["done"] == 300
+    assert sorted(line["index"] for line in lines[1:-1]) == list(range(300))
+
+
+def test_gzipped_csv_detected_after_decompression():
+    body = gzip.compress(b"nama,URL\nsatu,http://c\ndua,http://d\n")
+    assert list(open_upload(io.BytesIO(body), "application/gzip")) == ["http://c", "http://d"]
+    # URL dengan koma di text biasa tetap satu baris utuh
+    assert list(open_upload(io.BytesIO(b"http://a/?x=1,2\n"))) == ["http://a/?x=1,2"]
+
+
+def test_save_upload_enforces_limit():
+    class Req:
+        async def stream(self):
+            for _ in range(5):
+                yield b"x" * 1000
+
+    out = io.BytesIO()
+    assert asyncio.run(save_upload(Req(), out, max_bytes=5000)) == 5000
+    assert out.getvalue() == b"x" * 5000
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload(Req(), io.BytesIO(), max_bytes=4999))
+
+
+def test_bulk_upload_over_limit_is_413(api, db, tmp_dir, monkeypatch):
+    jobs = JobManager(job_dir=f"{tmp_dir}/bulk-limit")
+    monkeypatch.setattr(scan_routes, "job_manager", jobs)
+    monkeypatch.setattr(config, "SCAN_BULK_MAX_UPLOAD_BYTES", 100)
+
+    async def chunks():
+        for _ in range(3):
+            yield b"http://u.test/\n" * 4
+
+    async def main(client):
+        sized = await client.post("/scan/bulk", content=b"x" * 101, headers={"content-type": "text/plain"})
+        chunked = await client.post("/scan/bulk", content=chunks(), headers={"content-type": "text/plain"})
+        return sized, chunked
+
+    sized, chunked = api(main)
+    assert sized.status_code == 413 and chunked.status_code == 413
+    assert jobs.jobs == {}
+    assert os.listdir(jobs.job_dir) == []      # file input dibuang
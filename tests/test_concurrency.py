@@ -0,0 +1,172 @@
+import asyncio
+
+import pytest
+
+from app.services.concurrency import AdaptiveLimiter, is_overload
+
+
+def run_rounds(limiter, rounds, latency_ms=100.0, dropped=False, host=None):
+    """Setiap putaran: isi semua slot sekaligus dengan sampel yang sama."""
+    async def one():
+        async with limiter.acquire(host) as slot:
+            await asyncio.sleep(0)
+            slot.latency_ms = latency_ms
+            slot.dropped = dropped
+
+    async def main():
+        for _ in range(rounds):
+            await asyncio.gather(*[one() for _ in range(int(limiter.limit))])
+    asyncio.run(main())
+
+
+# ======================================
+# BATAS SLOT
+# ======================================
+
+def test_limit_and_per_host_cap_are_enforced():
+    limiter = AdaptiveLimiter(initial=4, min_limit=1, max_limit=4, per_host=2)
+    state = {"now": 0, "max": 0, "host": {}, "host_max": {}}
+
+    async def probe(host):
+        async with limiter.acquire(host):
+            state["now"] += 1
+            state["host"][host] = state["host"].get(host, 0) + 1
+            state["max"] = max(state["max"], state["now"])
+            state["host_max"][host] = max(state["host_max"].get(host, 0), state["host"][host])
+            await asyncio.sleep(0.01)
+            state["now"] -= 1
+            state["host"][host] -= 1
+
+    async def main():
+        await asyncio.gather(*[probe("a" if i % 3 else "b") for i in range(30)])
+
+    asyncio.run(main())
+    assert state["max"] == 4
+    assert state["host_max"] == {"a": 2, "b": 2}
+    assert limiter.inflight == 0 and limiter.snapshot()["waiting"] == 0
+
+
+def test_slow_host_does_not_block_other_hosts():
+    limiter = AdaptiveLimiter(initial=8, min_limit=1, max_limit=8, per_host=1)
+    order = []
+
+    async def probe(host, delay):
+        async with limiter.acquire(host):
+            await asyncio.sleep(delay)
+            order.append(host)
+
+    async def main():
+        # antrian: 3x host lambat dulu, baru host cepat
+        await asyncio.gather(*[probe("lambat", 0.05) for _ in range(3)], probe("cepat", 0))
+
+    asyncio.run(main())
+    assert order[0] == "cepat"
+
+
+# ======================================
+# ALGORITMA LIMIT
+# ======================================
+
+def test_limit_grows_while_latency_is_stable():
+    limiter = AdaptiveLimiter(initial=10, min_limit=2, max_limit=200, per_host=0)
+    run_rounds(limiter, 30)
+    assert limiter.limit > 20
+    assert limiter.snapshot(with_history=True)["history"][-1]["limit"] == int(limiter.limit)
+
+
+def test_latency_spike_shrinks_limit():
+    limiter = AdaptiveLimiter(initial=50, min_limit=2, max_limit=200, per_host=0, tolerance=1.5)
+    run_rounds(limiter, 5, latency_ms=100)
+    before = limiter.limit
+    run_rounds(limiter, 5, latency_ms=2000)
+    assert limiter.limit < before
+
+
+def test_timeouts_back_off_to_min():
+    limiter = AdaptiveLimiter(initial=64, min_limit=4, max_limit=200, per_host=0, backoff=0.5)
+    run_rounds(limiter, 1, dropped=True)
+    assert int(limiter.limit) == 32
+    run_rounds(limiter, 10, dropped=True)
+    assert int(limiter.limit) == 4
+    assert limiter.drops == limiter.samples
+
+
+def test_is_overload_only_for_timeouts():
+    assert is_overload({"error_type": "ConnectTimeout"})
+    assert not is_overload({"error_type": "ConnectError"})
+    assert not is_overload({"status_code": 503})
+
+
+# ======================================
+# BATAL
+# ======================================
+
+def test_cancelled_waiter_and_holder_release_slots():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1, per_host=0)
+
+    async def hold(evt):
+        async with limiter.acquire("h"):
+            await evt.wait()
+
+    async def main():
+        evt = asyncio.Event()
+        holder = asyncio.create_task(hold(evt))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(hold(evt))
+        await asyncio.sleep(0)
+        assert limiter.snapshot()["waiting"] == 1
+        waiter.cancel()
+        holder.cancel()
+        await asyncio.gather(holder, waiter, return_exceptions=True)
+        # slot kembali: acquire baru langsung jalan
+        async with limiter.acquire("h"):
+            pass
+        return limiter.snapshot()
+
+    snap = asyncio.run(main())
+    assert snap["inflight"] == 0 and snap["waiting"] == 0
+    # batal bukan sampel latency
+    assert snap["samples"] == 1
+
+
+def test_error_inside_slot_is_not_a_sample():
+    limiter = AdaptiveLimiter(initial=2, per_host=0)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            async with limiter.acquire():
+                raise RuntimeError()
+
+    asyncio.run(main())
+    assert limiter.inflight == 0 and limiter.samples == 0
+
+
+def test_cancel_after_grant_passes_slot_to_next_waiter():
+    limiter = AdaptiveLimiter(initial=1, min_limit=1, max_limit=1, per_host=0)
+    tasks = {}
+
+    async def holder(evt):
+        async with limiter.acquire():
+            await evt.wait()
+        # slot baru saja diberikan ke "a", dibatalkan sebelum "a" sempat jalan
+        tasks["a"].cancel()
+
+    async def waiter():
+        async with limiter.acquire():
+            pass
+
+    async def main():
+        evt = asyncio.Event()
+        h = asyncio.create_task(holder(evt))
+        await asyncio.sleep(0)
+        tasks["a"] = asyncio.create_task(waiter())
+        tasks["b"] = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        evt.set()
+        await h
+        await asyncio.gather(tasks["a"], return_exceptions=True)
+        await asyncio.wait_for(tasks["b"], 1)
+        return limiter.snapshot()
+
+    snap = asyncio.run(main())
+    assert snap["inflight"] == 0 and snap["waiting"] == 0
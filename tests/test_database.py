@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import select
+
+from app import config
+from app.db import database
+from app.db.database import async_url, pool_options
+from app.models.models import ScanHistory
+
+
+# ======================================
+# POOL + URL ASYNC
+# ======================================
+
+def test_pool_options_skip_sizing_for_sqlite(monkeypatch):
+    monkeypatch.setattr(config, "DB_POOL_SIZE", 7)
+    assert "pool_size" not in pool_options("sqlite:///x.db")
+    opts = pool_options("mysql+pymysql://u:p@db/scan")
+    assert opts["pool_size"] == 7
+    assert opts["max_overflow"] == config.DB_MAX_OVERFLOW
+    assert opts["pool_pre_ping"] == config.DB_POOL_PRE_PING
+
+
+def test_async_url_maps_driver_and_keeps_password(monkeypatch):
+    monkeypatch.setattr(config, "ASYNC_DATABASE_URL", "")
+    assert async_url("mysql+pymysql://u:rahasia@db:3306/scan") == "mysql+aiomysql://u:rahasia@db:3306/scan"
+    assert async_url("sqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+    with pytest.raises(RuntimeError, match="ASYNC_DATABASE_URL"):
+        async_url("oracle://u:p@db/scan")
+
+    monkeypatch.setattr(config, "ASYNC_DATABASE_URL", "postgresql+asyncpg://u:p@pg/scan")
+    assert async_url("oracle://u:p@db/scan") == "postgresql+asyncpg://u:p@pg/scan"
+
+
+# ======================================
+# ENGINE ASYNC (LAZY + DISPOSE)
+# ======================================
+
+def test_async_engine_created_lazily_and_disposed(db, arun):
+    db.add(ScanHistory(url="http://async.test/"))
+    db.commit()
+
+    async def main():
+        assert database._async_engine is None
+        agen = database.get_async_db()
+        session = await agen.__anext__()
+        try:
+            urls = (await session.execute(select(ScanHistory.url))).scalars().all()
+        finally:
+            await agen.aclose()
+        engine = database.get_async_engine()
+        assert database.get_async_engine() is engine
+        await database.dispose_async_engine()
+        return urls, engine
+
+    urls, engine = arun(main())
+    assert urls == ["http://async.test/"]
+    assert engine.url.drivername == "sqlite+aiosqlite"
+    assert database._async_engine is None
@@ -0,0 +1,121 @@
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from app.services.dns_resolver import DnsResolver
+
+
+@pytest.fixture
+def fake_dns(monkeypatch):
+    calls = []
+
+    def gethostbyname_ex(host):
+        calls.append(host)
+        time.sleep(0.05)
+        if host.endswith(".invalid"):
+            raise socket.gaierror("Name or service not known")
+        return host, [], ["10.0.0.%d" % (len(host) % 250)]
+
+    monkeypatch.setattr(socket, "gethostbyname_ex", gethostbyname_ex)
+    return calls
+
+
+def resolve_all(resolver, coro_fn):
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await resolver.stop()
+    return asyncio.run(main())
+
+
+def test_cache_and_single_flight(fake_dns):
+    r = DnsResolver(ttl=60, negative_ttl=60, max_size=10, workers=4)
+
+    async def main():
+        first = await asyncio.gather(*[r.resolve("Example.COM") for _ in range(5)])
+        again = await r.resolve("example.com")
+        return first, again
+
+    first, again = resolve_all(r, main)
+    assert fake_dns == ["example.com"]
+    assert all(res == first[0] for res in first) and again == first[0]
+    assert r.hits == 1 and r.misses == 5
+
+
+def test_failed_lookup_cached_negative(fake_dns):
+    r = DnsResolver(ttl=60, negative_ttl=60, workers=2)
+
+    async def main():
+        return [await r.resolve("mati.invalid") for _ in range(3)]
+
+    assert resolve_all(r, main) == [None, None, None]
+    assert fake_dns == ["mati.invalid"]
+
+
+def test_ttl_expiry_and_lru_bound(fake_dns):
+    r = DnsResolver(ttl=0.05, negative_ttl=0, max_size=2, workers=2)
+
+    async def main():
+        await r.resolve("a.test")
+        await asyncio.sleep(0.08)
+        await r.resolve("a.test")       # kedaluwarsa -> lookup ulang
+        await r.resolve("b.test")
+        await r.resolve("c.test")       # a.test tergusur (LRU)
+        await r.resolve("mati.invalid")  # negative_ttl 0 -> tidak di-cache
+        return list(r._cache)
+
+    assert resolve_all(r, main) == ["b.test", "c.test"]
+    assert fake_dns.count("a.test") == 2
+
+
+def test_lookup_runs_off_the_event_loop(monkeypatch):
+    r = DnsResolver(ttl=60, workers=8)
+    loop_thread = threading.get_ident()
+    threads = []
+
+    def record(host):
+        threads.append(threading.get_ident())
+        time.sleep(0.1)
+        return host, [], ["10.0.0.1"]
+
+    monkeypatch.setattr(socket, "gethostbyname_ex", record)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        t = asyncio.create_task(ticker())
+        started = time.monotonic()
+        n = await r.prefetch([f"h{i}.test" for i in range(8)] + ["H0.test", None])
+        elapsed = time.monotonic() - started
+        t.cancel()
+        return n, elapsed, ticks
+
+    n, elapsed, ticks = resolve_all(r, main)
+    assert n == 8
+    assert loop_thread not in threads
+    assert elapsed < 0.5        # paralel di pool, bukan 8 x 0.1 s berurutan
+    assert ticks >= 5           # event loop tetap berjalan selama lookup
+
+
+def test_cancelled_caller_does_not_cancel_shared_lookup(fake_dns):
+    r = DnsResolver(ttl=60, workers=2)
+
+    async def main():
+        a = asyncio.create_task(r.resolve("bersama.test"))
+        b = asyncio.create_task(r.resolve("bersama.test"))
+        await asyncio.sleep(0.01)
+        a.cancel()
+        return await b
+
+    assert resolve_all(r, main)[2] == ["10.0.0.%d" % (len("bersama.test") % 250)]
+    assert fake_dns == ["bersama.test"]
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+
+from app.models.models import ScanHistory
+from app.routes import scan as scan_routes
+from app.services.retention import Retention
+
+BASE = datetime(2026, 1, 10, 12, 0, 0)
+
+
+def seed(db):
+    # 12 baris; tiap dua baris berbagi created_at -> urutan ditentukan id
+    for i in range(12):
+        db.add(ScanHistory(
+            url=f"http://{'api' if i % 3 == 0 else 'www'}{i}.test/p",
+            host=f"{'api' if i % 3 == 0 else 'www'}{i}.test",
+            status_code=200 if i % 4 else 503,
+            latency_ms=10 + i,
+            error="timeout" if i % 5 == 0 else None,
+            source="bulk" if i % 2 else "web",
+            created_at=BASE + timedelta(seconds=i // 2),
+        ))
+    db.commit()
+    return [(r.created_at, r.id) for r in db.query(ScanHistory).all()]
+
+
+def pages(client, query, limit):
+    async def walk():
+        out, cursor, n = [], None, 0
+        while True:
+            q = f"/scan/history?limit={limit}&fields=id{query}"
+            if cursor:
+                q += f"&cursor={cursor}"
+            body = (await client.get(q)).json()
+            out.extend(r["id"] for r in body["rows"])
+            n += 1
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return out, n
+    return walk()
+
+
+# ======================================
+# KEYSET PAGINATION
+# ======================================
+
+def test_pages_cover_all_rows_newest_first(api, db):
+    keys = seed(db)
+    expected = [i for _, i in sorted(keys, reverse=True)]
+
+    ids, n = api(lambda client: pages(client, "", 5))
+    assert ids == expected
+    assert n == 3
+
+
+def test_filters_match_sql(api, db):
+    seed(db)
+
+    async def main(client):
+        out = {}
+        for name, q in {
+            "source": "&source=bulk",
+            "status": "&status_min=500&status_max=599",
+            "host": "&host=API*",
+            "error": "&has_error=true",
+            "prefix": "&url_prefix=http://www1",
+        }.items():
+            out[name], _ = await pages(client, q, 2)
+        return out
+
+    got = api(main)
+    rows = {r.id: r for r in db.query(ScanHistory).all()}
+
+    def want(pred):
+        return [r.id for r in sorted(rows.values(), key=lambda r: (r.created_at, r.id), reverse=True)
+                if pred(r)]
+
+    assert got["source"] == want(lambda r: r.source == "bulk")
+    assert got["status"] == want(lambda r: r.status_code == 503)
+    assert got["host"] == want(lambda r: r.host.startswith("api"))
+    assert got["error"] == want(lambda r: r.error is not None)
+    assert got["prefix"] == want(lambda r: r.url.startswith("http://www1"))
+
+
+# ======================================
+# PROJECTION + INPUT TIDAK VALID
+# ======================================
+
+def test_projection_and_invalid_input(api, db):
+    seed(db)
+
+    async def main(client):
+        return (
+            await client.get("/scan/history?limit=1"),
+            await client.get("/scan/history?limit=1&fields=url,timing"),
+            await client.get("/scan/history?limit=1&fields=all"),
+            await client.get("/scan/history?fields=url,rahasia"),
+            await client.get("/scan/history?cursor=bukan-cursor"),
+        )
+
+    default, some, every, unknown, bad_cursor = api(main)
+    assert "dns" not in default.json()["rows"][0] and "error" not in default.json()["rows"][0]
+    assert set(some.json()["rows"][0]) == {"url", "timing"}
+    assert set(some.json()["rows"][0]["timing"]) == {"dns_ms", "connect_ms", "tls_ms", "ttfb_ms", "download_ms"}
+    assert set(every.json()["rows"][0]) == set(scan_routes.HISTORY_FIELDS)
+    assert unknown.status_code == 400 and "rahasia" in unknown.json()["detail"]
+    assert bad_cursor.status_code == 400
+
+
+# ======================================
+# GABUNG DENGAN ARSIP
+# ======================================
+
+def test_archive_rows_merged_into_pages(api, db, tmp_dir, monkeypatch):
+    now = datetime.now().replace(microsecond=0)
+    for i, age in enumerate([40, 39, 38, 1, 0]):
+        db.add(ScanHistory(url=f"http://a{i}.test/", host=f"a{i}.test", status_code=200,
+                           source="web", created_at=now - timedelta(days=age)))
+    db.commit()
+    ret = Retention(archive_dir=f"{tmp_dir}/hist-archive", days=30)
+    assert ret.archive_expired() == 3
+    monkeypatch.setattr(scan_routes, "retention", ret)
+
+    async def main(client):
+        live, _ = await pages(client, "", 2)
+        merged, n = await pages(client, "&archive=1", 2)
+        return live, merged, n
+
+    live, merged, n = api(main)
+    assert len(live) == 2
+    assert len(merged) == 5 and len(set(merged)) == 5 and n == 3
+    assert merged[:2] == live
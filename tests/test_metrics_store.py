@@ -0,0 +1,87 @@
+import time
+
+from app.routes import scan as scan_routes
+from app.services.metrics_store import MetricsStore, Ring
+
+
+# ======================================
+# RING BUFFER
+# ======================================
+
+def test_ring_overwrites_oldest_and_keeps_order():
+    ring = Ring(4)
+    for t in range(6):
+        ring.append(float(t), t * 10, 200)
+    assert ring.count == 4
+    assert [ring.ts[ring._slot(n)] for n in range(4)] == [2.0, 3.0, 4.0, 5.0]
+    assert ring.first_since(3.5) == 2
+    assert ring.last() == {"ts": 5.0, "value": 50.0, "status": 200}
+
+    ring.append(1.0, 1, 200)        # datang terlambat -> tidak mundur
+    assert ring.last()["ts"] == 5.0
+
+
+def test_aggregate_buckets_min_max_avg_errors():
+    ring = Ring(100)
+    for t, value, status in [(0, 10, 200), (1, 30, 200), (2, None, 0), (5, 50, 503), (9, 70, 200), (10, 99, 200)]:
+        ring.append(float(t), value, status)
+
+    first, second = ring.aggregate(0, 10, 2)
+    assert first == {"t": 0, "count": 3, "errors": 1, "min": 10, "max": 30, "avg": 20}
+    assert second == {"t": 5, "count": 2, "errors": 1, "min": 50, "max": 70, "avg": 60}
+    # bucket tanpa titik
+    assert ring.aggregate(20, 30, 1)[0] == {"t": 20, "count": 0, "errors": 0, "min": None, "max": None, "avg": None}
+
+
+def test_url_series_capped_lru_source_kept():
+    store = MetricsStore(ring_size=8, max_series=2)
+    for url in ("http://a/", "http://b/", "http://a/", "http://c/"):
+        store.record_scan(url, "web", 5, 200, ts=1.0)
+    assert list(store.series["url"]) == ["http://a/", "http://c/"]
+    assert set(store.series["source"]) == {"web", "all"}
+    assert store.series["source"]["all"].count == 4
+
+    store.record_signal("local", None)
+    store.record_signal("local", 70, ts=1.0)
+    assert store.snapshot()["series"] == {"url": 2, "source": 2, "signal": 1}
+
+
+def test_future_timestamps_clamped_to_now():
+    store = MetricsStore(ring_size=16)
+    store.record_scan("agent://pc", "agent", None, 200, ts=time.time() + 86400)
+    store.record_signal("agent:pc", 50, ts=time.time() + 86400)
+    for _ in range(5):
+        store.record_scan("http://a/", "web", 10, 200)
+    assert sum(p["count"] for p in store.query("source", "all", 2400, 40)) == 6
+    assert sum(p["count"] for p in store.query("signal", "agent:pc", 60, 1)) == 1
+
+
+# ======================================
+# /scan/metrics
+# ======================================
+
+def test_metrics_route(api, monkeypatch):
+    store = MetricsStore(ring_size=64)
+    now = time.time()
+    for i in range(6):
+        store.record_scan("http://x.test/", "web", 100 + i, 200 if i else 500, ts=now - 50 + i * 10)
+    monkeypatch.setattr(scan_routes, "metrics_store", store)
+
+    async def main(client):
+        return [await client.get(q) for q in (
+            "/scan/metrics",
+            "/scan/metrics?kind=source&key=all&window=1m&buckets=6",
+            "/scan/metrics?kind=url&key=http://tidak.ada/",
+            "/scan/metrics?kind=disk&key=x",
+            "/scan/metrics?kind=url&key=x&buckets=0",
+        )]
+
+    listing, series, missing, bad_kind, bad_buckets = api(main)
+    urls = listing.json()["series"]["url"]
+    assert urls == [{"key": "http://x.test/", "points": 6, "last": store.series["url"]["http://x.test/"].last()}]
+    body = series.json()
+    assert body["bucket_s"] == 10
+    assert sum(p["count"] for p in body["points"]) == 6
+    assert sum(p["errors"] for p in body["points"]) == 1
+    assert missing.status_code == 404
+    assert bad_kind.status_code == 400 and bad_buckets.status_code == 400
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from app import config
+from app.models.models import MonitorTarget
+from app.services.monitor import Monitor
+
+
+def target(id=1, interval=0.05, policy="skip", url="http://m.test/", enabled=True):
+    return SimpleNamespace(id=id, url=url, interval_s=interval, missed_policy=policy, enabled=enabled)
+
+
+def run_monitor(arun, rows, handle, seconds, **kwargs):
+    """Monitor dijalankan `seconds` detik dengan target rows (DB kosong)."""
+    async def main():
+        mon = Monitor(jitter=0, **kwargs)
+        await mon.start(handle)
+        for row in rows:
+            mon.upsert(row)
+        await asyncio.sleep(seconds)
+        states = {i: mon.target_state(i) for i in mon.targets}
+        snap = mon.snapshot()
+        await mon.stop()
+        return mon, states, snap
+    return arun(main())
+
+
+# ======================================
+# JADWAL HEAP
+# ======================================
+
+def test_fixed_rate_schedule(arun):
+    calls = []
+
+    async def handle(url):
+        calls.append(url)
+        return {"status_code": 200, "elapsed_ms": 1}
+
+    _, states, snap = run_monitor(arun, [target(1), target(2, url="http://n.test/")], handle, 0.5)
+    # fase awal acak < 1 interval, lalu tiap 50 ms
+    for url in ("http://m.test/", "http://n.test/"):
+        assert 7 <= calls.count(url) <= 11
+    assert states[1]["last_status"] == 200
+    assert snap["skipped"] == 0 and snap["targets"] == 2
+
+
+def test_slow_check_never_overlaps_and_skips(arun):
+    state = {"now": 0, "max": 0}
+
+    async def handle(url):
+        state["now"] += 1
+        state["max"] = max(state["max"], state["now"])
+        await asyncio.sleep(0.12)
+        state["now"] -= 1
+        return {"status_code": 200}
+
+    _, states, _ = run_monitor(arun, [target(policy="skip")], handle, 0.5)
+    assert state["max"] == 1
+    assert states[1]["skipped"] > 0
+    assert states[1]["owed"] == 0
+
+
+def test_catchup_owes_ticks_up_to_limit(arun):
+    async def handle(url):
+        await asyncio.sleep(0.12)
+        return {"status_code": 200}
+
+    _, states, _ = run_monitor(arun, [target(policy="catchup")], handle, 0.5, max_catchup=2)
+    assert states[1]["skipped"] == 0
+    assert 1 <= states[1]["owed"] <= 2
+    # susulan langsung dijalankan setelah check selesai (tanpa menunggu tick)
+    assert states[1]["checks"] >= 3
+
+
+def test_remove_and_update_drop_stale_heap_entries(arun):
+    calls = []
+
+    async def handle(url):
+        calls.append(url)
+        return {}
+
+    async def main():
+        mon = Monitor(jitter=0)
+        await mon.start(handle)
+        mon.upsert(target(1))
+        mon.upsert(target(2, url="http://lama.test/"))
+        mon.upsert(target(2, url="http://baru.test/"))
+        await asyncio.sleep(0.2)
+        mon.remove(1)
+        n = calls.count("http://m.test/")
+        await asyncio.sleep(0.2)
+        after = calls.count("http://m.test/")
+        await mon.stop()
+        return n, after
+
+    n, after = arun(main())
+    assert n > 0 and after == n
+    assert "http://lama.test/" not in calls
+    assert calls.count("http://baru.test/") >= 5
+
+
+def test_failing_check_is_recorded_and_rescheduled(arun, caplog):
+    async def handle(url):
+        raise RuntimeError("dns gagal")
+
+    with caplog.at_level(logging.ERROR):
+        _, states, snap = run_monitor(arun, [target()], handle, 0.3)
+    assert states[1]["last_error"] == "dns gagal"
+    assert states[1]["checks"] >= 4
+    assert snap["running"] == 0
+
+
+def test_sync_reads_enabled_targets_from_db(db, arun):
+    db.add_all([
+        MonitorTarget(url="http://a.test/", interval_s=60),
+        MonitorTarget(url="http://b.test/", interval_s=60, enabled=False),
+    ])
+    db.commit()
+
+    async def handle(url):
+        return {}
+
+    mon, _, snap = run_monitor(arun, [], handle, 0)
+    assert snap["targets"] == 1 and snap["scheduled"] == 1
+    assert mon.targets == {}    # stop() mengosongkan target
+
+
+# ======================================
+# STARTUP TANPA DRIVER ASYNC
+# ======================================
+
+def test_lifespan_skips_monitor_without_async_driver(db, arun, monkeypatch, caplog):
+    from app import main
+    from app.services.monitor import monitor
+
+    def no_driver():
+        raise ModuleNotFoundError("No module named 'aiomysql'")
+
+    assert config.MONITOR_ENABLED is False
+    monkeypatch.setattr(config, "MONITOR_ENABLED", True)
+    monkeypatch.setattr(config, "AGENT_POLL_ENABLED", False)
+    monkeypatch.setattr(config, "SCAN_JOB_AUTO_RESUME", False)
+    monkeypatch.setattr(main, "get_async_engine", no_driver)
+
+    async def run():
+        async with main.lifespan(main.app):
+            return monitor.snapshot()["enabled"]
+
+    with caplog.at_level(logging.WARNING, logger="app.main"):
+        assert arun(run()) is False
+    assert "Monitor tidak dijalankan" in caplog.text
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+from app.models.models import ScanHistory
+from app.routes import scan as scan_routes
+from app.services.metrics_store import MetricsStore
+from app.services.net_collector import (
+    LinuxBackend, NetworkCollector, default_route, parse_iw_link, pick_backend, run_command,
+)
+
+ROUTE = """Iface\tDestination\tGateway\tFlags\tRefCnt\tUse\tMetric\tMask\tMTU\tWindow\tIRTT
+eth0\t00000000\t0101A8C0\t0003\t0\t0\t600\t00000000\t0\t0\t0
+wlan0\t00000000\t0100000A\t0003\t0\t0\t100\t00000000\t0\t0\t0
+wlan0\t0000000A\t00000000\t0001\t0\t0\t100\t00FFFFFF\t0\t0\t0
+"""
+
+WIRELESS = """Inter-| sta-|   Quality        |   Discarded packets
+ face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22
+ wlan0: 0000   56.  -54.  -256        0      0      0      0      0        0
+"""
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def fake_root(tmp_path):
+    """procfs / sysfs palsu: eth0 (kabel), wlan0 (wireless, default route), lo."""
+    sys_net, proc_net = tmp_path / "sys", tmp_path / "proc"
+    for name, state, speed in [("eth0", "down", "-1"), ("wlan0", "up", None), ("lo", "unknown", None)]:
+        write(f"{sys_net}/{name}/operstate", state)
+        write(f"{sys_net}/{name}/address", "aa:bb:cc:dd:ee:ff")
+        write(f"{sys_net}/{name}/mtu", "1500")
+        if speed:
+            write(f"{sys_net}/{name}/speed", speed)
+    os.makedirs(f"{sys_net}/wlan0/wireless")
+    write(f"{proc_net}/route", ROUTE)
+    write(f"{proc_net}/wireless", WIRELESS)
+    write(f"{proc_net}/if_inet6", "fe800000000000000000000000000001 03 40 20 80 wlan0\n")
+    write(f"{tmp_path}/resolv.conf", "# komentar\nnameserver 1.1.1.1\nnameserver 9.9.9.9\nsearch lan\n")
+    backend = LinuxBackend(sys_net=str(sys_net), proc_net=str(proc_net), resolv_conf=f"{tmp_path}/resolv.conf")
+    backend.iw = None
+    return backend
+
+
+# ======================================
+# BACKEND LINUX (PROCFS / SYSFS)
+# ======================================
+
+def test_linux_backend_reads_files(fake_root):
+    snap = asyncio.run(fake_root.collect())
+    assert [i["name"] for i in snap["interfaces"]] == ["eth0", "wlan0"]
+    eth0, wlan0 = snap["interfaces"]
+    assert eth0["speed_mbps"] is None and eth0["mtu"] == 1500 and not eth0["wireless"]
+    assert wlan0["wireless"] and wlan0["ipv6"] == ["fe80::1"]
+    assert snap["ip"]["gateway"] == "10.0.0.1" and snap["ip"]["interface"] == "wlan0"
+    assert snap["ip"]["dns"] == ["1.1.1.1", "9.9.9.9"]
+    assert snap["wifi"]["state"] == "connected"
+    assert snap["wifi"]["signal_pct"] == 80 and snap["wifi"]["signal_dbm"] == -54
+
+
+def test_default_route_and_iw_parsing():
+    assert default_route(ROUTE) == ("wlan0", "10.0.0.1")
+    assert default_route("header\n") == (None, None)
+    raw = "Connected to 11:22:33:44:55:66 (on wlan0)\n\tSSID: kantor\n\tfreq: 5180.0\n\ttx bitrate: 433.3 MBit/s\n"
+    assert parse_iw_link(raw) == {"ssid": "kantor", "bssid": "11:22:33:44:55:66",
+                                  "freq_mhz": 5180, "tx_bitrate": "433.3 MBit/s"}
+    assert parse_iw_link("Not connected.") == {}
+
+
+def test_pick_backend():
+    assert pick_backend("linux").name == "linux"
+    with pytest.raises(ValueError):
+        pick_backend("solaris")
+
+
+# ======================================
+# COMMAND DENGAN TIMEOUT
+# ======================================
+
+def test_run_command_output_and_timeout():
+    async def main():
+        out = await run_command(sys.executable, "-c", "print('halo')")
+        with pytest.raises(TimeoutError):
+            await run_command(sys.executable, "-c", "import time; time.sleep(10)", timeout=0.2)
+        return out
+
+    assert asyncio.run(main()).strip() == "halo"
+
+
+# ======================================
+# CACHE + SINGLE-FLIGHT
+# ======================================
+
+class SlowBackend:
+    name = "fake"
+
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    async def collect(self):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if self.fail:
+            raise OSError("tidak bisa baca")
+        return {"wifi": {"signal_pct": 60}, "ip": {"ipv4": "10.0.0.5", "gateway": None, "interface": "x", "dns": []},
+                "interfaces": []}
+
+
+def test_concurrent_requests_share_one_collection():
+    backend = SlowBackend()
+    collector = NetworkCollector(backend=backend, ttl=60)
+
+    async def main():
+        first = await asyncio.gather(*[collector.collect() for _ in range(5)])
+        again = await collector.collect()
+        return first, again
+
+    first, again = asyncio.run(main())
+    assert backend.calls == 1
+    assert [fresh for _, fresh in first] == [True, False, False, False, False]
+    assert again[1] is False and again[0]["platform"] == "fake"
+    assert collector.snapshot()["hits"] == 5
+
+
+def test_failed_collection_is_not_cached():
+    backend = SlowBackend(fail=True)
+    collector = NetworkCollector(backend=backend, ttl=60)
+
+    async def main():
+        results = await asyncio.gather(collector.collect(), collector.collect(), return_exceptions=True)
+        backend.fail = False
+        return results, await collector.collect()
+
+    results, retry = asyncio.run(main())
+    assert all(isinstance(r, OSError) for r in results)
+    assert retry[1] is True and backend.calls == 2
+
+
+def test_network_route_stores_fresh_snapshot_once(api, db, monkeypatch):
+    monkeypatch.setattr(scan_routes, "net_collector", NetworkCollector(backend=SlowBackend(), ttl=60))
+    monkeypatch.setattr(scan_routes, "metrics_store", MetricsStore(ring_size=8))
+
+    async def main(client):
+        return await asyncio.gather(client.get("/scan/network"), client.get("/scan/network"))
+
+    bodies = [r.json() for r in api(main)]
+    assert all(b["ok"] for b in bodies)
+    assert sorted(b["cached"] for b in bodies) == [False, True]
+    assert db.query(ScanHistory).filter_by(source="network").count() == 1
+    assert scan_routes.metrics_store.series["signal"]["local"].count == 1
+
+
+def test_network_route_reports_backend_error(api, monkeypatch):
+    monkeypatch.setattr(scan_routes, "net_collector", NetworkCollector(backend=SlowBackend(fail=True)))
+
+    async def main(client):
+        return (await client.get("/scan/network")).json()
+
+    assert api(main) == {"ok": False, "error": "tidak bisa baca"}
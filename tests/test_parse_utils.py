@@ -0,0 +1,58 @@
+import glob
+import json
+import os
+
+import pytest
+
+from app.utils.parse_utils import (
+    parse_ipconfig,
+    parse_ipconfig_adapters,
+    parse_netsh_all,
+    parse_netsh_interfaces,
+)
+
+# ======================================
+# FIXTURE OUTPUT netsh / ipconfig
+# ======================================
+# bench/fixtures/network/<nama>.txt = output asli command,
+# <nama>.json = hasil parse yang diharapkan (sama dengan bench_parse_utils)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "bench", "fixtures", "network")
+NAMES = sorted(os.path.basename(p)[:-4] for p in glob.glob(os.path.join(FIXTURES, "*.txt")))
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name + ".txt")) as f:
+        raw = f.read()
+    with open(os.path.join(FIXTURES, name + ".json")) as f:
+        return raw, json.load(f)
+
+
+def test_fixtures_present():
+    assert {"ipconfig_multi", "ipconfig_static", "netsh_legacy", "netsh_nowlan", "netsh_two"} <= set(NAMES)
+
+
+@pytest.mark.parametrize("name", [n for n in NAMES if n.startswith("netsh")])
+def test_netsh_fixture(name):
+    raw, expected = load(name)
+    assert json.loads(json.dumps(parse_netsh_all(raw))) == expected["interfaces"]
+    assert json.loads(json.dumps(parse_netsh_interfaces(raw))) == expected["primary"]
+
+
+@pytest.mark.parametrize("name", [n for n in NAMES if n.startswith("ipconfig")])
+def test_ipconfig_fixture(name):
+    raw, expected = load(name)
+    assert json.loads(json.dumps(parse_ipconfig_adapters(raw))) == expected["adapters"]
+    assert json.loads(json.dumps(parse_ipconfig(raw))) == expected["summary"]
+
+
+def test_empty_output():
+    assert parse_netsh_all("") == []
+    assert parse_netsh_interfaces("")["ssid"] is None
+    assert parse_ipconfig_adapters("") == []
+    assert parse_ipconfig("")["ipv4"] is None
+
+
+def test_crlf_output_matches_lf():
+    raw, expected = load("netsh_two")
+    assert json.loads(json.dumps(parse_netsh_all(raw.replace("\n", "\r\n")))) == expected["interfaces"]
@@ -0,0 +1,108 @@
+import json
+
+from app.models.models import ScanHistory, ScanPayload
+from app.services import payload_store as store_mod
+from app.services.payload_store import PayloadStore, dns_payload, encode_payload
+
+DNS = ("example.test", ["www.example.test"], ["10.0.0.2", "10.0.0.1"])
+
+
+def test_round_robin_dns_hashes_the_same():
+    rotated = ("example.test", ["www.example.test"], ["10.0.0.1", "10.0.0.2"])
+    assert encode_payload(dns_payload(DNS)) == encode_payload(dns_payload(rotated))
+    assert dns_payload(None) is None
+
+
+# ======================================
+# TULIS: SATU BARIS PER ISI
+# ======================================
+
+def test_prepare_and_intern_store_each_payload_once(db):
+    store = PayloadStore()
+    rows = [
+        {"url": "http://a.test/", "payload": dns_payload(DNS)},
+        {"url": "http://b.test/", "payload": dns_payload(DNS)},
+        {"url": "http://c.test/", "payload": None},
+        {"url": "http://d.test/"},
+    ]
+    payloads = store.prepare_rows(rows)
+    assert len(payloads) == 1
+    assert rows[0]["payload_hash"] == rows[1]["payload_hash"]
+    assert all("payload" not in r for r in rows)
+    assert "payload_hash" not in rows[2] and "payload_hash" not in rows[3]
+
+    store.intern(db, payloads)
+    store.intern(db, payloads)              # hash sudah di cache -> tanpa query
+    assert db.query(ScanPayload).count() == 1
+    assert (store.stored, store.reused) == (1, 1)
+    body = db.query(ScanPayload).one().body
+    assert json.loads(body) == ["example.test", ["www.example.test"], ["10.0.0.1", "10.0.0.2"]]
+
+
+def test_intern_survives_insert_race_with_other_process(db, monkeypatch):
+    h, text = encode_payload({"x": 1})
+    PayloadStore().intern(db, {h: text})
+
+    # proses lain: cache kosong, dan SELECT-nya terjadi sebelum insert di atas terlihat
+    calls = []
+    real = store_mod.existing_scan_payload_hashes
+
+    def existing(db, hashes):
+        calls.append(hashes)
+        return set() if len(calls) == 1 else real(db, hashes)
+
+    monkeypatch.setattr(store_mod, "existing_scan_payload_hashes", existing)
+    other = PayloadStore()
+    other.intern(db, {h: text})
+    assert len(calls) == 2                  # IntegrityError -> cek ulang
+    assert db.query(ScanPayload).count() == 1
+    assert (other.stored, other.reused) == (0, 1)
+
+
+def test_cache_is_bounded(db):
+    store = PayloadStore(cache_size=2)
+    for i in range(4):
+        store.intern(db, dict([encode_payload(i)]))
+    assert store.snapshot()["cached_hashes"] == 2
+
+
+# ======================================
+# MIGRASI KOLOM DNS LAMA
+# ======================================
+
+def test_migrate_legacy_dns_rows_in_chunks(db):
+    raw = json.dumps(["a.test", [], ["10.0.0.1"]])
+    for i, dns in enumerate([raw, raw, "bukan json", None]):
+        db.add(ScanHistory(url=f"http://m{i}.test/", dns=dns))
+    db.commit()
+    store = PayloadStore()
+
+    last_id, n = store.migrate_chunk(0, chunk=2)
+    assert n == 2
+    assert store.migrate_chunk(last_id, chunk=2)[1] == 1
+    assert store.migrate_chunk(0, chunk=2) == (0, 0)   # tidak ada sisa
+
+    db.expire_all()
+    rows = db.query(ScanHistory).order_by(ScanHistory.id).all()
+    assert all(r.dns is None for r in rows)
+    assert rows[0].payload_hash == rows[1].payload_hash == encode_payload(json.loads(raw))[0]
+    assert rows[2].payload_hash is not None and rows[3].payload_hash is None
+    bodies = {p.hash: p.body for p in db.query(ScanPayload)}
+    assert bodies[rows[2].payload_hash] == "bukan json"
+    assert store.migrated == 3
+
+
+def test_history_reads_dns_from_payload_and_legacy_column(api, db):
+    store = PayloadStore()
+    rows = [{"payload": dns_payload(DNS)}]
+    store.intern(db, store.prepare_rows(rows))
+    db.add(ScanHistory(url="http://baru.test/", payload_hash=rows[0]["payload_hash"]))
+    db.add(ScanHistory(url="http://lama.test/", dns='["lama"]'))
+    db.commit()
+
+    async def main(client):
+        return (await client.get("/scan/history?fields=url,dns")).json()["rows"]
+
+    got = {r["url"]: r["dns"] for r in api(main)}
+    assert json.loads(got["http://baru.test/"]) == dns_payload(DNS)
+    assert got["http://lama.test/"] == '["lama"]'
@@ -0,0 +1,182 @@
+import asyncio
+import errno
+import socket
+
+import pytest
+
+from app import config
+from app.models.models import OpenPort
+from app.services import port_scanner as scanner_mod
+from app.services.port_scanner import port_scanner, parse_ports, parse_targets, host_count
+
+ADMIN = {"x-admin-token": "rahasia"}
+
+
+@pytest.fixture
+def admin(monkeypatch):
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "rahasia")
+
+
+@pytest.fixture
+def listener():
+    """Satu port open + satu port closed di 127.0.0.1."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(16)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        closed = s.getsockname()[1]
+    yield srv.getsockname()[1], closed
+    srv.close()
+
+
+def run_ports(api, fn):
+    async def main(client):
+        try:
+            return await fn(client)
+        finally:
+            await port_scanner.stop()
+            port_scanner.scans.clear()
+    return api(main)
+
+
+# ======================================
+# TARGET & PORT
+# ======================================
+
+def test_parse_targets_and_ports():
+    assert parse_ports("22, 80,8000-8002,80") == (22, 80, 8000, 8001, 8002)
+    assert parse_ports([443, "22"]) == (22, 443)
+    assert host_count(parse_targets("10.0.0.0/24, 10.0.1.1/31 router.lan")) == 254 + 2 + 1
+    for bad in ("0", "70000", "a-b", ""):
+        with pytest.raises(ValueError):
+            parse_ports(bad)
+    with pytest.raises(ValueError):
+        parse_targets("bad/host")
+
+
+# ======================================
+# /scan/ports: KHUSUS ADMIN + BATAS PROBE
+# ======================================
+
+def test_ports_require_admin_token(api, db, listener):
+    async def main(client):
+        body = {"targets": "127.0.0.1", "ports": [listener[0]]}
+        return [
+            await client.post("/scan/ports", json=body),
+            await client.post("/scan/ports", json=body, headers={"x-admin-token": ""}),
+            await client.get("/scan/ports"),
+            await client.get("/scan/ports/open"),
+            await client.post("/scan/ports/abc/cancel"),
+        ]
+
+    # ADMIN_TOKEN kosong (default) = port scan mati untuk semua orang
+    assert [r.status_code for r in run_ports(api, main)] == [403] * 5
+    assert port_scanner.scans == {}
+
+
+def test_ports_wrong_token_rejected(api, db, admin):
+    async def main(client):
+        return [await client.post("/scan/ports", json={"targets": "127.0.0.1"},
+                                  headers={"x-admin-token": token})
+                for token in ("salah", "rahasia ", "é".encode("latin-1"))]
+
+    assert [r.status_code for r in run_ports(api, main)] == [403] * 3
+
+
+def test_ports_probe_cap(api, db, admin):
+    async def main(client):
+        return await client.post("/scan/ports", json={"targets": "10.0.0.0/16", "ports": "1-1000"},
+                                 headers=ADMIN)
+
+    r = run_ports(api, main)
+    assert r.status_code == 400
+    assert "Terlalu banyak probe" in r.json()["detail"]
+    assert port_scanner.scans == {}
+
+
+def test_ports_scan_finds_open_port(api, db, admin, listener):
+    open_port, closed_port = listener
+
+    async def main(client):
+        r = await client.post("/scan/ports", json={"targets": "127.0.0.1", "ports": [open_port, closed_port],
+                                                  "timeout": 0.5}, headers=ADMIN)
+        stored = await client.get("/scan/ports/open", headers=ADMIN)
+        return r, stored
+
+    r, stored = run_ports(api, main)
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["scan"]["status"] == "done"
+    assert body["scan"]["open"] == 1 and body["scan"]["closed"] == 1
+    assert [o["port"] for o in body["open"]] == [open_port]
+    assert [o["port"] for o in stored.json()["open"]] == [open_port]
+    assert db.query(OpenPort).count() == 1
+
+
+def test_ports_background_cancel(api, db, admin, listener):
+    async def main(client):
+        r = await client.post("/scan/ports?background=true", headers=ADMIN, json={
+            "targets": "127.0.0.1", "ports": "1-2000", "rate_per_host": 20, "timeout": 0.2})
+        scan_id = r.json()["scan_id"]
+        await asyncio.sleep(0.2)
+        cancelled = await client.post(f"/scan/ports/{scan_id}/cancel", headers=ADMIN)
+        progress = await client.get(f"/scan/ports/{scan_id}", headers=ADMIN)
+        return cancelled, progress
+
+    cancelled, progress = run_ports(api, main)
+    assert cancelled.status_code == 200
+    scan = progress.json()["scan"]
+    assert scan["status"] == "cancelled"
+    assert 0 < scan["probed"] < scan["total"]
+
+
+async def collect(events):
+    return [e async for e in events]
+
+
+def test_ports_cancel_before_start(arun, listener):
+    async def main():
+        scan = port_scanner.launch(port_scanner.create("127.0.0.1", [listener[0]]), attach=True)
+        # belum sempat jalan sama sekali
+        assert await port_scanner.cancel(scan.id)
+        events = await asyncio.wait_for(collect(scan.events()), 2)
+        port_scanner.scans.clear()
+        return scan, events
+
+    scan, events = arun(main())
+    assert scan.status == "cancelled" and scan.finished_at is not None
+    assert events == []
+
+
+def test_fd_exhaustion_lowers_concurrency_and_retries(arun, listener, monkeypatch):
+    real = socket.socket
+    calls = []
+
+    def limited(*args):
+        if args:                    # socket probe (bukan cek jenis loop)
+            calls.append(args)
+        if args and len(calls) <= 3:
+            raise OSError(errno.EMFILE, "Too many open files")
+        return real(*args)
+
+    monkeypatch.setattr(scanner_mod, "FD_BACKOFF", 0.001)
+
+    async def main():
+        scan = port_scanner.create("127.0.0.1 127.0.0.2 127.0.0.3", list(listener), concurrency=4,
+                                   rate_per_host=0)
+        # dipasang setelah loop jalan: loop sendiri juga butuh socket.socket
+        monkeypatch.setattr(scanner_mod.socket, "socket", limited)
+        try:
+            port_scanner.launch(scan)
+            await scan.task
+        finally:
+            monkeypatch.setattr(scanner_mod.socket, "socket", real)
+            port_scanner.scans.clear()
+        return scan
+
+    scan = arun(main())
+    assert scan.status == "done"
+    assert scan.errors == 0 and scan.probed == 6
+    assert scan.open == 1 and scan.closed == 5
+    assert scan.progress()["concurrency"] == 1
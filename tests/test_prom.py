@@ -0,0 +1,146 @@
+import json
+import os
+import subprocess
+import sys
+
+import httpx
+from fastapi import FastAPI
+
+from app.routes import metrics as metrics_routes
+from app.routes.scan import WEB_RESULTS, classify_web, summarize_web, save_web_result
+from app.services.prom import Counter, Gauge, Histogram, Registry, SCAN_RESULTS
+from app.services.scan_writer import scan_writer
+
+
+def dead_pid():
+    p = subprocess.Popen([sys.executable, "-c", "pass"])
+    p.wait()
+    return p.pid
+
+
+def make_registry(tmp=None):
+    reg = Registry(multiproc_dir=tmp, flush_interval=60)
+    hits = Counter("t_hits_total", "Hit", ("kind",), registry=reg)
+    live = Gauge("t_live", "Live", registry=reg)
+    lat = Histogram("t_latency_seconds", "Latency", buckets=(0.1, 1.0), registry=reg)
+    return reg, hits, live, lat
+
+
+# ======================================
+# EXPOSITION
+# ======================================
+
+def test_render_openmetrics_and_text():
+    reg, hits, live, lat = make_registry()
+    hits.labels("a").inc(2)
+    live.set(3)
+    lat.observe(0.05)
+    lat.observe(0.5)
+    lat.observe(7)
+
+    om = reg.render(openmetrics=True)
+    assert "# TYPE t_hits counter" in om
+    assert 't_hits_total{kind="a"} 2' in om
+    assert 't_latency_seconds_bucket{le="0.1"} 1' in om
+    assert 't_latency_seconds_bucket{le="1"} 2' in om
+    assert 't_latency_seconds_bucket{le="+Inf"} 3' in om
+    assert "t_latency_seconds_count 3" in om
+    assert "t_live 3" in om
+    assert om.endswith("# EOF\n")
+
+    text = reg.render(openmetrics=False)
+    assert "# TYPE t_hits_total counter" in text
+    assert "# EOF" not in text
+
+
+def test_gauge_callback_errors_do_not_break_scrape():
+    reg = Registry(multiproc_dir=None)
+    Gauge("t_bad", "Rusak", fn=lambda: 1 / 0, registry=reg)
+    Gauge("t_by_status", "Per status", ("status",), fn=lambda: {"ok": 2}, registry=reg)
+    out = reg.render()
+    assert "# TYPE t_bad gauge" in out
+    assert 't_by_status{status="ok"} 2' in out
+
+
+# ======================================
+# MULTI-PROCESS
+# ======================================
+
+def test_multiprocess_merge_keeps_dead_counters_drops_dead_gauges(tmp_dir, arun):
+    d = os.path.join(tmp_dir, "prom")
+    reg, hits, live, lat = make_registry(d)
+    hits.labels("a").inc()
+    live.set(1)
+
+    async def flush():
+        await reg.start()
+        await reg.stop()
+    arun(flush())
+
+    # snapshot dari worker lain yang sudah mati
+    other = {"pid": dead_pid(), "metrics": {
+        "t_hits_total": [[["a"], 4.0], [["b"], 1.0]],
+        "t_live": [[[], 9.0]],
+        "t_latency_seconds": [[[], [1, 0, 0, 0.05]]],
+    }}
+    with open(os.path.join(d, "metrics_1.json"), "w") as f:
+        json.dump(other, f)
+    with open(os.path.join(d, "metrics_2.json"), "w") as f:
+        f.write("{rusak")
+
+    out = reg.render()
+    assert 't_hits_total{kind="a"} 5' in out
+    assert 't_hits_total{kind="b"} 1' in out
+    assert "t_live 1" in out
+    assert "t_latency_seconds_count 1" in out
+
+
+# ======================================
+# KATEGORI HASIL SCAN
+# ======================================
+
+def test_classify_and_summarize_share_categories():
+    slow = {"status_code": 200, "elapsed_ms": 700, "timing": {"dns_ms": 0, "ttfb_ms": 600}}
+    assert classify_web(slow) == "slow"
+    assert summarize_web(slow).startswith("Website lambat (")
+    assert summarize_web({"error": "x", "error_type": "ReadTimeout"}) == WEB_RESULTS["read_timeout"][1]
+    assert WEB_RESULTS[classify_web({"error": "getaddrinfo failed"})][0] == "dns"
+    assert classify_web({"status_code": 304, "elapsed_ms": 10}) == "fast"
+    assert classify_web({"status_code": None}) == "no_response"
+    assert {label for label, _ in WEB_RESULTS.values()} == {
+        "timeout", "dns", "connect_error", "no_response", "fast", "slow", "very_slow",
+        "redirect", "client_error", "server_error", "unknown"}
+
+
+def test_save_web_result_counts_category(db, arun):
+    res = {"url": "http://lambat.test/", "status_code": 503, "elapsed_ms": 20, "content_length": 0,
+           "truncated": False, "content_hash": None, "content_changed": None, "dns": None,
+           "error": None, "error_type": None, "timing": {}}
+    before = SCAN_RESULTS.labels("test", "server_error").get()
+
+    async def main():
+        try:
+            return await save_web_result(res, "test")
+        finally:
+            await scan_writer.stop()
+
+    _, summary = arun(main())
+    assert summary == "Server error (5xx)"
+    assert SCAN_RESULTS.labels("test", "server_error").get() == before + 1
+
+
+def test_metrics_route_negotiates_format(arun):
+    async def main():
+        app = FastAPI()
+        app.include_router(metrics_routes.router)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            om = await client.get("/metrics", headers={"accept": "application/openmetrics-text"})
+            text = await client.get("/metrics")
+        return om, text
+
+    om, text = arun(main())
+    assert om.headers["content-type"].startswith("application/openmetrics-text")
+    assert om.text.endswith("# EOF\n")
+    assert "scanner_ws_clients 0" in om.text
+    assert text.headers["content-type"].startswith("text/plain; version=0.0.4")
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.db.database import AsyncSessionLocal
+from app.models.models import ScanRollup
+from app.services import rollups
+from app.services.rollups import apply_rollups, plan_window, window_stats
+
+T0 = datetime(2026, 3, 1, 10, 15, 30)
+
+
+def rec(url="http://a.test/", status=200, latency=100, error=None, at=T0):
+    return SimpleNamespace(url=url, status_code=status, latency_ms=latency, error=error, created_at=at)
+
+
+def row(db, res="1h"):
+    return db.query(ScanRollup).filter_by(url="http://a.test/", resolution=res).one()
+
+
+def test_batches_merge_into_same_bucket(db):
+    apply_rollups(db, [rec(latency=100), rec(status=503, latency=300)])
+    apply_rollups(db, [rec(latency=50), rec(error="timeout", latency=None)])
+    r = row(db)
+    assert (r.count, r.error_count, r.status_2xx, r.status_5xx) == (4, 1, 2, 1)
+    assert (r.latency_min, r.latency_max, r.latency_sum) == (50, 300, 450)
+    assert rollups.Rollup.from_row(r).sketch.count == 3
+    # satu baris per resolusi
+    assert db.query(ScanRollup).count() == 3
+
+
+def test_non_http_rows_are_skipped(db):
+    assert apply_rollups(db, [rec(url="agent:pc-1")]) == 0
+    assert db.query(ScanRollup).count() == 0
+
+
+def test_existing_rows_are_locked_for_update(db, monkeypatch):
+    calls = []
+    real = rollups.get_scan_rollups
+
+    def spy(session, keys, **kwargs):
+        calls.append(kwargs)
+        return real(session, keys, **kwargs)
+
+    monkeypatch.setattr(rollups, "get_scan_rollups", spy)
+    apply_rollups(db, [rec()])
+    assert calls == [{"for_update": True}]
+
+
+def test_insert_race_is_retried(db, monkeypatch):
+    real = rollups._merge
+    attempts = []
+
+    def flaky(session, pending):
+        attempts.append(1)
+        if len(attempts) == 1:
+            # proses lain membuat bucket yang sama lebih dulu
+            real(session, rollups.aggregate([rec(latency=10)]))
+            raise IntegrityError("insert", {}, Exception("duplicate"))
+        return real(session, pending)
+
+    monkeypatch.setattr(rollups, "_merge", flaky)
+    apply_rollups(db, [rec(latency=100)])
+    r = row(db)
+    assert len(attempts) == 2
+    assert (r.count, r.latency_sum) == (2, 110)
+
+
+def test_gives_up_after_retries(db, monkeypatch):
+    def always(session, pending):
+        raise IntegrityError("insert", {}, Exception("duplicate"))
+
+    monkeypatch.setattr(rollups, "_merge", always)
+    with pytest.raises(IntegrityError):
+        apply_rollups(db, [rec()])
+
+
+def test_plan_window_covers_range_without_gaps():
+    since, until = datetime(2026, 3, 1, 9, 59, 30), datetime(2026, 3, 3, 0, 2)
+    parts = sorted(plan_window(since, until), key=lambda p: p[1])
+    assert parts[0][1] <= since and parts[-1][2] == until
+    for (_, _, end), (_, start, _) in zip(parts, parts[1:]):
+        assert end == start
+    assert "1d" in {p[0] for p in parts}
+
+
+def test_window_stats_reads_rollups(db, arun):
+    apply_rollups(db, [rec(latency=100), rec(latency=200, at=T0 + timedelta(hours=2)), rec(status=500)])
+
+    async def main():
+        async with AsyncSessionLocal() as adb:
+            return await window_stats(adb, "http://a.test/", T0 - timedelta(hours=1), T0 + timedelta(hours=5))
+
+    stats = arun(main())
+    assert stats["count"] == 3
+    assert stats["latency"]["min"] == 100 and stats["latency"]["max"] == 200
+    assert stats["uptime"] == pytest.approx(66.667, abs=0.01)
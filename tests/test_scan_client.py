@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.routes import scan as scan_routes
+from app.services.dns_resolver import DnsResolver
+from app.services.scan_client import ScanClient, PhaseTracer, read_bounded
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"     # keep-alive
+    body = b"x" * 100_000
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def _send(self, code, body=b"", length=True):
+        self.send_response(code)
+        if length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        self.server.hits.append((self.command, self.path))
+        self.server.hosts.append(self.headers.get("Host"))
+        if self.path == "/slow":
+            time.sleep(0.2)
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            if self.path.startswith("/wait"):
+                time.sleep(0.05)
+            self._send(200, self.body if self.path == "/big" else b"ok")
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    srv.daemon_threads = True
+    srv.connections = 0
+    srv.active = srv.max_active = 0
+    srv.hits = []
+    srv.hosts = []
+    srv.lock = threading.Lock()
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield srv, f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """ScanClient baru untuk do_http_scan (singleton tidak tersentuh)."""
+    c = ScanClient(max_per_host=0, http2=False)
+    monkeypatch.setattr(scan_routes, "scan_client", c)
+    return c
+
+
+def scan(client, *urls, **kwargs):
+    async def main():
+        try:
+            return [await scan_routes.do_http_scan(u, conditional=False, **kwargs) for u in urls]
+        finally:
+            await client.stop()
+            await scan_routes.scan_client.resolver.stop()
+    return asyncio.run(main())
+
+
+# ======================================
+# CLIENT BERSAMA (KEEP-ALIVE)
+# ======================================
+
+def test_scans_reuse_pooled_connection(server, client):
+    srv, base = server
+    results = scan(client, f"{base}/a", f"{base}/b", f"{base}/c", head_first=False)
+    assert [r["status_code"] for r in results] == [200] * 3
+    assert srv.connections == 1
+
+
+def test_per_host_slot_limits_concurrency(server, monkeypatch):
+    srv, base = server
+    c = ScanClient(max_per_host=2, http2=False)
+    monkeypatch.setattr(scan_routes, "scan_client", c)
+
+    async def main():
+        try:
+            return await asyncio.gather(*[
+                scan_routes.do_http_scan(f"{base}/wait{i}", conditional=False, head_first=False)
+                for i in range(6)])
+        finally:
+            await c.stop()
+            await scan_routes.scan_client.resolver.stop()
+
+    results = asyncio.run(main())
+    assert all(r["status_code"] == 200 for r in results)
+    assert srv.max_active == 2
+    assert c._host_slots == {}      # slot host dibuang setelah tidak dipakai
+
+
+def test_connection_error_is_reported(client):
+    # port 1 di localhost: ditolak
+    res = scan(client, "http://127.0.0.1:1/", head_first=False)[0]
+    assert res["status_code"] is None
+    assert res["error_type"] == "ConnectError"
+    assert res["elapsed_ms"] is None
+
+
+# ======================================
+# BODY TERBATAS
+# ======================================
+
+def test_read_bounded_counts_hashes_and_truncates():
+    async def main(max_bytes, hash_body=True):
+        r = httpx.Response(200, stream=httpx.ByteStream(b"a" * 5000))
+        return await read_bounded(r, max_bytes, hash_body)
+
+    assert asyncio.run(main(0)) == (5000, False, hashlib.blake2b(b"a" * 5000, digest_size=16).hexdigest())
+    assert asyncio.run(main(1000)) == (1000, True, hashlib.blake2b(b"a" * 1000, digest_size=16).hexdigest())
+    assert asyncio.run(main(5000, hash_body=False)) == (5000, False, None)
+
+
+def test_scan_stops_download_at_cap(server, client):
+    srv, base = server
+    res = scan(client, f"{base}/big", head_first=False, max_body=4096)[0]
+    assert res["status_code"] == 200
+    assert res["content_length"] == 4096 and res["truncated"] is True
+    assert res["content_hash"] is not None
+
+
+def test_head_first_skips_body_when_length_known(server, client):
+    srv, base = server
+    res = scan(client, f"{base}/big", head_first=True)[0]
+    assert res["content_length"] == 100_000 and res["truncated"] is False
+    assert srv.hits == [("HEAD", "/big")]
+
+
+# ======================================
+# WAKTU PER FASE
+# ======================================
+
+def test_phase_timings_new_then_reused_connection(server, client):
+    srv, base = server
+    first, second = scan(client, f"{base}/slow", f"{base}/big", head_first=False)
+
+    t = first["timing"]
+    assert t["dns_ms"] is not None and t["connect_ms"] is not None
+    assert t["tls_ms"] is None                  # http biasa
+    assert t["ttfb_ms"] >= 200                  # server tidur 200 ms sebelum header
+    assert t["download_ms"] is not None
+    assert first["elapsed_ms"] >= t["ttfb_ms"]
+
+    # koneksi keep-alive dipakai ulang -> tidak ada connect
+    assert second["timing"]["connect_ms"] is None
+    assert second["timing"]["ttfb_ms"] is not None
+
+
+def test_phase_tracer_sums_hops():
+    tracer = PhaseTracer()
+
+    async def main():
+        for _ in range(2):
+            await tracer("connection.connect_tcp.started", {})
+            await tracer("connection.connect_tcp.complete", {})
+            await tracer("http11.send_request_headers.started", {})
+            await tracer("http11.receive_response_headers.complete", {})
+
+    asyncio.run(main())
+    assert tracer.hops == 2
+    assert tracer.connect_ms is not None and tracer.ttfb_ms is not None
+    assert tracer.tls_ms is None
+
+
+# ======================================
+# CONNECT KE IP DARI CACHE RESOLVER
+# ======================================
+
+def test_connect_uses_resolver_cache_and_keeps_host(server, monkeypatch):
+    srv, base = server
+    port = srv.server_address[1]
+    lookups = []
+
+    def gethostbyname_ex(host):
+        lookups.append(host)
+        if host == "mati.test":
+            raise socket.gaierror("tidak ada")
+        return host, [], ["127.0.0.1"]
+
+    def getaddrinfo(host, *args, **kwargs):
+        raise AssertionError(f"lookup kedua di connect: {host}")
+
+    monkeypatch.setattr(socket, "gethostbyname_ex", gethostbyname_ex)
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    c = ScanClient(max_per_host=0, http2=False, resolver=DnsResolver(ttl=60))
+    monkeypatch.setattr(scan_routes, "scan_client", c)
+
+    ok, dead = scan(c, f"http://scan.test:{port}/a", f"http://mati.test:{port}/", head_first=False)
+    assert ok["status_code"] == 200 and ok["dns"][2] == ["127.0.0.1"]
+    assert ok["timing"]["dns_ms"] is not None and ok["timing"]["connect_ms"] is not None
+    assert srv.hosts == [f"scan.test:{port}"]
+    assert lookups == ["scan.test", "mati.test"]     # sekali per host, dipakai connect juga
+    assert dead["error_type"] == "ConnectError" and "mati.test" in dead["error"]
@@ -0,0 +1,200 @@
+import asyncio
+
+import pytest
+
+from app.routes import scan as scan_routes
+from app.services.scan_dedup import ScanDedup, PROBE, COALESCED, CACHED
+from app.services.scan_jobs import JobManager
+
+
+# ======================================
+# SINGLE-FLIGHT + CACHE
+# ======================================
+
+def test_concurrent_callers_share_one_probe():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        dedup = ScanDedup(ttl=60)
+        out = await asyncio.gather(*[dedup.run("http://Example.com/", fn) for _ in range(5)])
+        cached = await dedup.run("example.com", fn)
+        return out, cached
+
+    out, cached = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(how for _, how in out) == [COALESCED] * 4 + [PROBE]
+    assert cached == ("ok", CACHED)
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        raise RuntimeError("boom")
+
+    async def main():
+        dedup = ScanDedup(ttl=60)
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await dedup.run("http://a", fn)
+
+    asyncio.run(main())
+    assert len(calls) == 2
+
+
+def test_one_waiter_cancel_keeps_probe_for_others():
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        dedup = ScanDedup(ttl=0)
+        first = asyncio.create_task(dedup.run("http://a", fn))
+        second = asyncio.create_task(dedup.run("http://a", fn))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == ("ok", COALESCED)
+
+
+def test_last_waiter_cancel_cancels_probe():
+    state = {}
+
+    async def fn():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            state["cancelled"] = True
+            raise
+
+    async def main():
+        dedup = ScanDedup(ttl=0)
+        callers = [asyncio.create_task(dedup.run("http://a", fn)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        for c in callers:
+            c.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return dedup.snapshot()
+
+    snap = asyncio.run(main())
+    assert state.get("cancelled")
+    assert snap["inflight"] == 0
+
+
+# ======================================
+# BULK JOB: CANCEL MEMBATALKAN PROBE
+# ======================================
+
+@pytest.fixture
+def fake_scan(monkeypatch):
+    state = {"started": 0, "cancelled": 0, "saved": []}
+
+    async def do_http_scan(url, **kwargs):
+        state["started"] += 1
+        try:
+            await asyncio.sleep(0.5)
+        except asyncio.CancelledError:
+            state["cancelled"] += 1
+            raise
+        return {"url": url, "elapsed_ms": 1, "status_code": 200, "error": None, "error_type": None}
+
+    async def save_web_result(res, source):
+        state["saved"].append(res["url"])
+
+        class Rec:
+            id = len(state["saved"])
+        return Rec(), "Website cepat"
+
+    async def no_prefetch(batch):
+        pass
+
+    monkeypatch.setattr(scan_routes, "do_http_scan", do_http_scan)
+    monkeypatch.setattr(scan_routes, "save_web_result", save_web_result)
+    monkeypatch.setattr(JobManager, "_prefetch", staticmethod(no_prefetch))
+    return state
+
+
+def test_bulk_cancel_cancels_inflight_probes(db, tmp_dir, fake_scan):
+    async def main():
+        jobs = JobManager(job_dir=f"{tmp_dir}/jobs", inflight=50)
+        job_id, path = jobs.new_input_path()
+        with open(path, "w") as f:
+            # duplikat ikut menunggu probe pertama
+            f.write("\n".join(f"http://slow{i % 20}.test/" for i in range(40)))
+        job = await jobs.submit(job_id, path, scan_routes.make_bulk_worker())
+        await asyncio.sleep(0.2)
+        assert await jobs.cancel(job_id)
+        # probe yatim (kalau ada) sempat selesai & tersimpan di sini
+        await asyncio.sleep(0.6)
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "cancelled"
+    assert fake_scan["started"] > 0
+    assert fake_scan["cancelled"] == fake_scan["started"]
+    assert fake_scan["saved"] == []
+
+
+def test_bulk_duplicates_probe_once(db, tmp_dir, fake_scan, monkeypatch):
+    async def fast(url, **kwargs):
+        fake_scan["started"] += 1
+        await asyncio.sleep(0.01)
+        return {"url": url, "elapsed_ms": 1, "status_code": 200, "error": None, "error_type": None}
+
+    monkeypatch.setattr(scan_routes, "do_http_scan", fast)
+
+    async def main():
+        jobs = JobManager(job_dir=f"{tmp_dir}/jobs", inflight=8)
+        job_id, path = jobs.new_input_path()
+        with open(path, "w") as f:
+            f.write("\n".join(["http://a.test/", "http://b.test/", "http://A.test/"] * 3))
+        job = await jobs.submit(job_id, path, scan_routes.make_bulk_worker())
+        await job.task
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "done" and job.done == 9
+    assert fake_scan["started"] == 2
+
+
+def test_bulk_save_error_fails_url_not_job(db, tmp_dir, fake_scan, monkeypatch):
+    async def fast(url, **kwargs):
+        return {"url": url, "elapsed_ms": 1, "status_code": 200, "error": None, "error_type": None}
+
+    async def flaky_save(res, source):
+        if "b.test" in res["url"]:
+            raise RuntimeError("writer ditutup")
+        fake_scan["saved"].append(res["url"])
+
+        class Rec:
+            id = len(fake_scan["saved"])
+        return Rec(), "Website cepat"
+
+    monkeypatch.setattr(scan_routes, "do_http_scan", fast)
+    monkeypatch.setattr(scan_routes, "save_web_result", flaky_save)
+    results = {}
+
+    async def main():
+        jobs = JobManager(job_dir=f"{tmp_dir}/jobs", inflight=4)
+        job_id, path = jobs.new_input_path()
+        with open(path, "w") as f:
+            f.write("\n".join(f"http://{h}.test/" for h in "abcdb"))
+        job = await jobs.submit(job_id, path, scan_routes.make_bulk_worker(), attach=True)
+        async for idx, res in job.events():
+            results[idx] = res
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "done"
+    assert (job.done, job.failed) == (3, 2)
+    assert results[1]["save_error"] == "writer ditutup" and results[1]["id"] is None
+    assert "Gagal menyimpan" in results[1]["error"]
+    assert len(fake_scan["saved"]) == 3
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from app.models.models import ScanJob
+from app.services import scan_jobs
+from app.services.scan_jobs import BulkJob, JobManager
+
+
+@pytest.fixture(autouse=True)
+def no_prefetch(monkeypatch):
+    async def prefetch(batch):
+        pass
+    monkeypatch.setattr(JobManager, "_prefetch", staticmethod(prefetch))
+
+
+def make_handle(seen, delay=0.0, fail=()):
+    async def handle(url, limiter):
+        await asyncio.sleep(delay)
+        seen.append(url)
+        return {"url": url, "error": "gagal" if url in fail else None}
+    return handle
+
+
+def write_input(jobs, n):
+    job_id, path = jobs.new_input_path()
+    with open(path, "w") as f:
+        f.write("\n".join(f"http://j{i}.test/" for i in range(n)))
+    return job_id, path
+
+
+# ======================================
+# CHECKPOINT
+# ======================================
+
+def test_cursor_only_advances_over_contiguous_results():
+    job = BulkJob("x", "/tmp/x")
+    for idx, ok in [(1, True), (2, False), (0, True), (4, True)]:
+        job.record(idx, ok)
+    assert job.cursor == 3
+    assert (job.ckpt_done, job.ckpt_failed) == (2, 1)
+    assert (job.done, job.failed) == (3, 1)
+
+
+def test_job_runs_to_done_and_persists_progress(db, arun, tmp_dir):
+    jobs = JobManager(job_dir=f"{tmp_dir}/j1", inflight=4, batch_size=7, checkpoint_every=5)
+    seen = []
+
+    async def main():
+        job_id, path = write_input(jobs, 30)
+        job = await jobs.submit(job_id, path, make_handle(seen, fail={"http://j3.test/"}))
+        await job.task
+        return job, path, await jobs.get_progress(job_id)
+
+    job, path, progress = arun(main())
+    assert job.status == "done" and job.total == 30
+    assert (progress["done"], progress["failed"], progress["pending"]) == (29, 1, 0)
+    assert not os.path.exists(path)         # input dihapus setelah selesai
+    row = db.query(ScanJob).one()
+    assert (row.status, row.cursor, row.done, row.failed) == ("done", 30, 29, 1)
+
+
+# ======================================
+# TERPUTUS -> RESUME
+# ======================================
+
+def test_interrupted_job_resumes_from_cursor(db, arun, tmp_dir):
+    jobs = JobManager(job_dir=f"{tmp_dir}/j2", inflight=4, batch_size=10, checkpoint_every=1)
+    first, second = [], []
+
+    async def main():
+        job_id, path = write_input(jobs, 50)
+        job = await jobs.submit(job_id, path, make_handle(first, delay=0.01))
+        while job.done < 10:
+            await asyncio.sleep(0.005)
+        await jobs.stop()                   # shutdown -> interrupted, bukan cancelled
+        assert job.status == "interrupted"
+        cursor = job.cursor
+
+        resumed = await jobs.resume(job_id, make_handle(second))
+        await resumed.task
+        return job_id, cursor, resumed
+
+    job_id, cursor, resumed = arun(main())
+    assert resumed.status == "done"
+    urls = [f"http://j{i}.test/" for i in range(50)]
+    # tidak ada yang terlewat; yang diulang hanya yang >= cursor
+    assert set(urls[:cursor]) <= set(first)
+    assert set(second) == set(urls[cursor:])
+    row = db.query(ScanJob).filter_by(id=job_id).one()
+    assert (row.status, row.cursor, row.done + row.failed) == ("done", 50, 50)
+
+
+def test_stop_during_checkpoint_keeps_final_status(db, arun, tmp_dir, monkeypatch):
+    real = scan_jobs.update_scan_job
+
+    def slow_update(db, job_id, **fields):
+        if fields["status"] == "running":
+            time.sleep(0.2)     # UPDATE lama masih jalan di thread saat stop()
+        return real(db, job_id, **fields)
+
+    monkeypatch.setattr(scan_jobs, "update_scan_job", slow_update)
+    jobs = JobManager(job_dir=f"{tmp_dir}/j6", inflight=2, checkpoint_every=1)
+
+    async def main():
+        job_id, path = write_input(jobs, 50)
+        job = await jobs.submit(job_id, path, make_handle([]))
+        while job.done < 1:
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.05)           # checkpoint "running" sedang di thread
+        await jobs.stop()
+        return job
+
+    job = arun(main())
+    assert job.status == "interrupted"
+    db.expire_all()
+    assert db.get(ScanJob, job.id).status == "interrupted"
+
+
+def test_start_marks_running_rows_interrupted(db, arun, tmp_dir):
+    db.add(ScanJob(id="lama", status="running", source="bulk", input_path="/tmp/tidak-ada"))
+    db.commit()
+    jobs = JobManager(job_dir=f"{tmp_dir}/j3")
+    arun(jobs.start())
+    assert jobs.interrupted == ["lama"]
+    db.expire_all()
+    assert db.get(ScanJob, "lama").status == "interrupted"
+
+
+def test_resume_rejects_invalid_jobs(db, arun, tmp_dir):
+    jobs = JobManager(job_dir=f"{tmp_dir}/j4", inflight=2)
+    db.add(ScanJob(id="selesai", status="done", source="bulk", input_path="/tmp/x"))
+    db.add(ScanJob(id="hilang", status="interrupted", source="bulk", input_path="/tmp/tidak-ada"))
+    db.commit()
+
+    async def main():
+        with pytest.raises(LookupError):
+            await jobs.resume("tidak-ada", make_handle([]))
+        with pytest.raises(ValueError, match="tidak bisa di-resume"):
+            await jobs.resume("selesai", make_handle([]))
+        with pytest.raises(ValueError, match="input"):
+            await jobs.resume("hilang", make_handle([]))
+
+        job_id, path = write_input(jobs, 20)
+        job = await jobs.submit(job_id, path, make_handle([], delay=0.05))
+        with pytest.raises(ValueError, match="masih berjalan"):
+            await jobs.resume(job_id, make_handle([]))
+        # dibatalkan sebelum task sempat jalan -> tetap tercatat cancelled
+        assert await jobs.cancel(job_id)
+        assert not await jobs.cancel(job_id)
+        return job
+
+    job = arun(main())
+    assert job.status == "cancelled"
+    assert db.get(ScanJob, job.id).status == "cancelled"
+
+
+def test_failing_input_marks_job_failed(db, arun, tmp_dir):
+    jobs = JobManager(job_dir=f"{tmp_dir}/j5", inflight=2)
+
+    async def main():
+        job_id, path = write_input(jobs, 5)
+        os.remove(path)
+        job = await jobs.submit(job_id, path, make_handle([]))
+        await job.task
+        return job
+
+    job = arun(main())
+    assert job.status == "failed" and job.error
+    assert db.query(ScanJob).one().status == "failed"
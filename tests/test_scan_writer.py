@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+from app.models.models import ScanHistory
+from app.services import scan_writer as scan_writer_mod
+from app.services.scan_writer import ScanWriter
+
+
+def row(i, **extra):
+    return {"url": f"http://w{i}.test/", "host": f"w{i}.test", "status_code": 200,
+            "latency_ms": i, "source": "test", **extra}
+
+
+# ======================================
+# BATCH
+# ======================================
+
+def test_concurrent_submits_share_batches(db, arun):
+    writer = ScanWriter(batch_size=10, flush_interval=0.05, queue_size=100)
+
+    async def main():
+        try:
+            return await asyncio.gather(*[writer.submit(**row(i)) for i in range(25)])
+        finally:
+            await writer.stop()
+
+    recs = arun(main())
+    assert len({r.id for r in recs}) == 25
+    assert [r.url for r in recs] == [f"http://w{i}.test/" for i in range(25)]
+    assert recs[0].created_at is not None
+    assert writer.batches_written == 3 and writer.rows_written == 25
+    assert db.query(ScanHistory).count() == 25
+
+
+def test_flush_window_bounds_latency(db, arun):
+    writer = ScanWriter(batch_size=100, flush_interval=0.05)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        try:
+            await writer.submit(**row(1))
+            return loop.time() - t0
+        finally:
+            await writer.stop()
+
+    # batch belum penuh -> ditulis setelah jendela waktu, bukan menunggu 100 baris
+    assert arun(main()) < 1.0
+    assert writer.batches_written == 1
+
+
+def test_stop_flushes_queued_rows(db, arun):
+    writer = ScanWriter(batch_size=100, flush_interval=30)
+
+    async def main():
+        pending = [asyncio.create_task(writer.submit(**row(i))) for i in range(5)]
+        await asyncio.sleep(0.05)
+        await writer.stop()
+        return await asyncio.gather(*pending)
+
+    assert len(arun(main())) == 5
+    assert db.query(ScanHistory).count() == 5
+
+
+# ======================================
+# GAGAL
+# ======================================
+
+def test_failed_batch_fails_its_callers_and_writer_survives(db, arun):
+    writer = ScanWriter(batch_size=10, flush_interval=0.02)
+
+    async def main():
+        try:
+            bad = await asyncio.gather(writer.submit(**row(1)), writer.submit(**row(2, bogus=1)),
+                                       return_exceptions=True)
+            good = await writer.submit(**row(3))
+            return bad, good
+        finally:
+            await writer.stop()
+
+    bad, good = arun(main())
+    # satu baris rusak -> seluruh batch di-rollback, semua pemanggil dapat error
+    assert all(isinstance(e, TypeError) for e in bad)
+    assert good.id is not None
+    assert [r.url for r in db.query(ScanHistory)] == ["http://w3.test/"]
+
+
+def test_rollup_failure_does_not_fail_scan(db, arun, monkeypatch):
+    def broken(db, recs):
+        raise RuntimeError("rollup rusak")
+
+    monkeypatch.setattr(scan_writer_mod, "apply_rollups", broken)
+    writer = ScanWriter(batch_size=10, flush_interval=0.01, rollups=True)
+
+    async def main():
+        try:
+            return await writer.submit(**row(1))
+        finally:
+            await writer.stop()
+
+    assert arun(main()).id is not None
+    assert db.query(ScanHistory).count() == 1
+
+
+def test_full_queue_applies_backpressure(db, arun):
+    writer = ScanWriter(batch_size=1, flush_interval=0, queue_size=1)
+    release = threading.Event()
+    write = writer._write
+
+    def slow_write(rows):
+        release.wait(5)
+        return write(rows)
+
+    writer._write = slow_write
+
+    async def main():
+        await writer.start()
+        tasks = [asyncio.create_task(writer.submit(**row(i))) for i in range(3)]
+        await asyncio.sleep(0.05)
+        # satu batch tertahan di thread, satu di antrian, satu menunggu put()
+        blocked = writer._queue.full() and not any(t.done() for t in tasks)
+        release.set()
+        recs = await asyncio.gather(*tasks)
+        await writer.stop()
+        return blocked, recs
+
+    blocked, recs = arun(main())
+    assert blocked
+    assert len(recs) == 3 and writer.batches_written == 3
@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.routes.scan import router
+from app.services.agent_fleet import agent_poller
+from app.services.request_trace import TracingMiddleware, tracer
+from app.services.scan_writer import scan_writer
+from app.utils.tracing import Trace, activate, deactivate, span, traced
+
+
+# ======================================
+# SPAN
+# ======================================
+
+def test_span_tree_and_limit():
+    @traced("kerja")
+    def work():
+        with span("dalam", n=1):
+            pass
+        return 42
+
+    assert work() == 42      # tanpa trace aktif: tidak mencatat apa-apa
+
+    trace = Trace("root", max_spans=3)
+    token = activate(trace.root)
+    try:
+        work()
+        work()
+    finally:
+        deactivate(token)
+    tree = trace.root.to_dict()
+    assert [c["name"] for c in tree["children"]] == ["kerja", "kerja"]
+    assert tree["children"][0]["children"][0]["attrs"] == {"n": 1}
+    assert trace.dropped == 1
+
+
+def test_span_records_error():
+    trace = Trace("root")
+    token = activate(trace.root)
+    try:
+        with span("gagal"):
+            raise ValueError()
+    except ValueError:
+        pass
+    finally:
+        deactivate(token)
+    assert trace.root.children[0].attrs == {"error": "ValueError"}
+
+
+# ======================================
+# MIDDLEWARE
+# ======================================
+
+def run_traced(arun, fn, **kwargs):
+    async def main():
+        app = FastAPI()
+        app.include_router(router)
+        mw = TracingMiddleware(app, enabled=True, slow_ms=0, sample=1.0, log_size=10, **kwargs)
+        transport = httpx.ASGITransport(app=mw)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await fn(client)
+        finally:
+            await scan_writer.stop()
+            agent_poller.agents.clear()
+            tracer.middleware = None
+    return arun(main())
+
+
+def test_server_timing_has_crud_spans_and_slow_log(db, arun):
+    async def main(client):
+        created = await client.post("/scan/agents", json={"name": "pc-1", "address": "10.0.0.1:8008"})
+        history = await client.get("/scan/history?limit=5")
+        return created, history, tracer.snapshot()
+
+    created, history, snap = run_traced(arun, main)
+    assert created.status_code == 200 and history.status_code == 200
+    assert "crud.create_agent;dur=" in created.headers["server-timing"]
+    assert "crud.query_scan_history;dur=" in history.headers["server-timing"]
+    assert "total;dur=" in history.headers["server-timing"]
+    assert snap["requests"] == 2
+    assert [e["path"] for e in snap["slow"]] == ["/scan/history", "/scan/agents"]
+    assert snap["slow"][0]["spans"]["name"] == "GET /scan/history"
+
+
+def test_profile_requires_admin_token(db, arun):
+    async def main(client):
+        anon = await client.get("/scan/history?profile=1")
+        wrong = await client.get("/scan/history?profile=1", headers={"x-admin-token": "salah"})
+        ok = await client.get("/scan/history?profile=1", headers={"x-admin-token": "rahasia"})
+        return anon, wrong, ok
+
+    anon, wrong, ok = run_traced(arun, main, admin_token="rahasia")
+    assert anon.status_code == 403 and wrong.status_code == 403
+    assert ok.status_code == 200
+    assert ok.headers["x-profile-status"] == "200"
+    assert ok.headers["content-type"].startswith("text/plain")
+
+
+def test_profile_disabled_without_configured_token(db, arun):
+    async def main(client):
+        return await client.get("/scan/history?profile=1", headers={"x-admin-token": ""})
+
+    assert run_traced(arun, main, admin_token="").status_code == 403
+
+
+def test_background_task_after_request_does_not_grow_trace():
+    trace = Trace("root")
+    token = activate(trace.root)
+
+    async def later():
+        await asyncio.sleep(0)
+        with span("telat"):
+            pass
+
+    async def main():
+        task = asyncio.create_task(later())
+        trace.finished = True
+        await task
+
+    try:
+        asyncio.run(main())
+    finally:
+        deactivate(token)
+    assert trace.root.children == []
@@ -0,0 +1,83 @@
+import asyncio
+
+from app.services.validator_cache import ValidatorCache, Validator, conditional_headers, url_key
+
+URL = "http://example.test/page"
+
+
+def test_changed_detection_by_hash():
+    cache = ValidatorCache()
+    assert cache.observe(URL, None, 200, None, None, "h1") == (None, "h1")
+    prev = cache._cached(url_key(URL))[1]
+    assert cache.observe(URL, prev, 200, None, None, "h1") == (False, "h1")
+    assert cache.observe(URL, prev, 200, None, None, "h2") == (True, "h2")
+
+
+def test_304_keeps_previous_validator():
+    cache = ValidatorCache()
+    prev = Validator('"v1"', None, "h1")
+    assert cache.observe(URL, prev, 304, None, None, None) == (False, "h1")
+    assert conditional_headers(prev) == {"If-None-Match": '"v1"'}
+    assert cache.snapshot()["not_modified"] == 1
+
+
+def test_unhashed_200_keeps_stored_hash():
+    cache = ValidatorCache()
+    prev = Validator('"v1"', None, "h1")
+    # HEAD-first: 200 tanpa body hash, ETag sama -> tidak berubah
+    assert cache.observe(URL, prev, 200, '"v1"', None, None) == (False, "h1")
+    stored = cache._cached(url_key(URL))[1]
+    assert stored is None or stored.content_hash == "h1"
+    # ETag berubah tanpa hash: hash lama tetap disimpan, tapi tidak dilaporkan
+    changed, content_hash = cache.observe(URL, prev, 200, '"v2"', None, None)
+    assert (changed, content_hash) == (True, None)
+    stored = cache._cached(url_key(URL))[1]
+    assert stored == Validator('"v2"', None, "h1")
+    # scan berikutnya dengan hash tetap bisa dibandingkan
+    assert cache.observe(URL, stored, 200, '"v2"', None, "h1")[0] is False
+
+
+def test_errors_do_not_touch_validator():
+    cache = ValidatorCache()
+    prev = Validator('"v1"', None, "h1")
+    assert cache.observe(URL, prev, 500, None, None, None) == (None, None)
+    assert cache.observe(URL, prev, None, None, None, None) == (None, None)
+    assert cache._dirty == {}
+
+
+def test_failed_select_is_not_cached():
+    calls = []
+
+    class Broken:
+        async def __aenter__(self):
+            calls.append(1)
+            raise OSError("db down")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def main():
+        cache = ValidatorCache(async_session_factory=Broken)
+        assert await cache.get(URL) is None
+        assert url_key(URL) not in cache._mem
+        assert await cache.get(URL) is None      # dicoba lagi, bukan dari cache
+        return cache
+
+    cache = asyncio.run(main())
+    assert len(calls) == 2 and cache.hits == 0
+
+
+def test_write_behind_roundtrip(db, arun):
+    async def main():
+        cache = ValidatorCache()
+        cache.observe(URL, None, 200, '"v1"', "Mon, 02 Mar 2026 10:00:00 GMT", "h1")
+        assert await cache.flush() == 1
+        fresh = ValidatorCache()
+        got = await fresh.get("HTTP://EXAMPLE.test/page")
+        missing = await fresh.get("http://example.test/other")
+        return got, missing, fresh
+
+    got, missing, fresh = arun(main())
+    assert got == Validator('"v1"', "Mon, 02 Mar 2026 10:00:00 GMT", "h1")
+    assert missing is None
+    assert fresh.db_reads == 2
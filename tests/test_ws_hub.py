@@ -0,0 +1,141 @@
+import asyncio
+import json
+import zlib
+
+from app.services.ws_hub import ConnectionManager
+
+
+class FakeWS:
+    """WebSocket palsu: simpan frame terkirim; gate untuk mensimulasikan client lambat."""
+
+    def __init__(self, blocked=False, fail=False):
+        self.frames = []
+        self.closed = None
+        self.fail = fail
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("socket putus")
+        self.frames.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await self.gate.wait()
+        self.frames.append(json.loads(zlib.decompress(data)))
+
+    async def close(self, code=1000):
+        self.closed = code
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def result(i):
+    return {"type": "scan_result", "data": {"id": i}}
+
+
+# ======================================
+# COALESCING
+# ======================================
+
+def test_results_coalesced_per_window_and_order_kept():
+    async def main():
+        hub = ConnectionManager(queue_size=100, coalesce_ms=20, coalesce_max=100)
+        batched, single = FakeWS(), FakeWS()
+        await hub.connect(batched)
+        await hub.connect(single, batch=False)
+        for i in range(3):
+            hub.publish(result(i))
+        await settle()
+        assert batched.frames == []             # masih dalam jendela
+        # pesan non-batch mem-flush batch tertunda lebih dulu
+        await hub.broadcast({"type": "agent", "data": "x"})
+        hub.publish(result(3))
+        await asyncio.sleep(0.05)
+        await hub.stop()
+        return batched.frames, single.frames
+
+    batched, single = asyncio.run(main())
+    assert batched == [
+        {"type": "scan_result_batch", "data": [{"id": 0}, {"id": 1}, {"id": 2}]},
+        {"type": "agent", "data": "x"},
+        {"type": "scan_result_batch", "data": [{"id": 3}]},
+    ]
+    assert single == [result(0), result(1), result(2), {"type": "agent", "data": "x"}, result(3)]
+
+
+def test_coalesce_max_flushes_immediately_and_compress():
+    async def main():
+        hub = ConnectionManager(queue_size=100, coalesce_ms=10_000, coalesce_max=2)
+        ws = FakeWS()
+        await hub.connect(ws, compress=True)
+        hub.publish(result(0))
+        hub.publish(result(1))
+        await settle()
+        await hub.stop()
+        return ws.frames
+
+    assert asyncio.run(main()) == [{"type": "scan_result_batch", "data": [{"id": 0}, {"id": 1}]}]
+
+
+# ======================================
+# CLIENT LAMBAT
+# ======================================
+
+def run_slow(policy):
+    async def main():
+        hub = ConnectionManager(queue_size=3, slow_policy=policy, coalesce_ms=0)
+        fast, slow = FakeWS(), FakeWS(blocked=True)
+        await hub.connect(fast)
+        await hub.connect(slow)
+        await settle()
+        for i in range(10):
+            hub.publish({"type": "n", "data": i})
+            await asyncio.sleep(0)          # sender client cepat sempat jalan
+        snap = hub.snapshot()
+        slow.gate.set()
+        await settle()
+        await hub.stop()
+        return hub, fast, slow, snap
+    return asyncio.run(main())
+
+
+def test_slow_client_drop_oldest_does_not_block_others():
+    hub, fast, slow, snap = run_slow("drop_oldest")
+    assert [f["data"] for f in fast.frames] == list(range(10))
+    # frame pertama sudah di tangan sender, sisanya antrian terbatas 3
+    assert [f["data"] for f in slow.frames] == [0, 7, 8, 9]
+    assert snap["dropped"] == 6 and snap["max_backlog"] == 3
+
+
+def test_slow_client_drop_newest():
+    hub, fast, slow, snap = run_slow("drop_newest")
+    assert [f["data"] for f in slow.frames] == [0, 1, 2, 3]
+    assert snap["dropped"] == 6
+
+
+def test_slow_client_disconnected():
+    hub, fast, slow, snap = run_slow("disconnect")
+    assert [f["data"] for f in fast.frames] == list(range(10))
+    assert slow.closed == 1013
+    assert snap["clients"] == 1 and snap["disconnected_slow"] == 1
+
+
+def test_send_error_removes_client():
+    async def main():
+        hub = ConnectionManager(coalesce_ms=0)
+        ws = FakeWS(fail=True)
+        await hub.connect(ws)
+        hub.publish({"type": "n", "data": 1})
+        await settle()
+        return hub.snapshot()
+
+    assert asyncio.run(main())["clients"] == 0